@@ -1,72 +1,78 @@
-from AI.AIError import AIError
-from AI.baseAIClient import client
-from main.settings import AI_MODEL
+from AI.AIError import AIError, AIUnavailableError
+from AI.baseAIClient import chat_completion, stream_chat_completion
+from AI.chunk_text import estimate_prompt_tokens
+from AI.completion_cache import fingerprint, get_completion, store_completion
+from AI.model_router import call_with_failover
+from AI.telemetry import note_cache_hit
+from main.settings import AI_MODEL, AI_CONTEXT_TOKENS, AI_MAX_RETRIES
 import logging
-import re
 
 logger = logging.getLogger(__name__)
 
 
-def AI(temperature, prompt, text, max_tokens=1000, max_retries=4):
-    # Add timeout and retry logic for API calls
-    for attempt in range(max_retries):
-        try:
-            completion = client.chat.completions.create(
-                model=AI_MODEL,
-                messages=prompt,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
-            break  # Success, exit retry loop
-        except Exception as api_error:
-            if "Bad request" in str(api_error) and attempt < max_retries - 1:
-                # If it's a "Bad request" error and not the last attempt, try with shorter context
-                logger.warning(
-                    f"Bad request error on attempt {attempt+1}, reducing context size and retrying...")
-
-                # Split the text into sentences
-                sentences = re.split(r'(?<=[.!?])\s+', text)
-
-                # Calculate a reduced size based on the attempt number
-                # Each retry will use fewer sentences
-                # 1/2, 1/3, 1/4 of original sentences
-                reduction_factor = 1.0 / (attempt + 2)
+def check_prompt_size(prompt, max_tokens):
+    """Never send a request the model can't take, shrinking after a failed round trip wastes the call"""
+    prompt_tokens = estimate_prompt_tokens(prompt)
+    if prompt_tokens + max_tokens > AI_CONTEXT_TOKENS:
+        logger.error(
+            f"Prompt of ~{prompt_tokens} tokens plus {max_tokens} completion tokens exceeds the {AI_CONTEXT_TOKENS} token context")
+        raise AIError("The text is too long to be sent to the AI in one request")
 
-                # Calculate how many sentences to keep
-                keep_count = max(
-                    10, int(len(sentences) * reduction_factor))
 
-                if len(sentences) <= keep_count:
-                    # Not enough sentences to sample, just use a smaller portion
-                    text = text[:int(len(text) * reduction_factor)]
-                else:
-                    # Take evenly distributed sentences
-                    step = max(1, len(sentences) // keep_count)
+def AI(temperature, prompt, max_tokens=1000, max_retries=AI_MAX_RETRIES, use_cache=False, regenerate=False,
+       response_format=None, models=None):
+    """
+    Args:
+        models (list): Models to try in order when the ones before are unavailable, from
+            select_models, defaults to AI_MODEL
+    """
+    check_prompt_size(prompt, max_tokens)
+    return call_with_failover(
+        models or [AI_MODEL],
+        lambda model: _complete(model, temperature, prompt, max_tokens, max_retries,
+                                use_cache, regenerate, response_format))
 
-                    # Always include some sentences from the beginning, middle and end
-                    beginning = sentences[:min(5, len(sentences)//10)]
 
-                    # Sample sentences from the rest of the document at regular intervals
-                    sampled = sentences[min(
-                        5, len(sentences)//10):len(sentences)-min(5, len(sentences)//10):step]
+def _complete(model, temperature, prompt, max_tokens, max_retries, use_cache, regenerate, response_format):
+    # Identical requests can be answered from the completion cache, regenerate skips the lookup
+    # but still stores the fresh completion
+    cache_key = None
+    if use_cache:
+        cache_key = fingerprint(
+            model, prompt, temperature, max_tokens, response_format)
+        if not regenerate:
+            completion = get_completion(cache_key)
+            if completion is not None:
+                logger.info(f"AI completion cache hit: {cache_key}")
+                note_cache_hit(model)
+                return completion
 
-                    # Add some sentences from the end
-                    ending = sentences[-min(5, len(sentences)//10):]
+    # Rate limiting, retries with backoff and the circuit breaker live in the client layer
+    completion = chat_completion(
+        prompt, temperature, max_tokens, model=model, max_retries=max_retries, response_format=response_format)
 
-                    # Combine the samples
-                    sampled_sentences = beginning + sampled + ending
+    if cache_key:
+        store_completion(cache_key, completion)
+    return completion
 
-                    # Join the sampled sentences back into text
-                    text = ' '.join(sampled_sentences)
 
-                logger.info(
-                    f"Reduced text from {len(text)} to {len(text)} characters")
+def AI_stream(temperature, prompt, max_tokens=1000, max_retries=AI_MAX_RETRIES, models=None):
+    """
+    Like AI, but yields the completion text piece by piece as the provider streams it.
 
-                # Update the prompt with the new text
-                prompt[1]['content'] = prompt[1]['content'].replace(
-                    f"context: {text}", f"context: {text}")
-                continue
-            else:
-                # On last attempt or different error, re-raise
-                raise AIError()
-    return completion
+    Failures are retried, and unavailable models failed over, only until the first piece has been yielded.
+    """
+    check_prompt_size(prompt, max_tokens)
+    models = models or [AI_MODEL]
+    for model in models:
+        started = False
+        try:
+            for piece in stream_chat_completion(prompt, temperature, max_tokens, model=model,
+                                                max_retries=max_retries):
+                started = True
+                yield piece
+            return
+        except AIUnavailableError:
+            if started or model == models[-1]:
+                raise
+            logger.warning(f"AI model {model} is unavailable, failing over")
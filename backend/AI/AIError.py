@@ -5,3 +5,9 @@ class AIError(APIException):
     status_code = 400
     default_detail = "An error occurred while generating MCQs"
     default_code = "ai_error"
+
+
+class AIUnavailableError(AIError):
+    status_code = 503
+    default_detail = "The AI service is temporarily unavailable, please try again in a moment"
+    default_code = "ai_unavailable"
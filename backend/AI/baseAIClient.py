@@ -1,15 +1,238 @@
 import logging
+import random
+import threading
+import time
 from huggingface_hub import InferenceClient
-from main.settings import AI_PROVIDER, AI_API_KEY
+from main.settings import (AI_PROVIDER, AI_API_KEY, AI_MODEL, AI_CALL_TIMEOUT, AI_MAX_RETRIES,
+                           AI_RETRY_BASE_DELAY, AI_RETRY_MAX_DELAY, AI_RECORD_DIR, AI_REPLAY_DIR,
+                           AI_STRUCTURED_OUTPUT)
+from AI.AIError import AIError, AIUnavailableError
+from AI.circuit_breaker import check_circuit, record_success, record_failure
+from AI.concurrency import ai_call_slot
+from AI.fake_provider import FakeInferenceClient
+from AI.model_router import record_latency
+from AI.rate_limit import acquire_rate_limit_token
+from AI.record_replay import RecordingClient, ReplayClient
+from AI.telemetry import record_provider_call
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-try:
+# Provider answers worth another try: timeouts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+# Of those, the ones that don't mean the provider is down
+RATE_LIMIT_STATUS_CODES = {429}
+
+# Providers that honour a json_schema response_format, used when AI_STRUCTURED_OUTPUT=auto
+STRUCTURED_OUTPUT_PROVIDERS = {'fake', 'cerebras', 'fireworks-ai', 'groq', 'nebius', 'sambanova', 'together'}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _build_client(timeout):
+    if AI_PROVIDER == 'fake':
+        return FakeInferenceClient(timeout=timeout)
+    if AI_PROVIDER == 'replay':
+        return ReplayClient(AI_REPLAY_DIR)
     client = InferenceClient(
         provider=AI_PROVIDER,
         api_key=AI_API_KEY,
+        timeout=timeout,
     )
-except Exception as e:
-    logger.error(f"Failed to initialize AI client: {str(e)}")
-    raise
+    if AI_RECORD_DIR:
+        return RecordingClient(client, AI_RECORD_DIR)
+    return client
+
+
+def get_client(timeout=None):
+    """
+    Shared client for a call timeout, built on first use.
+
+    AI_PROVIDER=fake serves templated completions offline and AI_PROVIDER=replay serves the
+    ones recorded into AI_RECORD_DIR, any other value is passed on to InferenceClient.
+
+    Args:
+        timeout (float): Seconds before a call is abandoned, defaults to AI_CALL_TIMEOUT
+    """
+    timeout = timeout or AI_CALL_TIMEOUT
+    client = _clients.get(timeout)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(timeout)
+            if client is None:
+                try:
+                    client = _build_client(timeout)
+                except Exception as e:
+                    logger.error(f"Failed to initialize AI client: {str(e)}")
+                    raise AIUnavailableError()
+                _clients[timeout] = client
+    return client
+
+
+def structured_output_enabled():
+    """Whether completions can be constrained to a JSON schema with response_format"""
+    if AI_STRUCTURED_OUTPUT == 'auto':
+        return AI_PROVIDER in STRUCTURED_OUTPUT_PROVIDERS
+    return AI_STRUCTURED_OUTPUT in ('1', 'true', 'yes', 'on')
+
+
+def _status_code(error):
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def is_retryable(error):
+    """Whether a failed call could succeed if sent again unchanged"""
+    if isinstance(error, AIError):
+        return False
+    status_code = _status_code(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    # A bad request would only fail the same way again, anything else without a
+    # status (timeouts, dropped connections) is transient
+    return "Bad request" not in str(error)
+
+
+def _is_provider_failure(error):
+    """Failures that say the provider is down, as opposed to busy or unhappy with the request"""
+    return is_retryable(error) and _status_code(error) not in RATE_LIMIT_STATUS_CODES
+
+
+def retry_delay(attempt, error=None):
+    """Exponential backoff with full jitter, a Retry-After from the provider takes precedence"""
+    response = getattr(error, 'response', None)
+    retry_after = getattr(response, 'headers', {}).get(
+        'Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), AI_RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    return random.uniform(0, min(AI_RETRY_MAX_DELAY, AI_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def _before_call(model):
+    check_circuit(model)
+    acquire_rate_limit_token(model)
+
+
+def _after_failure(model, error, attempt, max_retries):
+    """Record a failed attempt, returns True if it should be retried"""
+    if _is_provider_failure(error):
+        record_failure(model)
+    if is_retryable(error) and attempt < max_retries - 1:
+        logger.warning(
+            f"AI request failed on attempt {attempt+1}: {str(error)}. Retrying...")
+        time.sleep(retry_delay(attempt, error))
+        return True
+    logger.error(f"AI request failed: {str(error)}")
+    return False
+
+
+def chat_completion(messages, temperature, max_tokens, model=None, timeout=None, max_retries=AI_MAX_RETRIES,
+                    response_format=None):
+    """
+    Send a chat completion request through the rate limit, circuit breaker and retry policy.
+
+    Args:
+        messages (list): Chat messages
+        temperature (float): Sampling temperature
+        max_tokens (int): Completion token limit
+        model (str): Defaults to AI_MODEL
+        timeout (float): Seconds before a single attempt is abandoned, defaults to AI_CALL_TIMEOUT
+        max_retries (int): Attempts before giving up
+        response_format (dict): Constrain the completion, see structured_output_enabled
+    Returns:
+        The provider's completion
+    Raises:
+        AIUnavailableError: If the provider is down or the rate limit is exhausted
+        AIError: If the request failed for good
+    """
+    model = model or AI_MODEL
+    started_at = time.monotonic()
+    attempt = 0
+    try:
+        for attempt in range(max_retries):
+            _before_call(model)
+            try:
+                with ai_call_slot():
+                    # Only sent when set, so plain requests look the same to every client
+                    extra = {'response_format': response_format} if response_format else {}
+                    completion = get_client(timeout).chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        **extra,
+                    )
+            except AIError:
+                raise
+            except Exception as api_error:
+                if _after_failure(model, api_error, attempt, max_retries):
+                    continue
+                raise AIError()
+            record_success(model)
+            record_latency(model, time.monotonic() - started_at)
+            record_provider_call(model, messages, attempt + 1,
+                                 started_at, completion=completion)
+            return completion
+    except AIError as e:
+        record_provider_call(model, messages, attempt + 1,
+                             started_at, completion_text="", error=e)
+        raise
+
+
+def stream_chat_completion(messages, temperature, max_tokens, model=None, timeout=None, max_retries=AI_MAX_RETRIES):
+    """
+    Like chat_completion, but yields the completion text piece by piece as the provider streams it.
+
+    Failures are retried only until the first piece has been yielded.
+    """
+    model = model or AI_MODEL
+    started_at = time.monotonic()
+    attempt = 0
+    pieces = []
+    try:
+        for attempt in range(max_retries):
+            _before_call(model)
+            started = False
+            try:
+                with ai_call_slot():
+                    stream = get_client(timeout).chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        stream=True,
+                    )
+                    for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            started = True
+                            pieces.append(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+            except AIError:
+                raise
+            except Exception as api_error:
+                if not started:
+                    if _after_failure(model, api_error, attempt, max_retries):
+                        continue
+                    raise AIError()
+                if _is_provider_failure(api_error):
+                    record_failure(model)
+                logger.error(f"AI stream failed: {str(api_error)}")
+                raise AIError()
+            record_success(model)
+            record_latency(model, time.monotonic() - started_at)
+            record_provider_call(model, messages, attempt + 1, started_at,
+                                 completion_text="".join(pieces))
+            return
+    except GeneratorExit:
+        # The caller had enough and stopped reading, what was streamed so far was still paid for
+        record_provider_call(model, messages, attempt + 1, started_at,
+                             completion_text="".join(pieces))
+        raise
+    except AIError as e:
+        record_provider_call(model, messages, attempt + 1, started_at,
+                             completion_text="".join(pieces), error=e)
+        raise
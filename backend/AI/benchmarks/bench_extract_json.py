@@ -0,0 +1,109 @@
+"""
+Benchmark extract_json against the previous regex cascade on a corpus of malformed AI outputs.
+
+Run from the backend directory:
+    python -m AI.benchmarks.bench_extract_json [--repeat 200]
+
+Every file in corpus/extract_json is an AI response, expected.json holds how many usable
+items (complete questions, or 1 for an evaluation object) a parser should recover from it.
+Exits with status 1 if the new parser recovers fewer items than the cascade on any case,
+or is slower overall.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+from AI.extract_json import extract_json
+from AI.benchmarks.legacy_extract_json import extract_json as legacy_extract_json
+
+CORPUS_DIR = os.path.join(os.path.dirname(
+    __file__), 'corpus', 'extract_json')
+
+MCQ_KEYS = ('question', 'options', 'correct_answer')
+EVALUATION_KEYS = ('score', 'feedback')
+
+
+def count_usable(result):
+    """Number of complete questions in a parsed result, an evaluation object counts as one"""
+    if isinstance(result, dict):
+        return int(all(key in result for key in EVALUATION_KEYS))
+    if not isinstance(result, list):
+        return 0
+    return sum(1 for item in result
+               if isinstance(item, dict) and all(key in item for key in MCQ_KEYS)
+               and isinstance(item['options'], list) and item['correct_answer'] in item['options'])
+
+
+def run_parser(parser, text, repeat):
+    try:
+        usable = count_usable(parser(text))
+    except ValueError:
+        usable = 0
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        try:
+            parser(text)
+        except ValueError:
+            pass
+    return usable, (time.perf_counter() - start) / repeat
+
+
+def load_corpus():
+    with open(os.path.join(CORPUS_DIR, 'expected.json')) as file:
+        expected = json.load(file)
+    cases = []
+    for name in sorted(expected):
+        with open(os.path.join(CORPUS_DIR, name), encoding='utf-8') as file:
+            cases.append((name, file.read(), expected[name]))
+    return cases
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--repeat', type=int, default=200,
+                            help='Timed runs per case and parser')
+    args = arg_parser.parse_args()
+
+    # The parsers log every repair, keep the table readable
+    logging.disable(logging.CRITICAL)
+
+    rows = []
+    total_new = total_legacy = 0.0
+    failures = []
+    for name, text, expected in load_corpus():
+        legacy_usable, legacy_time = run_parser(
+            legacy_extract_json, text, args.repeat)
+        new_usable, new_time = run_parser(extract_json, text, args.repeat)
+        total_legacy += legacy_time
+        total_new += new_time
+        rows.append((name, expected, legacy_usable, new_usable,
+                    legacy_time * 1e6, new_time * 1e6))
+        if new_usable < legacy_usable:
+            failures.append(
+                f"{name}: recovered {new_usable} items, the cascade recovered {legacy_usable}")
+
+    print(f"{'case':<42} {'expected':>8} {'cascade':>8} {'new':>5} {'cascade us':>11} {'new us':>9}")
+    for name, expected, legacy_usable, new_usable, legacy_us, new_us in rows:
+        print(f"{name:<42} {expected:>8} {legacy_usable:>8} {new_usable:>5} {legacy_us:>11.1f} {new_us:>9.1f}")
+
+    legacy_parsed = sum(row[2] for row in rows)
+    new_parsed = sum(row[3] for row in rows)
+    expected_total = sum(row[1] for row in rows)
+    print()
+    print(f"items recovered: cascade {legacy_parsed}/{expected_total}, new {new_parsed}/{expected_total}")
+    print(f"total time per corpus pass: cascade {total_legacy * 1e3:.2f} ms, new {total_new * 1e3:.2f} ms "
+          f"({total_legacy / total_new:.1f}x)")
+
+    if total_new >= total_legacy:
+        failures.append("the new parser is not faster than the cascade")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
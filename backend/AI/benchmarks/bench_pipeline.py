@@ -0,0 +1,219 @@
+"""
+Measure end-to-end throughput and latency of the AI pipelines under concurrency.
+
+Run from the backend directory:
+    python -m AI.benchmarks.bench_pipeline [--pipeline all] [--requests 40] [--concurrency 8]
+
+By default the fake provider answers (AI_PROVIDER=fake), so no provider is paid and the numbers
+only depend on our own code and the simulated latency. --provider replay serves responses
+recorded with AI_RECORD_DIR instead. The shared rate limit is off unless --rate-limit is given.
+Every request uses its own text, PDFs or image, so no cache answers for the provider.
+"""
+import argparse
+import io
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PIPELINES = ('text', 'pdfs', 'handwritten')
+
+WORDS = ("cell membrane protein energy enzyme reaction gradient transport diffusion osmosis "
+         "structure function signal receptor pathway molecule nucleus genome replication").split()
+
+
+def make_text(rng, chars):
+    sentences = []
+    size = 0
+    while size < chars:
+        sentence = " ".join(rng.choice(WORDS)
+                            for _ in range(rng.randint(8, 16))).capitalize() + "."
+        sentences.append(sentence)
+        size += len(sentence) + 1
+        if rng.random() < 0.15:
+            sentences.append("\n\n")
+    return " ".join(sentences)
+
+
+def write_pdf(path, pages):
+    """Smallest PDF with one line of Helvetica text per page, enough for PyPDF2 to extract"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>")
+    font_id = 3 + 2 * len(pages)
+    for i, text in enumerate(pages):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+                       f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>")
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(
+            f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out.encode()))
+        out += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(out.encode())
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    with open(path, 'w') as file:
+        file.write(out)
+
+
+def make_answer_image(rng):
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGB', (3000, 2200), (235, 232, 225))
+    draw = ImageDraw.Draw(image)
+    for line in range(rng.randint(6, 18)):
+        y = 300 + line * 90
+        x = 250
+        while x < 2600:
+            width = rng.randint(40, 220)
+            draw.line((x, y + rng.randint(-8, 8), x + width, y + rng.randint(-8, 8)),
+                      fill=(30, 30, 70), width=5)
+            x += width + rng.randint(20, 60)
+    buffered = io.BytesIO()
+    image.save(buffered, format='JPEG', quality=90)
+    buffered.seek(0)
+    return buffered
+
+
+def build_jobs(pipeline, count, args, workdir):
+    """Inputs for each request, prepared up front so only the pipeline itself is timed"""
+    from AI.evaluate_handwritten_answer import evaluate_handwritten_answer
+    from AI.generate_mcq_from_text import generate_mcqs_from_text
+    from AI.generate_mcqs_from_multiple_pdfs import generate_mcqs_from_multiple_pdfs
+
+    rng = random.Random(args.seed)
+    jobs = []
+    for i in range(count):
+        if pipeline == 'text':
+            text = make_text(rng, args.text_chars)
+            jobs.append(lambda text=text: generate_mcqs_from_text(
+                text, args.questions, fallback=False))
+        elif pipeline == 'pdfs':
+            paths = []
+            for j in range(args.pdfs):
+                path = os.path.join(workdir, f"request{i}_lecture{j}.pdf")
+                page_chars = max(200, args.text_chars // args.pdfs // 20)
+                write_pdf(path, [make_text(rng, page_chars).replace("\n", " ") for _ in range(20)])
+                paths.append(path)
+            jobs.append(lambda paths=paths: generate_mcqs_from_multiple_pdfs(
+                paths, args.questions, fallback=False))
+        else:
+            image = make_answer_image(rng)
+            jobs.append(lambda image=image: evaluate_handwritten_answer(
+                "Explain how substances cross the cell membrane.", "Diffusion, osmosis and active transport",
+                image, 10, use_cache=False))
+    return jobs
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_pipeline(pipeline, args, workdir):
+    jobs = build_jobs(pipeline, args.requests, args, workdir)
+    latencies = []
+    errors = []
+
+    def timed(job):
+        start = time.perf_counter()
+        try:
+            job()
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, e
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for latency, error in executor.map(timed, jobs):
+            latencies.append(latency)
+            if error is not None:
+                errors.append(error)
+    wall = time.perf_counter() - start
+
+    return {
+        'pipeline': pipeline,
+        'requests': len(jobs),
+        'errors': len(errors),
+        'throughput': len(jobs) / wall,
+        'p50': percentile(latencies, 0.5),
+        'p95': percentile(latencies, 0.95),
+        'max': max(latencies),
+        'wall': wall,
+        'first_error': str(errors[0]) if errors else "",
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--pipeline', choices=PIPELINES + ('all',), default='all')
+    arg_parser.add_argument('--requests', type=int, default=40,
+                            help='Requests per pipeline')
+    arg_parser.add_argument('--concurrency', type=int, default=8,
+                            help='Requests in flight at once')
+    arg_parser.add_argument('--questions', type=int, default=10,
+                            help='Questions per MCQ request')
+    arg_parser.add_argument('--text-chars', type=int, default=40000,
+                            help='Characters of source text per MCQ request')
+    arg_parser.add_argument('--pdfs', type=int, default=2,
+                            help='PDFs per request of the pdfs pipeline')
+    arg_parser.add_argument('--provider', choices=('fake', 'replay'), default='fake')
+    arg_parser.add_argument('--latency', type=float, default=None,
+                            help='Fake provider latency in seconds (AI_FAKE_LATENCY)')
+    arg_parser.add_argument('--error-rate', type=float, default=None,
+                            help='Share of fake provider calls that fail (AI_FAKE_ERROR_RATE)')
+    arg_parser.add_argument('--malformed-rate', type=float, default=None,
+                            help='Share of fake provider responses with broken JSON (AI_FAKE_MALFORMED_RATE)')
+    arg_parser.add_argument('--rate-limit', action='store_true',
+                            help='Keep the shared AI rate limit from the settings')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+
+    # Settings are read once at startup, so the provider is chosen before Django loads them
+    os.environ['AI_PROVIDER'] = args.provider
+    os.environ.setdefault('AI_MODEL', 'benchmark-model')
+    for name, value in (('AI_FAKE_LATENCY', args.latency), ('AI_FAKE_ERROR_RATE', args.error_rate),
+                        ('AI_FAKE_MALFORMED_RATE', args.malformed_rate)):
+        if value is not None:
+            os.environ[name] = str(value)
+    if not args.rate_limit:
+        os.environ['AI_RATE_LIMIT_PER_MINUTE'] = '0'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
+
+    import django
+    django.setup()
+
+    # Retries and skipped chunks are logged as they happen, keep the table readable
+    logging.disable(logging.CRITICAL)
+
+    pipelines = PIPELINES if args.pipeline == 'all' else (args.pipeline,)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for pipeline in pipelines:
+            results.append(run_pipeline(pipeline, args, workdir))
+
+    print(f"provider={args.provider} concurrency={args.concurrency} requests={args.requests} "
+          f"latency={os.environ.get('AI_FAKE_LATENCY', 'default')}")
+    print(f"{'pipeline':<12} {'requests':>8} {'errors':>6} {'req/s':>7} {'p50 s':>7} {'p95 s':>7} {'max s':>7} {'wall s':>7}")
+    for result in results:
+        print(f"{result['pipeline']:<12} {result['requests']:>8} {result['errors']:>6} {result['throughput']:>7.2f} "
+              f"{result['p50']:>7.2f} {result['p95']:>7.2f} {result['max']:>7.2f} {result['wall']:>7.2f}")
+    for result in results:
+        if result['first_error']:
+            print(f"{result['pipeline']}: first error: {result['first_error']}")
+    return 1 if any(result['errors'] == result['requests'] for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import math
+import re
+from main.settings import AI_CHARS_PER_TOKEN
+
+# Boundaries to split on, from coarsest to finest: paragraphs, lines, sentences, words
+_SEPARATORS = [r'\n\s*\n', r'\n', r'(?<=[.!?])\s+', r'\s+']
+
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in a piece of text"""
+    return math.ceil(len(text) / AI_CHARS_PER_TOKEN)
+
+
+def estimate_prompt_tokens(messages):
+    """
+    Estimate the number of tokens in a chat prompt.
+
+    Args:
+        messages (list): Chat messages, content can be a string or a list of parts
+    Returns:
+        int: Estimated prompt size in tokens
+    """
+    total = 0
+    for message in messages:
+        content = message.get('content') or ""
+        if isinstance(content, str):
+            total += estimate_tokens(content)
+        else:
+            total += sum(estimate_tokens(part.get('text', ""))
+                         for part in content if part.get('type') == 'text')
+        # Role and message framing
+        total += 4
+    return total
+
+
+def _split(text, max_chars, level=0):
+    if len(text) <= max_chars:
+        return [text]
+    if level == len(_SEPARATORS):
+        # A single word longer than a chunk, cut it
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+    pieces = []
+    for piece in re.split(_SEPARATORS[level], text):
+        pieces.extend(_split(piece, max_chars, level + 1))
+    return pieces
+
+
+def split_into_chunks(text, max_tokens):
+    """
+    Split text into chunks of at most max_tokens, breaking on the coarsest boundary that fits.
+
+    Args:
+        text (str): Text to split
+        max_tokens (int): Largest chunk size in estimated tokens
+    Returns:
+        list: Chunks in document order
+    """
+    max_chars = max(1, int(max_tokens * AI_CHARS_PER_TOKEN))
+
+    chunks = []
+    current = []
+    size = 0
+    for piece in _split(text.strip(), max_chars):
+        piece = piece.strip()
+        if not piece:
+            continue
+        if current and size + len(piece) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current = []
+            size = 0
+        current.append(piece)
+        size += len(piece) + 1
+
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def spread_chunks(chunks, limit):
+    """Pick at most limit chunks spread evenly over the document instead of keeping only the start"""
+    if len(chunks) <= limit:
+        return chunks
+    return [chunks[i * len(chunks) // limit] for i in range(limit)]
+
+
+def allocate_questions(chunks, number_of_questions):
+    """
+    Split a question quota across chunks in proportion to their length.
+
+    Uses the largest remainder method so the counts always add up to number_of_questions.
+
+    Returns:
+        list: Number of questions for each chunk, may contain zeros
+    """
+    total_length = sum(len(chunk) for chunk in chunks)
+    if not chunks or total_length == 0:
+        return [0] * len(chunks)
+
+    quotas = [number_of_questions * len(chunk) / total_length for chunk in chunks]
+    counts = [int(quota) for quota in quotas]
+    by_remainder = sorted(range(len(chunks)),
+                          key=lambda i: quotas[i] - counts[i], reverse=True)
+    for i in by_remainder[:number_of_questions - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def share_evenly(sizes, number_of_questions):
+    """
+    Split a question quota evenly across sources, the remainder goes to the longest ones.
+
+    Unlike number_of_questions // len(sizes) nothing is lost to the division, with fewer
+    questions than sources only the longest sources get one.
+
+    Args:
+        sizes (list): Length of each source
+        number_of_questions (int): Questions to share out
+    Returns:
+        list: Number of questions for each source, may contain zeros
+    """
+    if not sizes:
+        return []
+    counts = [number_of_questions // len(sizes)] * len(sizes)
+    by_size = sorted(range(len(sizes)), key=lambda i: sizes[i], reverse=True)
+    for i in by_size[:number_of_questions - sum(counts)]:
+        counts[i] += 1
+    return counts
@@ -0,0 +1,68 @@
+import logging
+import time
+from django.core.cache import caches
+from main.settings import AI_BREAKER_FAILURE_THRESHOLD, AI_BREAKER_COOLDOWN
+from AI.AIError import AIUnavailableError
+
+logger = logging.getLogger(__name__)
+
+shared_cache = caches['shared']
+
+
+def _keys(name):
+    return (f"ai_breaker:{name}:failures",
+            f"ai_breaker:{name}:open_until",
+            f"ai_breaker:{name}:probe")
+
+
+def check_circuit(name):
+    """
+    Fail fast while the provider is known to be down.
+
+    Once the cooldown has passed one call is let through as a probe, its outcome closes
+    or reopens the circuit. Other calls keep failing fast until then.
+
+    Raises:
+        AIUnavailableError: If the circuit is open
+    """
+    _, open_key, probe_key = _keys(name)
+    open_until = shared_cache.get(open_key)
+    if open_until is None:
+        return
+    if time.time() >= open_until and shared_cache.add(probe_key, True, int(AI_BREAKER_COOLDOWN) + 1):
+        logger.info(f"AI circuit for {name} is half open, probing")
+        return
+    raise AIUnavailableError()
+
+
+def circuit_is_open(name):
+    """Whether calls would currently fail fast, without taking the probe"""
+    open_until = shared_cache.get(_keys(name)[1])
+    return open_until is not None and time.time() < open_until
+
+
+def record_success(name):
+    failures_key, open_key, probe_key = _keys(name)
+    if shared_cache.get(open_key) is not None:
+        logger.info(f"AI circuit for {name} closed")
+    shared_cache.delete_many([failures_key, open_key, probe_key])
+
+
+def record_failure(name):
+    """Count a provider failure, opening the circuit after AI_BREAKER_FAILURE_THRESHOLD in a row"""
+    failures_key, open_key, probe_key = _keys(name)
+    shared_cache.add(failures_key, 0, None)
+    try:
+        failures = shared_cache.incr(failures_key)
+    except ValueError:
+        # Reset by a success in between
+        return
+
+    if failures >= AI_BREAKER_FAILURE_THRESHOLD:
+        if shared_cache.get(open_key) is None or shared_cache.get(probe_key):
+            logger.error(
+                f"AI circuit for {name} opened after {failures} consecutive failures")
+        # Kept well past the cooldown so the first call after it becomes the probe
+        shared_cache.set(open_key, time.time() + AI_BREAKER_COOLDOWN,
+                         int(AI_BREAKER_COOLDOWN * 10))
+        shared_cache.delete(probe_key)
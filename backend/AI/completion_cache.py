@@ -0,0 +1,74 @@
+import hashlib
+import json
+import logging
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+completion_cache = caches['ai_completions']
+# Every gunicorn and celery worker counts into the same hits and misses, while each keeps its own
+# completions. Kept apart from the completions so culling them can't reset the counters
+shared_cache = caches['shared']
+
+HITS_KEY = "ai_completion_cache:hits"
+MISSES_KEY = "ai_completion_cache:misses"
+
+
+def fingerprint(model, messages, temperature, max_tokens, response_format=None):
+    """Hash everything that decides what the provider returns for a request"""
+    request = {
+        'model': model,
+        'messages': messages,
+        'temperature': temperature,
+        'max_tokens': max_tokens,
+    }
+    # Left out when unset so the keys of plain requests stay what they were
+    if response_format:
+        request['response_format'] = response_format
+    payload = json.dumps(request, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _count(key):
+    # add is a no-op when the counter exists, incr alone fails on a missing key
+    shared_cache.add(key, 0, None)
+    try:
+        shared_cache.incr(key)
+    except ValueError:
+        pass
+
+
+def get_completion(key):
+    """Return the cached completion for this fingerprint, or None, counting the hit or miss"""
+    completion = completion_cache.get(key)
+    _count(HITS_KEY if completion is not None else MISSES_KEY)
+    return completion
+
+
+def store_completion(key, completion):
+    try:
+        completion_cache.set(key, completion)
+    except Exception as e:
+        # An unpicklable response only costs us the cache entry
+        logger.warning(f"Failed to cache AI completion: {str(e)}")
+
+
+def get_stats():
+    """
+    Returns:
+        dict: hits, misses and hit_rate of every worker since the counters were last reset
+    """
+    counters = shared_cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+    }
+
+
+def reset_stats():
+    """Zero the hit and miss counters of every worker, the cached completions stay"""
+    shared_cache.delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,153 @@
+import contextvars
+import logging
+import math
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from django.db import connections
+from main.settings import AI_MAX_WORKERS, AI_MAX_CONCURRENT_CALLS, AI_CALL_TIMEOUT
+from AI.AIError import AIUnavailableError
+
+logger = logging.getLogger(__name__)
+
+# Shared by every pool in this process so nested fan-outs can't multiply the load on the provider
+_call_slots = threading.BoundedSemaphore(AI_MAX_CONCURRENT_CALLS)
+
+
+@contextmanager
+def ai_call_slot(timeout=AI_CALL_TIMEOUT):
+    """
+    Hold one of the process-wide AI call slots while talking to the provider.
+
+    Args:
+        timeout (float): Seconds to wait for a free slot
+    Raises:
+        AIUnavailableError: If no slot frees up in time
+    """
+    if not _call_slots.acquire(timeout=timeout):
+        logger.error(
+            f"Timed out after {timeout}s waiting for a free AI call slot")
+        raise AIUnavailableError()
+    try:
+        yield
+    finally:
+        _call_slots.release()
+
+
+def _run_task(func, item):
+    try:
+        return func(item)
+    finally:
+        # Worker threads open their own DB connections, don't leak them
+        connections.close_all()
+
+
+def run_in_pool(func, items, max_workers=None, timeout=None):
+    """
+    Run func over items in a bounded thread pool.
+
+    Args:
+        func: Callable taking a single item
+        items: Iterable of items to process
+        max_workers (int): Pool size, defaults to AI_MAX_WORKERS (1 runs the items one after another)
+        timeout (float): Seconds allowed per item, defaults to AI_CALL_TIMEOUT
+    Returns:
+        list: (result, error) tuples in the same order as items, error is None on success
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    timeout = timeout or AI_CALL_TIMEOUT
+    workers = max(1, min(max_workers or AI_MAX_WORKERS, len(items)))
+
+    # Items queue behind each other once the pool is full, so the overall
+    # deadline grows with the number of rounds the pool needs
+    deadline = time.monotonic() + timeout * math.ceil(len(items) / workers)
+
+    outcomes = []
+    executor = ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix='ai-worker')
+    try:
+        # Each item runs in a copy of the caller's context, so telemetry knows who the call is for
+        futures = [executor.submit(contextvars.copy_context().run, _run_task, func, item)
+                   for item in items]
+        for future in futures:
+            try:
+                remaining = max(0, deadline - time.monotonic())
+                outcomes.append((future.result(timeout=remaining), None))
+            except FutureTimeoutError:
+                future.cancel()
+                outcomes.append(
+                    (None, TimeoutError(f"timed out after {timeout}s")))
+            except Exception as e:
+                outcomes.append((None, e))
+    finally:
+        # Don't hold the request hostage for calls we already gave up on
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return outcomes
+
+
+# Marks the end of one worker's values in iter_in_pool
+_WORKER_DONE = object()
+
+
+def iter_in_pool(func, items, max_workers=None, timeout=None):
+    """
+    Run a generator function over items in a bounded thread pool, yielding values as soon as any worker produces them.
+
+    Args:
+        func: Generator function taking a single item
+        items: Iterable of items to process
+        max_workers (int): Pool size, defaults to AI_MAX_WORKERS
+        timeout (float): Seconds to wait for the next value from any worker, defaults to AI_CALL_TIMEOUT
+    Yields:
+        tuple: (value, error), error is set once for each item whose generator failed
+    Raises:
+        TimeoutError: If no worker produced anything for timeout seconds
+    """
+    items = list(items)
+    if not items:
+        return
+
+    timeout = timeout or AI_CALL_TIMEOUT
+    workers = max(1, min(max_workers or AI_MAX_WORKERS, len(items)))
+    results = queue.Queue()
+    # Set when the consumer goes away so workers stop pulling from the provider
+    stop = threading.Event()
+
+    def run(item):
+        try:
+            for value in func(item):
+                if stop.is_set():
+                    break
+                results.put((value, None))
+        except Exception as e:
+            results.put((None, e))
+        finally:
+            connections.close_all()
+            results.put(_WORKER_DONE)
+
+    executor = ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix='ai-stream-worker')
+    try:
+        for item in items:
+            executor.submit(contextvars.copy_context().run, run, item)
+
+        running = len(items)
+        while running:
+            try:
+                outcome = results.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError(
+                    f"No AI output for {timeout}s, giving up on the stream")
+            if outcome is _WORKER_DONE:
+                running -= 1
+                continue
+            yield outcome
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
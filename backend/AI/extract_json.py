@@ -1,10 +1,199 @@
 import re
 import json
-import json5
 import logging
+from AI.telemetry import note_parse_path
 
 logger = logging.getLogger(__name__)
 
+# Where the JSON most likely starts: an array of objects, else any object, else any array
+_ARRAY_OF_OBJECTS_START = re.compile(r'\[\s*\{|\{')
+_ARRAY_START = re.compile(r'\[')
+
+# Whitespace, comments and markdown fences are all skipped between tokens
+_SKIP = re.compile(r'(?:\s+|//[^\n]*|/\*.*?\*/|```\w*)+', re.DOTALL)
+_SEPARATORS = re.compile(r'(?:\s+|//[^\n]*|/\*.*?\*/|```\w*|[,;])+', re.DOTALL)
+_WHITESPACE = re.compile(r'\s*')
+_STRING_BODY = {
+    '"': re.compile(r'(?:[^"\\]|\\.)*', re.DOTALL),
+    "'": re.compile(r"(?:[^'\\]|\\.)*", re.DOTALL),
+}
+_NUMBER = re.compile(r'-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+_BARE_KEY = re.compile(r'[^\s:=,{}\[\]"\']+')
+_BARE_VALUE = re.compile(r'[^,}\]\n]+')
+_UNESCAPED_QUOTE = re.compile(r'(?<!\\)"')
+_INVALID_ESCAPE = re.compile(r'\\(?!["\\/bfnrtu])')
+
+# Raw control characters (newlines inside strings) are allowed
+_STRING_DECODER = json.JSONDecoder(strict=False)
+
+_LITERALS = {
+    'true': True, 'false': False, 'null': None,
+    'True': True, 'False': False, 'None': None,
+}
+
+# A closing quote is only trusted when one of these follows it
+_AFTER_STRING = ',:}]'
+
+
+class _Truncated(Exception):
+    """The output ended in the middle of a value (usually the completion hit max_tokens)"""
+
+
+class _Parser:
+    """
+    Single forward scan over the output that repairs the usual LLM slips as it goes:
+    trailing or missing commas, unquoted or single-quoted keys and strings, Python literals,
+    comments, raw newlines, stray quotes inside strings and invalid escapes.
+    A broken element of an array is skipped instead of failing the whole array, and elements
+    cut off by the end of the output are dropped.
+    """
+
+    def __init__(self, text, pos):
+        self.text = text
+        self.pos = pos
+        self.length = len(text)
+
+    def _skip(self, pattern=_SKIP):
+        match = pattern.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+
+    def _peek(self):
+        return self.text[self.pos] if self.pos < self.length else ''
+
+    def value(self):
+        self._skip()
+        char = self._peek()
+        if not char:
+            raise _Truncated()
+        if char == '{':
+            return self.object()
+        if char == '[':
+            return self.array()
+        if char in _STRING_BODY:
+            return self.string()
+
+        number = _NUMBER.match(self.text, self.pos)
+        if number:
+            after = _WHITESPACE.match(self.text, number.end()).end()
+            if after >= self.length or self.text[after] in _AFTER_STRING:
+                self.pos = number.end()
+                literal = number.group()
+                return float(literal) if any(c in literal for c in '.eE') else int(literal)
+
+        # Unquoted value, up to the next delimiter
+        bare = _BARE_VALUE.match(self.text, self.pos)
+        if not bare:
+            raise ValueError(f"Unexpected {char!r} at position {self.pos}")
+        self.pos = bare.end()
+        word = bare.group().strip()
+        return _LITERALS.get(word, word)
+
+    def object(self):
+        self.pos += 1
+        result = {}
+        while True:
+            self._skip(_SEPARATORS)
+            char = self._peek()
+            if not char:
+                raise _Truncated()
+            if char == '}':
+                self.pos += 1
+                return result
+            if char == ']':
+                # Missing closing brace, let the enclosing array have its bracket
+                return result
+
+            if char in _STRING_BODY:
+                key = self.string()
+            else:
+                bare = _BARE_KEY.match(self.text, self.pos)
+                if not bare:
+                    raise ValueError(
+                        f"Expected a key at position {self.pos}")
+                self.pos = bare.end()
+                key = bare.group()
+
+            self._skip()
+            if self._peek() in (':', '='):
+                self.pos += 1
+            result[key] = self.value()
+
+    def array(self):
+        self.pos += 1
+        items = []
+        while True:
+            self._skip(_SEPARATORS)
+            char = self._peek()
+            if not char:
+                # Keep the elements that were complete
+                return items
+            if char == ']':
+                self.pos += 1
+                return items
+            if char == '}':
+                # Stray closing brace
+                self.pos += 1
+                continue
+
+            start = self.pos
+            try:
+                items.append(self.value())
+            except _Truncated:
+                return items
+            except ValueError as e:
+                logger.warning(f"Skipping malformed array element: {str(e)}")
+                # Resume at the next object, never rescan what was already read
+                resume = self.text.find('{', max(start, self.pos) + 1)
+                if resume == -1:
+                    return items
+                self.pos = resume
+
+    def string(self):
+        quote = self.text[self.pos]
+        start = self.pos + 1
+        pos = start
+        while True:
+            end = _STRING_BODY[quote].match(self.text, pos).end()
+            if end >= self.length:
+                raise _Truncated()
+            # A quote followed by more text on the same line is part of the string,
+            # unless that text is another complete string (a missing comma)
+            gap = _WHITESPACE.match(self.text, end + 1).end()
+            if gap >= self.length or self.text[gap] in _AFTER_STRING or '\n' in self.text[end + 1:gap]:
+                break
+            if self.text[gap] in _STRING_BODY and self._is_complete_string(gap):
+                break
+            pos = end + 1
+
+        self.pos = end + 1
+        return _decode_string(self.text[start:end], quote)
+
+    def _is_complete_string(self, pos):
+        quote = self.text[pos]
+        end = _STRING_BODY[quote].match(self.text, pos + 1).end()
+        if end >= self.length:
+            return False
+        after = _WHITESPACE.match(self.text, end + 1).end()
+        return after >= self.length or self.text[after] in _AFTER_STRING
+
+
+def _decode_string(raw, quote):
+    # Nothing to unescape in most strings
+    if '\\' not in raw:
+        return raw
+    if quote == "'":
+        raw = raw.replace("\\'", "'")
+    try:
+        return _STRING_DECODER.decode(f'"{raw}"')
+    except ValueError:
+        pass
+    repaired = _INVALID_ESCAPE.sub(r'\\\\', _UNESCAPED_QUOTE.sub(r'\\"', raw))
+    try:
+        return _STRING_DECODER.decode(f'"{repaired}"')
+    except ValueError:
+        return raw
+
 
 def extract_json(llm_output):
     """Extract and validate JSON from LLM output"""
@@ -12,89 +201,32 @@ def extract_json(llm_output):
         logger.info("Starting JSON extraction from AI response")
         logger.debug(f"Raw AI output: {llm_output}")
 
-        # Clean the output string
-        cleaned_output = llm_output.strip()
-
-        # Remove any markdown code block markers
-        cleaned_output = re.sub(r'```json\s*|\s*```', '', cleaned_output)
+        text = llm_output.strip()
 
-        # Find the JSON array or object
-        json_match = re.search(r'(\[.*\]|\{.*\})', cleaned_output, re.DOTALL)
-        if not json_match:
+        start_match = _ARRAY_OF_OBJECTS_START.search(
+            text) or _ARRAY_START.search(text)
+        if not start_match:
             logger.error("No JSON structure found in the output")
             raise ValueError("No JSON structure found in the output")
+        start = start_match.start()
 
-        json_str = json_match.group(1)
-
-        # Clean the JSON string
-        json_str = re.sub(r',\s*]', ']', json_str)  # Remove trailing commas
-        # Remove trailing commas in objects
-        json_str = re.sub(r',\s*}', '}', json_str)
-        # Fix missing commas between objects
-        json_str = re.sub(r'}\s*{', '},{', json_str)
-        # Fix missing commas between arrays
-        json_str = re.sub(r']\s*\[', '],[', json_str)
-
-        # Try standard JSON first
-        try:
-            logger.debug("Attempting standard JSON parsing")
-            return json.loads(json_str)
-        except json.JSONDecodeError as e:
-            logger.warning(f"Standard JSON parsing failed: {str(e)}")
-            logger.debug("Attempting json5 parsing")
-
-            # Try json5 which is more lenient
+        # Well-formed output is the common case, let the C parser have it
+        closer = ']' if text[start] == '[' else '}'
+        end = text.rfind(closer)
+        if end > start:
             try:
-                return json5.loads(json_str)
-            except Exception as json5_error:
-                logger.error(f"JSON5 parsing failed: {str(json5_error)}")
-
-                # Last resort: try to fix common JSON issues
-                try:
-                    # Fix missing quotes around keys
-                    json_str = re.sub(
-                        r'([{,])\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*:', r'\1"\2":', json_str)
-                    # Fix missing quotes around string values
-                    json_str = re.sub(
-                        r':\s*([a-zA-Z_][a-zA-Z0-9_]*)([,}])', r':"\1"\2', json_str)
-                    # Fix missing commas between array elements
-                    json_str = re.sub(r'"\s*"', '","', json_str)
-                    # Fix missing commas between object properties
-                    json_str = re.sub(r'"\s*"', '","', json_str)
-                    # Fix missing commas between objects in array
-                    json_str = re.sub(r'}\s*{', '},{', json_str)
-                    # Fix missing commas between arrays
-                    json_str = re.sub(r']\s*\[', '],[', json_str)
-                    # Fix trailing commas
-                    json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
-
-                    # Try parsing again
-                    try:
-                        return json.loads(json_str)
-                    except json.JSONDecodeError:
-                        # If still fails, try to extract just the array part
-                        array_match = re.search(
-                            r'\[(.*)\]', json_str, re.DOTALL)
-                        if array_match:
-                            array_content = array_match.group(1)
-                            # Split by object boundaries and parse each object
-                            objects = re.findall(r'\{[^{}]*\}', array_content)
-                            parsed_objects = []
-                            for obj in objects:
-                                try:
-                                    parsed_obj = json.loads(obj)
-                                    if all(key in parsed_obj for key in ['question', 'options', 'correct_answer']):
-                                        parsed_objects.append(parsed_obj)
-                                except json.JSONDecodeError:
-                                    continue
-                            if parsed_objects:
-                                return parsed_objects
+                result = json.loads(text[start:end + 1])
+                note_parse_path('json')
+                return result
+            except ValueError:
+                logger.debug("Output is not valid JSON, repairing")
 
-                    raise ValueError(
-                        f"Failed to parse JSON after fixing: {str(e)}")
-                except Exception as fix_error:
-                    logger.error(f"JSON fixing failed: {str(fix_error)}")
-                    raise ValueError(f"Failed to parse AI response: {str(e)}")
+        try:
+            result = _Parser(text, start).value()
+            note_parse_path('repaired')
+            return result
+        except _Truncated:
+            raise ValueError("The output ended before the JSON was complete")
 
     except Exception as e:
         logger.error(f"Failed to extract JSON from AI output: {str(e)}")
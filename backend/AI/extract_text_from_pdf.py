@@ -1,34 +1,146 @@
 import PyPDF2
 import logging
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from AI.pdf_text_cache import hash_pdf, get_cached_text, store_text
+from main.settings import PDF_EXTRACT_WORKERS, PDF_PARALLEL_MIN_PAGES, PDF_PAGES_PER_TASK
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the extraction output changes so stale cache entries are ignored
+EXTRACTOR_VERSION = 2
 
-def extract_text_from_pdf(pdf_file):
+_HYPHENATED_BREAK = re.compile(r'(\w)-\n(\w)')
+_SPACES = re.compile(r'[ \t\f\v\u00a0]+')
+_BLANK_LINES = re.compile(r'\n{3,}')
+
+
+def normalize_page_text(text):
+    """Join words hyphenated across lines and squeeze the whitespace PyPDF2 leaves between fragments"""
+    text = (text or "").replace('\r\n', '\n').replace('\r', '\n')
+    text = _HYPHENATED_BREAK.sub(r'\1\2', text)
+    text = "\n".join(_SPACES.sub(' ', line).strip() for line in text.split('\n'))
+    return _BLANK_LINES.sub('\n\n', text).strip()
+
+
+def _extract_page_range(pdf_path, start, stop):
+    """Extract pages [start, stop) in a pool process, each process opens its own reader"""
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [pdf_reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _iter_pages_in_pool(pdf_path, num_pages, workers):
+    """Yield page text in order while at most `workers` page batches are extracted ahead"""
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, num_pages))
+              for start in range(0, num_pages, PDF_PAGES_PER_TASK)]
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = [executor.submit(_extract_page_range, pdf_path, start, stop)
+                   for start, stop in ranges[:workers]]
+        next_range = len(pending)
+        while pending:
+            pages = pending.pop(0).result()
+            # Keep the pool busy only as far ahead as the caller might read
+            if next_range < len(ranges):
+                start, stop = ranges[next_range]
+                pending.append(executor.submit(
+                    _extract_page_range, pdf_path, start, stop))
+                next_range += 1
+            yield from pages
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_pdf_pages(pdf_file, max_chars=None, workers=None):
+    """
+    Lazily yield the text of each page of a PDF, normalized by normalize_page_text.
+
+    Args:
+        pdf_file: PDF file (can be File object, uploaded file or file path)
+        max_chars (int): Stop once the yielded pages add up to this many characters
+        workers (int): Extract large PDFs in a process pool of this size, defaults to PDF_EXTRACT_WORKERS
+
+    Yields:
+        str: Text of each page, in page order
+    """
+    # If it's a File object, get the path
+    if hasattr(pdf_file, 'path'):
+        pdf_path = pdf_file.path
+    elif hasattr(pdf_file, 'read'):
+        # Uploaded files don't have a path, read them in place
+        pdf_path = None
+    else:
+        pdf_path = pdf_file
+
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    # Daemonic processes (e.g. celery prefork workers) can't start a pool of their own
+    can_fork = not multiprocessing.current_process().daemon
+
+    file = open(pdf_path, 'rb') if pdf_path is not None else pdf_file
+    pages = None
+    try:
+        file.seek(0)
+        pdf_reader = PyPDF2.PdfReader(file)
+        num_pages = len(pdf_reader.pages)
+
+        if pdf_path is not None and workers > 1 and can_fork and num_pages >= PDF_PARALLEL_MIN_PAGES:
+            pages = _iter_pages_in_pool(pdf_path, num_pages, workers)
+        else:
+            pages = (page.extract_text() or "" for page in pdf_reader.pages)
+
+        total = 0
+        for page_text in pages:
+            page_text = normalize_page_text(page_text)
+            yield page_text
+            total += len(page_text) + 1
+            if max_chars is not None and total >= max_chars:
+                break
+    finally:
+        if pages is not None:
+            pages.close()
+        if pdf_path is not None:
+            file.close()
+        else:
+            file.seek(0)
+
+
+def extract_text_from_pdf(pdf_file, use_cache=True, max_chars=None, workers=None):
     """
     Extract text from a PDF file.
 
+    The text is cached by the file's content hash, so the same PDF is only parsed once.
+
     Args:
-        pdf_file: PDF file (can be File object or file path)
+        pdf_file: PDF file (can be File object, uploaded file or file path)
+        use_cache (bool): Read and write the extracted text cache
+        max_chars (int): Stop parsing once this many characters are extracted and truncate to it
+        workers (int): Extract large PDFs in a process pool of this size, defaults to PDF_EXTRACT_WORKERS
 
     Returns:
         Extracted text as string
     """
     try:
-        # If it's a File object, get the path
-        if hasattr(pdf_file, 'path'):
-            pdf_path = pdf_file.path
-        else:
-            pdf_path = pdf_file
+        content_hash = None
+        if use_cache:
+            content_hash = hash_pdf(pdf_file)
+            cached_text = get_cached_text(
+                content_hash, EXTRACTOR_VERSION, min_chars=max_chars)
+            if cached_text is not None:
+                logger.debug(f"PDF text cache hit: {content_hash}")
+                return cached_text[:max_chars] if max_chars else cached_text
+
+        # Extract text using PyPDF2, page by page so we can stop at the budget
+        text = "\n".join(iter_pdf_pages(
+            pdf_file, max_chars=max_chars, workers=workers)).strip()
 
-        # Extract text using PyPDF2
-        text = ""
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+        complete = max_chars is None or len(text) < max_chars
+        if content_hash:
+            store_text(content_hash, EXTRACTOR_VERSION,
+                       text, complete=complete)
 
-        return text.strip()
+        return text[:max_chars] if max_chars else text
 
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {str(e)}")
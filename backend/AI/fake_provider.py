@@ -0,0 +1,192 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+import types
+from AI.completion_cache import fingerprint
+from main.settings import (AI_FAKE_LATENCY, AI_FAKE_LATENCY_JITTER, AI_FAKE_ERROR_RATE,
+                           AI_FAKE_MALFORMED_RATE, AI_FAKE_SEED)
+
+logger = logging.getLogger(__name__)
+
+_QUESTION_COUNT = re.compile(r'generate (\d+) multiple-choice questions')
+_OPTION_COUNT = re.compile(r'EXACTLY (\d+) options')
+_MAX_GRADE = re.compile(r'maximum grade for this question is (\d+(?:\.\d+)?)')
+_CONTEXT = re.compile(r'context:\s*(.*?)\n\s*\n', re.DOTALL)
+_SOURCE_QUOTA = re.compile(r'^\s*- (S\d+): (\d+) questions', re.MULTILINE)
+_TAKEN_QUESTION = re.compile(r'^\s*- Question (\d+) about', re.MULTILINE)
+
+# Share of the latency spent before the first streamed piece
+FIRST_PIECE_SHARE = 0.3
+STREAM_PIECE_CHARS = 20
+
+
+class FakeProviderError(Exception):
+    """Shaped like the provider's HTTP errors so the client layer's retry policy applies to it"""
+
+    def __init__(self, status_code):
+        super().__init__(f"{status_code} error from the fake AI provider")
+        self.response = types.SimpleNamespace(
+            status_code=status_code, headers={})
+
+
+def make_completion(content):
+    message = types.SimpleNamespace(role='assistant', content=content)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message, finish_reason='stop')])
+
+
+def make_stream(content, delay=0.0):
+    """Yield the content in small pieces shaped like streamed chunks, delay is spread over them"""
+    pieces = [content[i:i + STREAM_PIECE_CHARS]
+              for i in range(0, len(content), STREAM_PIECE_CHARS)] or [""]
+    for piece in pieces:
+        if delay:
+            time.sleep(delay / len(pieces))
+        delta = types.SimpleNamespace(content=piece)
+        yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
+
+
+def _message_text(messages):
+    parts = []
+    for message in messages:
+        content = message.get('content') or ""
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(part.get('text', "")
+                         for part in content if part.get('type') == 'text')
+    return "\n".join(parts)
+
+
+def _has_image(messages):
+    return any(part.get('type') == 'image_url'
+               for message in messages if not isinstance(message.get('content'), str)
+               for part in message.get('content') or [])
+
+
+def _mcqs(text, rng):
+    count = int(_QUESTION_COUNT.search(text).group(1))
+    option_match = _OPTION_COUNT.search(text)
+    num_options = int(option_match.group(1)) if option_match else 4
+    context = _CONTEXT.search(text)
+    topic = " ".join((context.group(1) if context else "the text").split()[:6])
+
+    # Combined requests get the questions of each source in turn, labelled with it
+    sources = [label for label, quota in _SOURCE_QUOTA.findall(text)
+               for _ in range(int(quota))]
+
+    # Follow-up requests list the questions already taken, number the new ones after them
+    first = max((int(number) for number in _TAKEN_QUESTION.findall(text)), default=0)
+
+    questions = []
+    for i in range(first, first + count):
+        options = [f"Option {chr(65 + j)} of question {i + 1}" for j in range(num_options)]
+        question = {
+            'question': f"Question {i + 1} about {topic}?",
+            'options': options,
+            'correct_answer': rng.choice(options),
+        }
+        if i - first < len(sources):
+            question['source'] = sources[i - first]
+        questions.append(question)
+    return questions
+
+
+def _evaluation(text, rng):
+    match = _MAX_GRADE.search(text)
+    max_grade = float(match.group(1)) if match else 10.0
+    return {
+        'answer_key': "The expected answer",
+        'extracted_text': "The student's handwritten answer",
+        'score': round(rng.uniform(0, max_grade), 1),
+        'feedback': "Generated by the fake AI provider",
+    }
+
+
+def _malform(content, rng):
+    """Break the JSON the way models do, the parsers are expected to cope"""
+    choice = rng.randrange(4)
+    if choice == 0:
+        return f"Here are the results:\n```json\n{content}\n```"
+    if choice == 1:
+        return re.sub(r'(["\d\]])(\s*[}\]])', r'\1,\2', content, count=3)
+    if choice == 2:
+        return content.replace('"', "'")
+    # Cut off as if max_tokens was hit
+    return content[:max(1, int(len(content) * 0.8))]
+
+
+class FakeInferenceClient:
+    """
+    Offline stand-in for InferenceClient, selected with AI_PROVIDER=fake.
+
+    Answers MCQ generation prompts with the requested number of templated questions and
+    handwritten evaluation prompts with a random score, after AI_FAKE_LATENCY seconds.
+    AI_FAKE_ERROR_RATE of the calls fail with a 503 or 429 and AI_FAKE_MALFORMED_RATE
+    return broken JSON, or a question with an option missing when the response_format asks
+    for a json_schema. Outcomes are seeded by AI_FAKE_SEED and the request, so a run
+    is reproducible whatever order concurrent calls arrive in.
+    """
+
+    def __init__(self, timeout=None, latency=AI_FAKE_LATENCY, latency_jitter=AI_FAKE_LATENCY_JITTER,
+                 error_rate=AI_FAKE_ERROR_RATE, malformed_rate=AI_FAKE_MALFORMED_RATE, seed=AI_FAKE_SEED):
+        self.timeout = timeout
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.seed = seed
+        self._seen = {}
+        self._lock = threading.Lock()
+        self.chat = types.SimpleNamespace(
+            completions=types.SimpleNamespace(create=self.create))
+
+    def _rng(self, key):
+        # Retries of a request get their own draw, otherwise a failed call would fail forever
+        with self._lock:
+            attempt = self._seen.get(key, 0)
+            self._seen[key] = attempt + 1
+        return random.Random(f"{self.seed}:{key}:{attempt}")
+
+    def create(self, model, messages, temperature=None, max_tokens=None, stream=False, **kwargs):
+        rng = self._rng(fingerprint(model, messages, temperature,
+                        max_tokens, kwargs.get('response_format')))
+        latency = max(0.0, self.latency *
+                      (1 + self.latency_jitter * rng.uniform(-1, 1)))
+        if self.timeout and latency > self.timeout:
+            time.sleep(self.timeout)
+            raise TimeoutError(
+                f"Fake AI provider timed out after {self.timeout}s")
+
+        if rng.random() < self.error_rate:
+            time.sleep(latency * FIRST_PIECE_SHARE)
+            raise FakeProviderError(rng.choice([503, 429]))
+
+        text = _message_text(messages)
+        response_format = kwargs.get('response_format')
+        if _has_image(messages):
+            payload = _evaluation(text, rng)
+        elif _QUESTION_COUNT.search(text):
+            payload = _mcqs(text, rng)
+        else:
+            payload = {'response': "Fake AI provider response"}
+
+        if response_format and response_format.get('type') == 'json_schema':
+            # Decoding is constrained, the JSON is always well formed but a question can still be wrong
+            if isinstance(payload, list):
+                if payload and rng.random() < self.malformed_rate:
+                    payload[rng.randrange(len(payload))]['options'].pop()
+                payload = {'questions': payload}
+            content = json.dumps(payload)
+        else:
+            content = json.dumps(payload)
+            if rng.random() < self.malformed_rate:
+                content = _malform(content, rng)
+
+        if stream:
+            time.sleep(latency * FIRST_PIECE_SHARE)
+            return make_stream(content, latency * (1 - FIRST_PIECE_SHARE))
+        time.sleep(latency)
+        return make_completion(content)
@@ -1,135 +1,418 @@
 from AI.extract_json import extract_json
 from AI.mcq_prompt import get_mcq_prompt
-from AI.AI import AI
+from AI.AI import AI, AI_stream
+from AI.chunk_text import estimate_prompt_tokens, split_into_chunks, spread_chunks, allocate_questions
+from AI.concurrency import run_in_pool, iter_in_pool
+from AI.mcq_stream_parser import MCQStreamParser
+from AI.mcq_sources import SourceAttributor, combine_sources, source_quotas
+from main.settings import (AI_CONTEXT_TOKENS, AI_CHARS_PER_TOKEN, AI_MAX_CHUNKS, AI_MAX_QUESTIONS_PER_REQUEST,
+                           AI_STRUCTURED_MAX_FOLLOWUPS)
 import logging
-from AI.AIError import AIError
+from AI.AIError import AIError, AIUnavailableError
+from AI.baseAIClient import structured_output_enabled
+from AI.mcq_schema import mcq_response_format, mcq_problem
+from AI.model_router import select_models, TEXT_MCQ
+from AI.telemetry import track_ai_call, note_parse_path
+import json
 
 
 logger = logging.getLogger(__name__)
 
+# Completion budget of a single generation request
+MAX_COMPLETION_TOKENS = 1000
 
-def generate_mcqs_from_text(text, number_of_questions=10, difficulty='3', num_options=4):
+# Most text (in characters) worth extracting for generation, enough to fill AI_MAX_CHUNKS requests
+MAX_TEXT_LENGTH = int(AI_MAX_CHUNKS * AI_CONTEXT_TOKENS * AI_CHARS_PER_TOKEN)
+
+# Map difficulty level to description
+DIFFICULTY_MAP = {
+    '1': 'Very Easy',
+    '2': 'Easy',
+    '3': 'Medium',
+    '4': 'Hard',
+    '5': 'Very Hard'
+}
+
+# Prepare difficulty requirements based on level
+DIFFICULTY_REQUIREMENTS = {
+    'Very Easy': '- Focus on basic facts and definitions\n- Use simple, direct language\n- Make correct answer obvious\n- Avoid complex concepts',
+    'Easy': '- Include some basic application questions\n- Use clear, straightforward language\n- Make correct answer fairly obvious\n- Include some simple concept questions',
+    'Medium': '- Mix factual recall with understanding\n- Include some application questions\n- Use moderately complex language\n- Make distractors plausible',
+    'Hard': '- Focus on deeper understanding\n- Include analysis and application\n- Use more complex language\n- Make distractors very plausible',
+    'Very Hard': '- Focus on complex analysis and synthesis\n- Include higher-order thinking\n- Use sophisticated language\n- Make all options very plausible'
+}
+
+# Adjust temperature based on difficulty
+TEMPERATURE_MAP = {
+    '1': 0.75,  # Lower temperature for more consistent, easier questions
+    '2': 0.8,
+    '3': 0.85,
+    '4': 0.9,
+    '5': 0.95   # Higher temperature for more creative, harder questions
+}
+
+
+def _sources_requirements(source_quotas):
+    """Prompt section asking for each source's share of the questions, empty for a single source"""
+    if not source_quotas:
+        return ""
+    quotas = "\n".join(
+        f"    - {label}: {count} questions" for label, count in source_quotas)
+    return f"""
+    SOURCES:
+    The context is made of {len(source_quotas)} sources, each starting with a [Source <label>] line.
+    Write each question from a single source and generate exactly this many questions from each source:
+{quotas}
+    Set "source" of every question to the label of its source.
+"""
+
+
+def build_mcq_prompt(text, number_of_questions, difficulty_desc, num_options, source_quotas=None):
+    """
+    Fill the MCQ prompt template with the context and generation requirements
+
+    With source_quotas the context is several sources combined by combine_sources, and each
+    question has to name the source it was written from.
+    Args:
+        source_quotas (list): (label, number_of_questions) pairs, one for each source in the context
+    """
+    # Get a fresh copy of the prompt template
+    prompt = get_mcq_prompt()
+
+    source_field = ""
+    if source_quotas:
+        source_field = ',\n      "source": "<label of the source the question is based on>"'
+    sources_requirements = _sources_requirements(source_quotas)
+
+    # Update the prompt with the text and add variability instructions
+    prompt[1]['content'] = f"""
+    context: {text}
+
+    Based on the provided context, generate {number_of_questions} multiple-choice questions at {difficulty_desc} difficulty level. Your response must be strictly in the following JSON format:
+
+    [{{"question": "<question text>",
+      "options": ["<option 1>", "<option 2>", "<option 3>", "<option 4>", "<option 5>", "<option 6>"],
+      "correct_answer": "<exact text of the correct option>"{source_field}}}]
+{sources_requirements}
+    CRITICAL REQUIREMENTS:
+    1. Return ONLY the JSON array, no other text
+    2. VERY IMPORTANT: Ensure that the response is in the JSON format.
+    3. Double check that the response is in the JSON format.
+    4. Ensure the number of questions is {number_of_questions} - no more, no less
+    5. VERY IMPORTANT: Ensure the number of questions is {number_of_questions} - no more, no less
+    6. Double check the number of questions is {number_of_questions} - no more, no less
+    7. Each question MUST have EXACTLY {num_options} options - no more, no less
+    8. Double check the number of options is {num_options} - no more, no less
+    9. The correct_answer MUST match EXACTLY one of the options
+    10. Double check the correct answer is in the options
+    11. you MUST Double check the correct answer is in the options
+    12. Each option MUST be a string
+    13. The options array MUST contain EXACTLY {num_options} strings
+    14. Do not include any explanations or additional text
+    15. Ensure the JSON is valid and properly formatted
+    16. Use double quotes for all strings
+    17. Do not include any trailing commas
+    18. Do not include any comments or markdown formatting
+    19. IMPORTANT: You MUST generate EXACTLY {num_options} options for each question
+    20. DOUBLE CHECK: You MUST generate EXACTLY {num_options} options for each question
+
+    DIFFICULTY REQUIREMENTS:
+    For {difficulty_desc} level questions:
+    {DIFFICULTY_REQUIREMENTS[difficulty_desc]}
+
+    VARIABILITY REQUIREMENTS:
+    1. Generate questions that test different aspects of the content
+    2. Use various question types (definition, application, analysis, etc.)
+    3. Vary the complexity and depth of questions
+    4. Ensure distractors are plausible but clearly incorrect
+    5. Avoid similar question structures or patterns
+    6. Mix both direct and indirect questions
+    7. Include questions that test both factual recall and understanding
+
+    Example of valid response with {num_options} options:
+    [
+        {{
+            "question": "What is the capital of France?",
+            "options": ["a) London", "b) Berlin", "c) Paris", "d) Madrid", "e) Rome", "f) Vienna"][:num_options],
+            "correct_answer": "c) Paris"
+        }}
+    ]
+    """
+    return prompt
+
+
+def build_structured_mcq_prompt(text, number_of_questions, difficulty_desc, num_options, source_quotas=None,
+                                avoid=None):
+    """
+    Prompt for schema-constrained generation, the response format is enforced by the provider
+    so it isn't spelled out and repeated in the prompt
+    Args:
+        source_quotas (list): (label, number_of_questions) pairs, one for each source in the context
+        avoid (list): Questions already generated that must not come back
+    """
+    prompt = get_mcq_prompt()
+
+    avoid_requirements = ""
+    if avoid:
+        questions = "\n".join(f"    - {question}" for question in avoid)
+        avoid_requirements = f"""
+    Do not repeat or rephrase these questions, they are already taken:
+{questions}
+"""
+
+    prompt[1]['content'] = f"""
+    context: {text}
+
+    Based on the provided context, generate {number_of_questions} multiple-choice questions at {difficulty_desc} difficulty level.
+    Each question has EXACTLY {num_options} options and correct_answer is the exact text of one of them.
+{_sources_requirements(source_quotas)}
+    DIFFICULTY REQUIREMENTS:
+    For {difficulty_desc} level questions:
+    {DIFFICULTY_REQUIREMENTS[difficulty_desc]}
+
+    VARIABILITY REQUIREMENTS:
+    Test different aspects of the content with varied question types (definition, application, analysis),
+    and make the distractors plausible but clearly incorrect.
+{avoid_requirements}"""
+    return prompt
+
+
+def chunk_token_budget(number_of_questions, difficulty_desc, num_options):
+    """Tokens of context that fit in one request next to the instructions and the completion"""
+    instructions = estimate_prompt_tokens(build_mcq_prompt(
+        "", number_of_questions, difficulty_desc, num_options))
+    return AI_CONTEXT_TOKENS - MAX_COMPLETION_TOKENS - instructions
+
+
+def adjust_options(mcq, num_options):
+    """Truncate or pad a question's options to exactly num_options"""
+    if len(mcq['options']) != num_options:
+        logger.warning(
+            f"Question has {len(mcq['options'])} options instead of {num_options}, adjusting...")
+        # If too many options, truncate
+        if len(mcq['options']) > num_options:
+            mcq['options'] = mcq['options'][:num_options]
+        # If too few options, add more
+        while len(mcq['options']) < num_options:
+            mcq['options'].append(
+                f"Option {chr(65 + len(mcq['options']))}")
+    return mcq
+
+
+def plan_chunks(text, number_of_questions, difficulty='3', num_options=4):
+    """
+    Split text into request-sized chunks and share the questions out across them
+    Returns:
+        list: (chunk, number_of_questions) pairs in document order, chunks without questions are dropped
+    """
+    difficulty_desc = DIFFICULTY_MAP.get(difficulty, 'Medium')
+
+    budget = chunk_token_budget(
+        number_of_questions, difficulty_desc, num_options)
+    if budget <= 0:
+        raise AIError(
+            "AI_CONTEXT_TOKENS is too small to fit the generation prompt")
+
+    # Never ask for more chunks than there are questions to spread over them
+    chunks = split_into_chunks(text, budget)
+    limit = max(1, min(AI_MAX_CHUNKS, number_of_questions))
+    if len(chunks) > limit:
+        logger.warning(
+            f"Text split into {len(chunks)} chunks, sampling {limit} across the document")
+        chunks = spread_chunks(chunks, limit)
+
+    jobs = [(chunk, count) for chunk, count in zip(
+        chunks, allocate_questions(chunks, number_of_questions)) if count]
     logger.info(
-        f"Generating {number_of_questions} MCQs from text with difficulty level {difficulty} and {num_options} options per question")
+        f"Planned {number_of_questions} MCQs over {len(jobs)} chunk(s) of at most {budget} tokens")
+    return jobs
+
+
+def _fits_one_request(batch, difficulty_desc, num_options):
+    """Whether the (key, text, number_of_questions) sources of batch fit in a single request"""
+    total = sum(count for _, _, count in batch)
+    if len(batch) == 1:
+        prompt = build_mcq_prompt(batch[0][1], total, difficulty_desc, num_options)
+    else:
+        if total > AI_MAX_QUESTIONS_PER_REQUEST:
+            return False
+        prompt = build_mcq_prompt(
+            combine_sources([text for _, text, _ in batch]), total, difficulty_desc, num_options,
+            source_quotas=source_quotas([(key, count) for key, _, count in batch]))
+    return estimate_prompt_tokens(prompt) + MAX_COMPLETION_TOKENS <= AI_CONTEXT_TOKENS
+
+
+def plan_source_batches(sources, difficulty='3', num_options=4):
     """
-    Generate MCQs from text using AI
+    Plan the requests for generating questions from several sources (e.g. lectures).
+
+    Sources with small quotas are packed together into shared requests up to the context budget
+    and AI_MAX_QUESTIONS_PER_REQUEST questions, so eight lectures with a question or two each
+    cost one or two round trips instead of eight. A source too long to share a request is
+    chunked on its own like plan_chunks does.
     Args:
-        text (str): Input text to generate questions from
-        num_questions (int): Number of questions to generate
-        seed (int): Optional seed for randomization to ensure different questions per student
+        sources (list): (key, text, number_of_questions) triples, sources without questions are skipped
         difficulty (str): Difficulty level ('1'=Very Easy, '2'=Easy, '3'=Medium, '4'=Hard, '5'=Very Hard)
-        num_options (int): Number of options per question (2-4, default=4)
+        num_options (int): Number of options per question
     Returns:
-        list: List of MCQ dictionaries
+        list: (text, number_of_questions, sources) jobs, sources being the (key, number_of_questions)
+        pairs that share the request in the order of the context
     """
+    difficulty_desc = DIFFICULTY_MAP.get(difficulty, 'Medium')
+
+    jobs = []
+    batches = []
+    for key, text, count in sources:
+        if not count or not text:
+            continue
+        if count > AI_MAX_QUESTIONS_PER_REQUEST or \
+                not _fits_one_request([(key, text, count)], difficulty_desc, num_options):
+            # Too long or asks too much to share a request, chunked on its own
+            jobs.extend((chunk, chunk_count, [(key, chunk_count)])
+                        for chunk, chunk_count in plan_chunks(text, count, difficulty, num_options))
+            continue
+
+        # First fit: the earliest open request with room for it
+        for batch in batches:
+            if _fits_one_request(batch + [(key, text, count)], difficulty_desc, num_options):
+                batch.append((key, text, count))
+                break
+        else:
+            batches.append([(key, text, count)])
+
+    for batch in batches:
+        if len(batch) == 1:
+            key, text, count = batch[0]
+            jobs.append((text, count, [(key, count)]))
+        else:
+            jobs.append((combine_sources([text for _, text, _ in batch]),
+                         sum(count for _, _, count in batch),
+                         [(key, count) for key, _, count in batch]))
+
+    logger.info(
+        f"Planned {sum(job[1] for job in jobs)} MCQs from {len(sources)} source(s) in {len(jobs)} request(s)")
+    return jobs
+
+
+def _structured_questions(content):
+    """The questions of a schema-constrained response, tolerating providers that only loosely follow it"""
     try:
-        logger.info(
-            f"Generating {number_of_questions} MCQs from text with difficulty level {difficulty} and {num_options} options per question")
-
-        # Map difficulty level to description
-        difficulty_map = {
-            '1': 'Very Easy',
-            '2': 'Easy',
-            '3': 'Medium',
-            '4': 'Hard',
-            '5': 'Very Hard'
-        }
-        difficulty_desc = difficulty_map.get(difficulty, 'Medium')
-
-        # Check if text is too large and truncate if necessary
-        # Increased from 5000 to match the limit in generate_mcqs_from_multiple_pdfs
-        max_text_length = 35000
-        if len(text) > max_text_length:
-            logger.warning(
-                f"Text length ({len(text)}) exceeds maximum ({max_text_length}). Truncating...")
-            text = text[:max_text_length]
-
-        # Prepare difficulty requirements based on level
-        difficulty_requirements = {
-            'Very Easy': '- Focus on basic facts and definitions\n- Use simple, direct language\n- Make correct answer obvious\n- Avoid complex concepts',
-            'Easy': '- Include some basic application questions\n- Use clear, straightforward language\n- Make correct answer fairly obvious\n- Include some simple concept questions',
-            'Medium': '- Mix factual recall with understanding\n- Include some application questions\n- Use moderately complex language\n- Make distractors plausible',
-            'Hard': '- Focus on deeper understanding\n- Include analysis and application\n- Use more complex language\n- Make distractors very plausible',
-            'Very Hard': '- Focus on complex analysis and synthesis\n- Include higher-order thinking\n- Use sophisticated language\n- Make all options very plausible'
-        }
-
-        # Get a fresh copy of the prompt template
-        prompt = get_mcq_prompt()
-
-        # Update the prompt with the text and add variability instructions
-        prompt[1]['content'] = f"""
-        context: {text}
-
-        Based on the provided context, generate {number_of_questions} multiple-choice questions at {difficulty_desc} difficulty level. Your response must be strictly in the following JSON format:
-
-        [{{"question": "<question text>",
-          "options": ["<option 1>", "<option 2>", "<option 3>", "<option 4>", "<option 5>", "<option 6>"],
-          "correct_answer": "<exact text of the correct option>"}}]
-
-        CRITICAL REQUIREMENTS:
-        1. Return ONLY the JSON array, no other text
-        2. VERY IMPORTANT: Ensure that the response is in the JSON format.
-        3. Double check that the response is in the JSON format.
-        4. Ensure the number of questions is {number_of_questions} - no more, no less
-        5. VERY IMPORTANT: Ensure the number of questions is {number_of_questions} - no more, no less
-        6. Double check the number of questions is {number_of_questions} - no more, no less
-        7. Each question MUST have EXACTLY {num_options} options - no more, no less
-        8. Double check the number of options is {num_options} - no more, no less
-        9. The correct_answer MUST match EXACTLY one of the options
-        10. Double check the correct answer is in the options
-        11. you MUST Double check the correct answer is in the options
-        12. Each option MUST be a string
-        13. The options array MUST contain EXACTLY {num_options} strings
-        14. Do not include any explanations or additional text
-        15. Ensure the JSON is valid and properly formatted
-        16. Use double quotes for all strings
-        17. Do not include any trailing commas
-        18. Do not include any comments or markdown formatting
-        19. IMPORTANT: You MUST generate EXACTLY {num_options} options for each question
-        20. DOUBLE CHECK: You MUST generate EXACTLY {num_options} options for each question
-
-        DIFFICULTY REQUIREMENTS:
-        For {difficulty_desc} level questions:
-        {difficulty_requirements[difficulty_desc]}
-
-        VARIABILITY REQUIREMENTS:
-        1. Generate questions that test different aspects of the content
-        2. Use various question types (definition, application, analysis, etc.)
-        3. Vary the complexity and depth of questions
-        4. Ensure distractors are plausible but clearly incorrect
-        5. Avoid similar question structures or patterns
-        6. Mix both direct and indirect questions
-        7. Include questions that test both factual recall and understanding
-
-        Example of valid response with {num_options} options:
-        [
-            {{
-                "question": "What is the capital of France?",
-                "options": ["a) London", "b) Berlin", "c) Paris", "d) Madrid", "e) Rome", "f) Vienna"][:num_options],
-                "correct_answer": "c) Paris"
-            }}
-        ]
-        """
-
-        # Adjust temperature based on difficulty
-        temperature_map = {
-            '1': 0.75,  # Lower temperature for more consistent, easier questions
-            '2': 0.8,
-            '3': 0.85,
-            '4': 0.9,
-            '5': 0.95   # Higher temperature for more creative, harder questions
-        }
-        temperature = temperature_map.get(difficulty, 0.8)
+        data = json.loads(content)
+        note_parse_path('structured')
+    except ValueError:
+        data = extract_json(content)
+    if isinstance(data, dict):
+        data = data.get('questions')
+    return data if isinstance(data, list) else []
 
-        # Make API call to generate MCQs with difficulty-adjusted parameters
-        logger.debug(
-            f"Making API call to generate MCQs with difficulty {difficulty_desc} and {num_options} options")
+
+def generate_mcqs_structured(text, number_of_questions, difficulty='3', num_options=4, use_cache=False,
+                             regenerate=False, source_quotas=None, task=TEXT_MCQ):
+    """
+    Generate MCQs with the response constrained to a JSON schema of exactly the requested questions.
+
+    Every question is still checked against the schema. Only the questions missing or invalid after
+    a response (per source for combined sources) are asked for again, up to AI_STRUCTURED_MAX_FOLLOWUPS
+    times, instead of retrying the whole request.
+    Args:
+        source_quotas (list): (label, number_of_questions) of each source combined in text
+    Returns:
+        list: Valid MCQ dictionaries, labelled with their source when source_quotas is given
+    """
+    models = select_models(task, difficulty, number_of_questions)
+    difficulty_desc = DIFFICULTY_MAP.get(difficulty, 'Medium')
+    temperature = TEMPERATURE_MAP.get(difficulty, 0.8)
+    missing = dict(source_quotas) if source_quotas else {None: number_of_questions}
+
+    accepted = []
+    for followup in range(AI_STRUCTURED_MAX_FOLLOWUPS + 1):
+        quotas = [(label, count) for label, count in missing.items() if count] if source_quotas else None
+        wanted = sum(missing.values())
+        prompt = build_structured_mcq_prompt(
+            text, wanted, difficulty_desc, num_options, source_quotas=quotas,
+            avoid=[mcq['question'] for mcq in accepted])
+        completion = AI(temperature, prompt, max_tokens=MAX_COMPLETION_TOKENS,
+                        use_cache=use_cache, regenerate=regenerate, models=models,
+                        response_format=mcq_response_format(
+                            wanted, num_options, [label for label, _ in quotas] if quotas else None))
+
+        problems = []
+        taken = {mcq['question'] for mcq in accepted}
+        for mcq in _structured_questions(completion.choices[0].message.content):
+            problem = mcq_problem(mcq, num_options, list(missing) if source_quotas else None)
+            label = mcq.get('source') if source_quotas and problem is None else None
+            if problem is None and mcq['question'] in taken:
+                problem = "duplicate question"
+            if problem is None and not missing.get(label):
+                problem = "more questions than asked for"
+            if problem is not None:
+                problems.append(problem)
+                continue
+            if not source_quotas:
+                mcq.pop('source', None)
+            missing[label] -= 1
+            taken.add(mcq['question'])
+            accepted.append(mcq)
+
+        if not any(missing.values()):
+            break
+        logger.warning(
+            f"Structured response is {sum(missing.values())} question(s) short ({', '.join(problems) or 'too few'})"
+            f"{', asking for them again' if followup < AI_STRUCTURED_MAX_FOLLOWUPS else ''}")
+
+    return accepted
+
+
+def generate_mcqs_from_chunk(text, number_of_questions, difficulty='3', num_options=4, use_cache=False,
+                             regenerate=False, source_quotas=None, task=TEXT_MCQ):
+    """
+    Generate MCQs from a chunk of text that fits in a single AI request
+    Args:
+        text (str): Input text, at most chunk_token_budget tokens
+        number_of_questions (int): Number of questions to generate
+        difficulty (str): Difficulty level ('1'=Very Easy, '2'=Easy, '3'=Medium, '4'=Hard, '5'=Very Hard)
+        num_options (int): Number of options per question (2-4, default=4)
+        use_cache (bool): Answer identical requests from the AI completion cache
+        regenerate (bool): Skip the cache lookup and replace the cached completion
+        source_quotas (list): (label, number_of_questions) of each source combined in text, the
+            questions then carry the label of their source and are not cut to number_of_questions
+        task (str): What the text comes from, TEXT_MCQ or PDF_MCQ, picks the model with difficulty
+            and number_of_questions
+    Returns:
+        list: List of MCQ dictionaries, empty if the response was not a list
+    """
+    with track_ai_call('generate_mcqs'):
+        if structured_output_enabled():
+            try:
+                mcqs = generate_mcqs_structured(
+                    text, number_of_questions, difficulty=difficulty, num_options=num_options,
+                    use_cache=use_cache, regenerate=regenerate, source_quotas=source_quotas, task=task)
+            except AIUnavailableError:
+                raise
+            except AIError as e:
+                # E.g. the model behind the provider rejects response_format
+                logger.warning(
+                    f"Structured MCQ generation failed, falling back to a plain request: {str(e)}")
+            else:
+                if mcqs:
+                    return mcqs
+                # E.g. a provider that accepts response_format but ignores the schema
+                logger.warning(
+                    "Structured MCQ generation returned no valid questions, falling back to a plain request")
+
+        difficulty_desc = DIFFICULTY_MAP.get(difficulty, 'Medium')
+        prompt = build_mcq_prompt(
+            text, number_of_questions, difficulty_desc, num_options, source_quotas=source_quotas)
+        temperature = TEMPERATURE_MAP.get(difficulty, 0.8)
 
         # Make API call to generate MCQs with difficulty-adjusted parameters
+        logger.debug(
+            f"Making API call to generate {number_of_questions} MCQs with difficulty {difficulty_desc} and {num_options} options")
         max_retries = 4
-        max_tokens = 1000
-        completion = AI(temperature, prompt, text,
-                        max_tokens=max_tokens, max_retries=max_retries)
+        completion = AI(temperature, prompt,
+                        max_tokens=MAX_COMPLETION_TOKENS, max_retries=max_retries,
+                        use_cache=use_cache, regenerate=regenerate,
+                        models=select_models(task, difficulty, number_of_questions))
 
         logger.debug("Extracting JSON from AI response")
         for attempt in range(max_retries):
@@ -145,6 +428,88 @@ def generate_mcqs_from_text(text, number_of_questions=10, difficulty='3', num_op
 
         if not isinstance(mcq_data, list):
             logger.error("Invalid response format: not a list")
+            note_parse_path('invalid')
+            return []
+
+        # Validate number of options in each question
+        for mcq in mcq_data:
+            adjust_options(mcq, num_options)
+
+        if source_quotas:
+            # Cut per source by the caller, the AI may have overshot one source and not another
+            return mcq_data
+        return mcq_data[:number_of_questions]
+
+
+def generate_mcqs_from_job(job, difficulty='3', num_options=4, use_cache=False, regenerate=False, task=TEXT_MCQ):
+    """
+    Generate the questions of a job planned by plan_source_batches
+    Returns:
+        list: (source key, MCQ dictionary) pairs, at most each source's quota
+    """
+    text, number_of_questions, sources = job
+    mcqs = generate_mcqs_from_chunk(
+        text, number_of_questions, difficulty=difficulty, num_options=num_options,
+        use_cache=use_cache, regenerate=regenerate,
+        source_quotas=source_quotas(sources) if len(sources) > 1 else None, task=task)
+
+    attributor = SourceAttributor(sources)
+    attributed = []
+    for mcq in mcqs:
+        key = attributor.assign(mcq)
+        if key is not None:
+            attributed.append((key, mcq))
+    return attributed
+
+
+def generate_mcqs_from_text(text, number_of_questions=10, difficulty='3', num_options=4, max_workers=None,
+                            fallback=True, use_cache=False, regenerate=False, task=TEXT_MCQ):
+    logger.info(
+        f"Generating {number_of_questions} MCQs from text with difficulty level {difficulty} and {num_options} options per question")
+    """
+    Generate MCQs from text using AI
+
+    Text longer than one request is split into chunks, the questions are shared out across the
+    chunks by length and each chunk is generated in its own worker, then merged in document order.
+    Args:
+        text (str): Input text to generate questions from
+        num_questions (int): Number of questions to generate
+        difficulty (str): Difficulty level ('1'=Very Easy, '2'=Easy, '3'=Medium, '4'=Hard, '5'=Very Hard)
+        num_options (int): Number of options per question (2-4, default=4)
+        max_workers (int): Number of chunks generated at once, defaults to AI_MAX_WORKERS
+        fallback (bool): Return a sample question instead of failing when the response had no questions
+        use_cache (bool): Answer identical requests from the AI completion cache
+        regenerate (bool): Skip the cache lookup and replace the cached completions
+        task (str): TEXT_MCQ, or PDF_MCQ for text extracted from a PDF, see select_models
+    Returns:
+        list: List of MCQ dictionaries
+    """
+    try:
+        difficulty_desc = DIFFICULTY_MAP.get(difficulty, 'Medium')
+        jobs = plan_chunks(text, number_of_questions, difficulty, num_options)
+
+        outcomes = run_in_pool(
+            lambda job: generate_mcqs_from_chunk(
+                job[0], job[1], difficulty=difficulty, num_options=num_options,
+                use_cache=use_cache, regenerate=regenerate, task=task),
+            jobs,
+            max_workers=max_workers,
+        )
+
+        mcq_data = []
+        errors = []
+        for mcqs, error in outcomes:
+            if error is not None:
+                logger.error(f"Chunk generation failed: {str(error)}")
+                errors.append(error)
+                continue
+            mcq_data.extend(mcqs)
+
+        if not mcq_data:
+            if errors:
+                raise errors[0]
+            if not fallback:
+                raise AIError("The AI response did not contain any questions")
             # Return default questions as fallback for invalid format
             return [
                 {
@@ -154,19 +519,6 @@ def generate_mcqs_from_text(text, number_of_questions=10, difficulty='3', num_op
                 }
             ]
 
-        # Validate number of options in each question
-        for mcq in mcq_data:
-            if len(mcq['options']) != num_options:
-                logger.warning(
-                    f"Question has {len(mcq['options'])} options instead of {num_options}, adjusting...")
-                # If too many options, truncate
-                if len(mcq['options']) > num_options:
-                    mcq['options'] = mcq['options'][:num_options]
-                # If too few options, add more
-                while len(mcq['options']) < num_options:
-                    mcq['options'].append(
-                        f"Option {chr(65 + len(mcq['options']))}")
-
         logger.info(
             f"Successfully generated {len(mcq_data)} MCQs at {difficulty_desc} difficulty with {num_options} options each")
         return mcq_data[:number_of_questions]
@@ -174,3 +526,78 @@ def generate_mcqs_from_text(text, number_of_questions=10, difficulty='3', num_op
     except Exception as e:
         logger.error(f"MCQ generation error: {str(e)}")
         raise ValueError(f"Failed to generate MCQs: {str(e)}")
+
+
+def stream_mcqs_from_chunk(text, number_of_questions, difficulty='3', num_options=4, sources=None, task=TEXT_MCQ):
+    """
+    Generate MCQs from a chunk of text, yielding each question as soon as the AI finishes writing it
+    Args:
+        text (str): Input text, at most chunk_token_budget tokens
+        number_of_questions (int): Number of questions to generate
+        difficulty (str): Difficulty level ('1'=Very Easy, '2'=Easy, '3'=Medium, '4'=Hard, '5'=Very Hard)
+        num_options (int): Number of options per question (2-4, default=4)
+        sources (list): (key, number_of_questions) of each source combined in text, see plan_source_batches
+        task (str): TEXT_MCQ or PDF_MCQ, see select_models
+    Yields:
+        dict: MCQ with question, options and correct_answer, and the key of its source when sources is given
+    """
+    with track_ai_call('stream_mcqs'):
+        difficulty_desc = DIFFICULTY_MAP.get(difficulty, 'Medium')
+        prompt = build_mcq_prompt(
+            text, number_of_questions, difficulty_desc, num_options,
+            source_quotas=source_quotas(sources) if sources and len(sources) > 1 else None)
+        temperature = TEMPERATURE_MAP.get(difficulty, 0.8)
+
+        attributor = SourceAttributor(sources) if sources else None
+        parser = MCQStreamParser()
+        emitted = 0
+        for piece in AI_stream(temperature, prompt, max_tokens=MAX_COMPLETION_TOKENS,
+                               models=select_models(task, difficulty, number_of_questions)):
+            for mcq in parser.feed(piece):
+                if not isinstance(mcq, dict) or not mcq.get('question') or not isinstance(mcq.get('options'), list) \
+                        or 'correct_answer' not in mcq:
+                    logger.warning(f"Skipping malformed question in AI stream: {mcq}")
+                    continue
+                if attributor:
+                    key = attributor.assign(mcq)
+                    if key is None:
+                        continue
+                    mcq['source'] = key
+                yield adjust_options(mcq, num_options)
+                emitted += 1
+                if emitted >= number_of_questions:
+                    return
+
+
+def stream_mcqs(jobs, difficulty='3', num_options=4, max_workers=None, task=TEXT_MCQ):
+    """
+    Stream MCQs for planned chunks, generating the chunks in parallel
+    Args:
+        jobs (list): (chunk, number_of_questions) pairs from plan_chunks, or jobs from plan_source_batches
+        difficulty (str): Difficulty level ('1'=Very Easy, '2'=Easy, '3'=Medium, '4'=Hard, '5'=Very Hard)
+        num_options (int): Number of options per question (2-4, default=4)
+        max_workers (int): Number of chunks generated at once, defaults to AI_MAX_WORKERS
+        task (str): TEXT_MCQ or PDF_MCQ, see select_models
+    Yields:
+        dict: MCQs in the order the AI finishes them, across all chunks
+    Raises:
+        ValueError: If every chunk failed before producing a question
+    """
+    emitted = 0
+    errors = []
+    for mcq, error in iter_in_pool(
+        lambda job: stream_mcqs_from_chunk(
+            job[0], job[1], difficulty=difficulty, num_options=num_options,
+            sources=job[2] if len(job) > 2 else None, task=task),
+        jobs,
+        max_workers=max_workers,
+    ):
+        if error is not None:
+            logger.error(f"Chunk stream failed: {str(error)}")
+            errors.append(error)
+            continue
+        emitted += 1
+        yield mcq
+
+    if not emitted and errors:
+        raise ValueError(f"Failed to generate MCQs: {str(errors[0])}")
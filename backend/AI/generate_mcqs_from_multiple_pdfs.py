@@ -1,78 +1,131 @@
 from AI.extract_text_from_pdf import extract_text_from_pdf
-from AI.generate_mcq_from_text import generate_mcqs_from_text
+from AI.generate_mcq_from_text import generate_mcqs_from_job, plan_source_batches, MAX_TEXT_LENGTH
+from AI.chunk_text import share_evenly
+from AI.concurrency import run_in_pool
+from AI.model_router import PDF_MCQ
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def generate_mcqs_from_multiple_pdfs(pdf_files, number_of_questions=10, difficulty='3', num_options=4):
+class SkippedPDFError(Exception):
+    """Raised when a PDF can't contribute questions, the message is the reason reported in error_pdfs"""
+
+
+def get_pdf_name(pdf_file):
+    return pdf_file.name if hasattr(pdf_file, 'name') else str(pdf_file)
+
+
+def load_pdf_text(pdf_file, text=None):
+    """
+    Text of a PDF for generation, extracted here unless it was already.
+
+    Raises:
+        SkippedPDFError: If the PDF has no usable text
+    """
+    pdf_name = get_pdf_name(pdf_file)
+    logger.info(f"Processing PDF: {pdf_name}")
+
+    # Extract text from PDF, parsing stops once there is more than the generator will use
+    if text is None:
+        text = extract_text_from_pdf(pdf_file, max_chars=MAX_TEXT_LENGTH)
+    if not text:
+        logger.warning(f"No text extracted from PDF: {pdf_name}")
+        raise SkippedPDFError("no text extracted")
+
+    # Check if text is too short for AI processing, long text is chunked by the generator
+    if len(text) < 100:
+        logger.warning(f"Text too short from PDF: {pdf_name}")
+        raise SkippedPDFError("insufficient content")
+    return text
+
+
+def generate_mcqs_from_multiple_pdfs(pdf_files, number_of_questions=10, difficulty='3', num_options=4,
+                                     max_workers=None, timeout=None, fallback=True, use_cache=False,
+                                     regenerate=False, texts=None, source_ids=None):
     """
     Generate MCQs from multiple PDF files.
 
+    The questions are shared out evenly across the PDFs, then plan_source_batches packs PDFs
+    with small quotas into shared requests and chunks long ones, and the requests run in a
+    worker pool. Questions are merged in the order of pdf_files regardless of which request
+    finishes first, each tagged with the PDF it was written from.
+
     Args:
         pdf_files: List of PDF files (can be File objects or file paths)
-        number_of_questions: Number of questions to generate
+        number_of_questions: Number of questions to generate across all PDFs
         difficulty (str): Difficulty level ('1'=Very Easy, '2'=Easy, '3'=Medium, '4'=Hard, '5'=Very Hard)
         num_options (int): Number of options per question (2-4, default=4)
+        max_workers (int): Number of requests sent at once, defaults to AI_MAX_WORKERS (1 = one after another)
+        timeout (float): Seconds allowed per request, defaults to AI_CALL_TIMEOUT
+        fallback (bool): Return a sample question instead of failing when no PDF produced questions
+        use_cache (bool): Answer identical requests from the AI completion cache
+        regenerate (bool): Skip the cache lookup and replace the cached completions
+        texts (list): Text already extracted from each PDF, PDFs with a None entry are parsed here
+        source_ids (list): What each question's 'source' is set to for each PDF, defaults to the PDF names
 
     Returns:
         List of dictionaries containing MCQ data
     """
-    print("Generating MCQs from multiple PDFs")
+    logger.info(
+        f"Generating {number_of_questions} MCQs from {len(pdf_files)} PDFs")
+    texts = texts or [None] * len(pdf_files)
+    source_ids = source_ids or [get_pdf_name(pdf_file) for pdf_file in pdf_files]
     all_mcqs = []
     error_pdfs = []
 
-    for pdf_file in pdf_files:
-        try:
-            # Get PDF name for logging
-            pdf_name = pdf_file.name if hasattr(
-                pdf_file, 'name') else str(pdf_file)
-            logger.info(f"Processing PDF: {pdf_name}")
-
-            # Extract text from PDF
-            text = extract_text_from_pdf(pdf_file)
-            if not text:
-                logger.warning(f"No text extracted from PDF: {pdf_name}")
-                error_pdfs.append(f"{pdf_name} (no text extracted)")
-                continue
-
-            # Check if text is too long or too short for AI processing
-            if len(text) < 100:
-                logger.warning(f"Text too short from PDF: {pdf_name}")
-                error_pdfs.append(f"{pdf_name} (insufficient content)")
-                continue
-
-            # Limit text size to prevent API errors (some APIs have token limits)
-            if len(text) > 35000:
-                logger.warning(
-                    f"Text too long from PDF {pdf_name}, truncating...")
-                text = text[:35000]
-
-            # Generate MCQs from text with specified difficulty and number of options
-            try:
-                logger.info(
-                    f"Generating {number_of_questions} questions from PDF: {pdf_name}")
-                mcqs = generate_mcqs_from_text(
-                    text, number_of_questions, difficulty=difficulty, num_options=num_options)
-                if mcqs:
-                    all_mcqs.extend(mcqs)
-            except Exception as e:
+    # PDFs without text are parsed in parallel, the rest are only validated
+    loaded = run_in_pool(
+        lambda job: load_pdf_text(job[0], job[1]),
+        list(zip(pdf_files, texts)),
+        max_workers=max_workers,
+    )
+    sources = []
+    for index, (pdf_file, (text, error)) in enumerate(zip(pdf_files, loaded)):
+        if error is not None:
+            if not isinstance(error, SkippedPDFError):
                 logger.error(
-                    f"Error generating MCQs from PDF {pdf_name}: {str(e)}")
-                error_pdfs.append(f"{pdf_name} ({str(e)})")
-                continue
-
-        except Exception as e:
-            pdf_name = pdf_file.name if hasattr(
-                pdf_file, 'name') else str(pdf_file)
-            logger.error(f"Error processing PDF {pdf_name}: {str(e)}")
-            error_pdfs.append(f"{pdf_name} ({str(e)})")
+                    f"Error extracting text from PDF {get_pdf_name(pdf_file)}: {str(error)}")
+            error_pdfs.append(f"{get_pdf_name(pdf_file)} ({str(error)})")
+            continue
+        sources.append((index, text))
+
+    counts = share_evenly([len(text) for _, text in sources], number_of_questions)
+    jobs = plan_source_batches(
+        [(index, text, count) for (index, text), count in zip(sources, counts)],
+        difficulty=difficulty, num_options=num_options)
+
+    outcomes = run_in_pool(
+        lambda job: generate_mcqs_from_job(
+            job, difficulty=difficulty, num_options=num_options,
+            use_cache=use_cache, regenerate=regenerate, task=PDF_MCQ),
+        jobs,
+        max_workers=max_workers,
+        timeout=timeout,
+    )
+
+    by_source = {}
+    for job, (attributed, error) in zip(jobs, outcomes):
+        if error is not None:
+            names = ", ".join(get_pdf_name(pdf_files[index]) for index, _ in job[2])
+            logger.error(f"Error generating MCQs from PDF {names}: {str(error)}")
+            error_pdfs.extend(
+                f"{get_pdf_name(pdf_files[index])} ({str(error)})" for index, _ in job[2])
             continue
+        for index, mcq in attributed:
+            by_source.setdefault(index, []).append(mcq)
+
+    for index, _ in sources:
+        for mcq in by_source.get(index, []):
+            mcq['source'] = source_ids[index]
+            all_mcqs.append(mcq)
 
     # Check if we were able to generate any questions
     if not all_mcqs:
         error_msg = f"Failed to generate MCQs from all PDFs: {', '.join(error_pdfs)}"
         logger.error(error_msg)
+        if not fallback:
+            raise ValueError(error_msg)
 
         # Return generic/sample questions as fallback if no questions were generated
         return [
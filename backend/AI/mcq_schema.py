@@ -0,0 +1,76 @@
+def mcq_response_format(number_of_questions, num_options, source_labels=None):
+    """
+    response_format constraining a completion to exactly the requested questions.
+
+    The questions are wrapped in an object, providers only take an object at the root of a strict schema.
+
+    Args:
+        number_of_questions (int): Questions in the response
+        num_options (int): Options of every question
+        source_labels (list): Labels the 'source' of each question must be one of, no source without them
+    Returns:
+        dict: The response_format argument of the chat completion
+    """
+    properties = {
+        'question': {'type': 'string', 'minLength': 1},
+        'options': {
+            'type': 'array',
+            'items': {'type': 'string', 'minLength': 1},
+            'minItems': num_options,
+            'maxItems': num_options,
+        },
+        'correct_answer': {'type': 'string', 'minLength': 1},
+    }
+    if source_labels:
+        properties['source'] = {'type': 'string', 'enum': list(source_labels)}
+
+    return {
+        'type': 'json_schema',
+        'json_schema': {
+            'name': 'mcqs',
+            'strict': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'questions': {
+                        'type': 'array',
+                        'minItems': number_of_questions,
+                        'maxItems': number_of_questions,
+                        'items': {
+                            'type': 'object',
+                            'properties': properties,
+                            'required': list(properties),
+                            'additionalProperties': False,
+                        },
+                    },
+                },
+                'required': ['questions'],
+                'additionalProperties': False,
+            },
+        },
+    }
+
+
+def mcq_problem(mcq, num_options, source_labels=None):
+    """
+    Check a question against the schema, decoding constraints aren't enforced by every provider.
+
+    Returns:
+        str: What is wrong with the question, None if it is valid
+    """
+    if not isinstance(mcq, dict):
+        return "not an object"
+    if not isinstance(mcq.get('question'), str) or not mcq['question'].strip():
+        return "no question text"
+    options = mcq.get('options')
+    if not isinstance(options, list) or not all(isinstance(option, str) and option.strip() for option in options):
+        return "options are not a list of strings"
+    if len(options) != num_options:
+        return f"{len(options)} options instead of {num_options}"
+    if len(set(options)) != len(options):
+        return "duplicate options"
+    if mcq.get('correct_answer') not in options:
+        return "correct_answer is not one of the options"
+    if source_labels and mcq.get('source') not in source_labels:
+        return "source is not one of the labels"
+    return None
@@ -0,0 +1,63 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def source_label(index):
+    """Label the AI sees for the index-th source of a combined request"""
+    return f"S{index + 1}"
+
+
+def combine_sources(texts):
+    """Join the texts of several sources into one context, each under a [Source <label>] line"""
+    return "\n\n".join(f"[Source {source_label(i)}]\n{text}" for i, text in enumerate(texts))
+
+
+def source_quotas(sources):
+    """(label, number_of_questions) pairs for build_mcq_prompt from (key, number_of_questions) pairs"""
+    return [(source_label(i), count) for i, (_, count) in enumerate(sources)]
+
+
+class SourceAttributor:
+    """
+    Match the questions of a request back to the sources they were written from.
+
+    Each source gets at most its quota. Questions the AI didn't label go to the first source
+    still short of questions, labelled questions over their source's quota are dropped.
+    """
+
+    def __init__(self, sources):
+        """
+        Args:
+            sources (list): (key, number_of_questions) pairs in the order they appear in the context
+        """
+        self.keys = {source_label(i): key for i, (key, _) in enumerate(sources)}
+        self.remaining = {key: count for key, count in sources}
+
+    def _label(self, mcq):
+        label = str(mcq.pop('source', "") or "").strip().strip('[]')
+        if label.lower().startswith('source'):
+            label = label[len('source'):].strip()
+        return label.upper()
+
+    def assign(self, mcq):
+        """
+        Take the source label off a question and return the key of its source.
+
+        Returns:
+            The source key, None if the question is over quota and should be dropped
+        """
+        key = self.keys.get(self._label(mcq))
+        if key is None:
+            if len(self.remaining) > 1:
+                logger.warning("AI question has no valid source label, attributing it to the first short source")
+            key = next((key for key, left in self.remaining.items() if left > 0), None)
+        if key is None or self.remaining[key] <= 0:
+            return None
+        self.remaining[key] -= 1
+        return key
+
+    @property
+    def done(self):
+        """Whether every source has all of its questions"""
+        return not any(left > 0 for left in self.remaining.values())
@@ -0,0 +1,82 @@
+import json
+import json5
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MCQStreamParser:
+    """
+    Incremental parser for a JSON array of objects arriving in pieces.
+
+    Text before the opening bracket (markdown fences, chatter) is skipped and each top-level
+    object is returned as soon as its closing brace arrives, without waiting for the array to end.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buffer = []
+
+    def feed(self, text):
+        """
+        Args:
+            text (str): Next piece of the AI output
+        Returns:
+            list: Objects completed by this piece, in order
+        """
+        objects = []
+        for char in text:
+            if self._finished:
+                break
+
+            if not self._started:
+                self._started = char == '['
+                continue
+
+            if self._depth == 0:
+                # Between objects only an opening brace or the end of the array matter
+                if char == '{':
+                    self._depth = 1
+                    self._buffer = [char]
+                elif char == ']':
+                    self._finished = True
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    parsed = self._parse("".join(self._buffer))
+                    if parsed is not None:
+                        objects.append(parsed)
+                    self._buffer = []
+
+        return objects
+
+    @staticmethod
+    def _parse(object_text):
+        try:
+            return json.loads(object_text)
+        except ValueError:
+            pass
+        try:
+            # Tolerates the usual slips: trailing commas, single quotes, comments
+            return json5.loads(object_text)
+        except ValueError as e:
+            logger.warning(f"Skipping malformed object in AI stream: {str(e)}")
+            return None
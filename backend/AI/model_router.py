@@ -0,0 +1,151 @@
+import logging
+from django.core.cache import caches
+from main.settings import (AI_MODEL, AI_FAST_MODEL, AI_VISION_MODEL, AI_ROUTING_RULES, AI_LATENCY_SLO,
+                           AI_LATENCY_WINDOW)
+from AI.AIError import AIUnavailableError
+from AI.circuit_breaker import circuit_is_open
+
+logger = logging.getLogger(__name__)
+
+shared_cache = caches['shared']
+
+# Tasks a request is routed by
+TEXT_MCQ = 'text_mcq'
+PDF_MCQ = 'pdf_mcq'
+HANDWRITTEN = 'handwritten'
+
+# Weight of the latest call in a model's smoothed latency
+LATENCY_SMOOTHING = 0.2
+
+# Used unless AI_ROUTING_RULES is set. With none of the model settings set every rule resolves to AI_MODEL
+DEFAULT_RULES = [
+    {'task': HANDWRITTEN, 'model': AI_VISION_MODEL, 'fallback': AI_MODEL},
+    {'task': [TEXT_MCQ, PDF_MCQ], 'max_difficulty': 2, 'max_questions': 10,
+     'model': AI_FAST_MODEL, 'fallback': AI_MODEL},
+    {'model': AI_MODEL, 'fallback': AI_FAST_MODEL},
+]
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _matches(rule, task, difficulty, number_of_questions):
+    """
+    Whether a rule applies to a request. Conditions a rule doesn't set, or the request
+    doesn't say anything about, don't restrict it.
+    """
+    tasks = _as_list(rule.get('task'))
+    if tasks and task not in tasks:
+        return False
+    try:
+        if rule.get('max_difficulty') is not None and difficulty is not None \
+                and int(difficulty) > int(rule['max_difficulty']):
+            return False
+    except ValueError:
+        return False
+    if rule.get('max_questions') is not None and number_of_questions is not None \
+            and number_of_questions > rule['max_questions']:
+        return False
+    return True
+
+
+def find_rule(task, difficulty=None, number_of_questions=None):
+    """
+    First routing rule matching a request.
+
+    A rule is a dict with:
+        model (str): Model tried first
+        fallback (str or list): Models tried in order when the ones before are unavailable
+        task (str or list): Tasks the rule applies to, one of TEXT_MCQ, PDF_MCQ and HANDWRITTEN
+        max_difficulty (int): Highest difficulty level ('1' to '5') the rule applies to
+        max_questions (int): Most questions in one request the rule applies to
+        latency_slo (float): Overrides AI_LATENCY_SLO for the models of the rule
+    """
+    for rule in AI_ROUTING_RULES or DEFAULT_RULES:
+        if _matches(rule, task, difficulty, number_of_questions):
+            return rule
+    return {'model': AI_MODEL}
+
+
+def select_models(task, difficulty=None, number_of_questions=None):
+    """
+    Models to try for a request, in order.
+
+    The matching rule gives the preferred order. Models whose circuit is open or whose recent
+    latency breaches the SLO are moved behind the healthy ones, not dropped, so a request still
+    goes out when every model is degraded.
+
+    Args:
+        task (str): TEXT_MCQ, PDF_MCQ or HANDWRITTEN
+        difficulty (str): Difficulty level of MCQ requests
+        number_of_questions (int): Questions asked for in the request
+    Returns:
+        list: Model names, the first is the one to call
+    """
+    rule = find_rule(task, difficulty, number_of_questions)
+    models = []
+    for model in [rule.get('model')] + _as_list(rule.get('fallback')):
+        if model and model not in models:
+            models.append(model)
+    if not models:
+        models = [AI_MODEL]
+
+    slo = rule.get('latency_slo', AI_LATENCY_SLO)
+    healthy = [model for model in models if not circuit_is_open(model) and not latency_breached(model, slo)]
+    if len(models) > 1 and healthy and healthy[0] != models[0]:
+        logger.warning(f"AI model {models[0]} is degraded, routing {task} to {healthy[0]}")
+    return healthy + [model for model in models if model not in healthy]
+
+
+def call_with_failover(models, call):
+    """
+    Call each model in turn until one is available.
+
+    Only unavailability (open circuit, exhausted rate limit, no free call slot) moves on to the
+    next model, a request the model failed is not sent again elsewhere.
+
+    Args:
+        models (list): Models to try, from select_models
+        call: Function making the request to the model it is given
+    Raises:
+        AIUnavailableError: If every model is unavailable
+    """
+    error = None
+    for model in models:
+        try:
+            return call(model)
+        except AIUnavailableError as e:
+            error = e
+            if model != models[-1]:
+                logger.warning(f"AI model {model} is unavailable, failing over")
+    raise error or AIUnavailableError()
+
+
+def _latency_key(model):
+    return f"ai_latency:{model}"
+
+
+def _tracks_latency():
+    return bool(AI_LATENCY_SLO) or any(rule.get('latency_slo') for rule in AI_ROUTING_RULES or [])
+
+
+def record_latency(model, seconds):
+    """Fold a successful call into the model's smoothed latency, kept while the model gets calls"""
+    if not model or not _tracks_latency():
+        return
+    key = _latency_key(model)
+    # Concurrent calls can overwrite each other's update, close enough for a health signal
+    previous = shared_cache.get(key)
+    latency = seconds if previous is None else previous + LATENCY_SMOOTHING * (seconds - previous)
+    shared_cache.set(key, latency, int(AI_LATENCY_WINDOW))
+
+
+def latency_breached(model, slo=AI_LATENCY_SLO):
+    """Whether the model's smoothed latency is over slo seconds"""
+    if not slo:
+        return False
+    latency = shared_cache.get(_latency_key(model))
+    return latency is not None and latency > slo
@@ -0,0 +1,138 @@
+import glob
+import hashlib
+import logging
+import os
+import uuid
+from main.settings import PDF_TEXT_CACHE_DIR, PDF_TEXT_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+def hash_pdf(pdf_file):
+    """
+    Compute the SHA-256 of a PDF's content.
+
+    Args:
+        pdf_file: PDF file (can be File object, uploaded file or file path)
+    Returns:
+        str: Hex digest of the file content
+    """
+    digest = hashlib.sha256()
+
+    if hasattr(pdf_file, 'path') or not hasattr(pdf_file, 'read'):
+        pdf_path = pdf_file.path if hasattr(pdf_file, 'path') else pdf_file
+        with open(pdf_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(chunk)
+    else:
+        # Uploaded files live in memory or a temp file, read them in place
+        pdf_file.seek(0)
+        for chunk in iter(lambda: pdf_file.read(1024 * 1024), b''):
+            digest.update(chunk)
+        pdf_file.seek(0)
+
+    return digest.hexdigest()
+
+
+def _entry_path(content_hash, version, complete=True):
+    suffix = "" if complete else "-partial"
+    return os.path.join(PDF_TEXT_CACHE_DIR, f"{content_hash}-v{version}{suffix}.txt")
+
+
+def _read_entry(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            text = file.read()
+        # Bump the mtime so eviction treats this entry as recently used
+        os.utime(path)
+        return text
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning(f"Failed to read PDF text cache entry {path}: {str(e)}")
+        return None
+
+
+def get_cached_text(content_hash, version, min_chars=None):
+    """
+    Return the cached text for this content hash and extractor version, or None.
+
+    Args:
+        content_hash (str): Hex digest from hash_pdf
+        version (int): Extractor version
+        min_chars (int): When set, a partial entry with at least this many characters is good enough
+    """
+    text = _read_entry(_entry_path(content_hash, version))
+    if text is not None or min_chars is None:
+        return text
+
+    text = _read_entry(_entry_path(content_hash, version, complete=False))
+    if text is not None and len(text) >= min_chars:
+        return text
+    return None
+
+
+def store_text(content_hash, version, text, complete=True):
+    """
+    Store extracted text, then evict old entries if the cache grew past its limit.
+
+    Args:
+        complete (bool): False when extraction stopped early at a character budget
+    """
+    try:
+        os.makedirs(PDF_TEXT_CACHE_DIR, exist_ok=True)
+        path = _entry_path(content_hash, version, complete=complete)
+        # Write to a temp file first so concurrent readers never see a partial entry
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Failed to write PDF text cache entry: {str(e)}")
+        return
+
+    evict()
+
+
+def evict(max_bytes=PDF_TEXT_CACHE_MAX_BYTES):
+    """Delete least recently used entries until the cache fits in max_bytes"""
+    entries = []
+    total = 0
+    for path in glob.glob(os.path.join(PDF_TEXT_CACHE_DIR, '*.txt')):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    if total <= max_bytes:
+        return
+
+    for _, size, path in sorted(entries):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        if total <= max_bytes:
+            break
+
+    logger.info(f"Evicted PDF text cache entries, cache size is now {total} bytes")
+
+
+def invalidate(content_hash):
+    """Drop every cached version of a PDF's text"""
+    for path in glob.glob(os.path.join(PDF_TEXT_CACHE_DIR, f"{content_hash}-v*.txt")):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def invalidate_pdf(pdf_file):
+    """Drop the cached text of a PDF that is about to change or be deleted"""
+    try:
+        invalidate(hash_pdf(pdf_file))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to invalidate PDF text cache: {str(e)}")
@@ -0,0 +1,109 @@
+from PIL import Image, ImageOps
+from main.settings import (HANDWRITING_IMAGE_MAX_SIDE, HANDWRITING_IMAGE_MAX_PIXELS,
+                           HANDWRITING_IMAGE_MIN_SIDE, HANDWRITING_IMAGE_GRAYSCALE, HANDWRITING_IMAGE_QUALITY)
+import io
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_FORMATS = ['JPEG', 'PNG', 'GIF', 'BMP']
+
+# Pixels darker than this (0-255) count as ink when looking for the written area
+INK_THRESHOLD = 200
+# Blank border kept around the written area, as a fraction of the cropped size
+CROP_MARGIN = 0.03
+# A written area smaller than this (pixels) is dirt or noise, not an answer
+MIN_WRITING_SIZE = 32
+
+
+def _crop_to_writing(image):
+    """Drop the blank paper around the writing so the pixel budget goes to the strokes"""
+    gray = image.convert('L')
+    ink = gray.point(lambda value: 255 if value < INK_THRESHOLD else 0)
+    box = ink.getbbox()
+    if not box:
+        # Nothing that looks like ink, the evaluator decides what to make of it
+        return image
+
+    left, top, right, bottom = box
+    margin_x = int((right - left) * CROP_MARGIN) + 1
+    margin_y = int((bottom - top) * CROP_MARGIN) + 1
+    box = (max(0, left - margin_x), max(0, top - margin_y),
+           min(image.width, right + margin_x), min(image.height, bottom + margin_y))
+    if min(box[2] - box[0], box[3] - box[1]) < MIN_WRITING_SIZE:
+        return image
+    return image.crop(box)
+
+
+def _downscale_factor(width, height):
+    """
+    Largest scale at most 1 that fits both the side and the pixel budget.
+
+    Doesn't shrink the short side below HANDWRITING_IMAGE_MIN_SIDE, small writing stops
+    being legible to the model well before the payload gets small. That may take the long
+    side past HANDWRITING_IMAGE_MAX_SIDE, never the image past HANDWRITING_IMAGE_MAX_PIXELS.
+    """
+    pixels_factor = (HANDWRITING_IMAGE_MAX_PIXELS / (width * height)) ** 0.5
+    factor = min(1.0, HANDWRITING_IMAGE_MAX_SIDE / max(width, height), pixels_factor)
+    floor = min(1.0, HANDWRITING_IMAGE_MIN_SIDE / min(width, height), pixels_factor)
+    return max(factor, floor)
+
+
+def preprocess_handwritten_image(image_file):
+    """
+    Prepare a photo or scan of a handwritten answer for the vision model.
+
+    Applies the EXIF orientation, crops the blank paper around the writing, downscales
+    within HANDWRITING_IMAGE_MAX_SIDE / HANDWRITING_IMAGE_MAX_PIXELS, optionally converts
+    to grayscale with normalized contrast, and encodes a compact JPEG.
+
+    Args:
+        image_file: File object or anything with a .path to the image
+    Returns:
+        tuple: (jpeg_bytes, content_hash), the hash is the sha256 of jpeg_bytes
+    """
+    if hasattr(image_file, 'read'):
+        image = Image.open(image_file)
+    else:
+        image = Image.open(image_file.path)
+
+    if image.format not in SUPPORTED_FORMATS:
+        raise ValueError(
+            "Unsupported image format. Please upload a JPEG, PNG, GIF, or BMP file")
+
+    original_size = image.size
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        # Flatten transparency onto white paper
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+
+    image = _crop_to_writing(image)
+
+    factor = _downscale_factor(*image.size)
+    if factor < 1.0:
+        size = (max(1, round(image.width * factor)),
+                max(1, round(image.height * factor)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+
+    if HANDWRITING_IMAGE_GRAYSCALE:
+        # Ink on paper carries no information in color, and a single channel JPEG is much smaller
+        image = ImageOps.autocontrast(image.convert('L'), cutoff=1)
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG",
+               quality=HANDWRITING_IMAGE_QUALITY, optimize=True)
+    jpeg_bytes = buffered.getvalue()
+
+    if hasattr(image_file, 'seek'):
+        image_file.seek(0)
+
+    logger.info(
+        f"Preprocessed handwritten answer from {original_size[0]}x{original_size[1]} "
+        f"to {image.width}x{image.height}, {len(jpeg_bytes)} bytes")
+    return jpeg_bytes, hashlib.sha256(jpeg_bytes).hexdigest()
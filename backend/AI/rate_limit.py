@@ -0,0 +1,73 @@
+import logging
+import time
+from django.core.cache import caches
+from main.settings import AI_RATE_LIMIT_PER_MINUTE, AI_RATE_LIMIT_BURST, AI_RATE_LIMIT_MAX_WAIT
+from AI.AIError import AIUnavailableError
+
+logger = logging.getLogger(__name__)
+
+shared_cache = caches['shared']
+
+# The bucket is read and written under a short lock, a crashed holder frees it after this many seconds
+LOCK_TIMEOUT = 2
+# Seconds to wait before looking again when another worker holds the lock
+LOCK_RETRY_DELAY = 0.01
+
+
+def _take_token(name, now):
+    """
+    Try to take a token from the bucket.
+
+    Returns:
+        float: 0 if a token was taken, otherwise seconds until one is available
+    """
+    lock_key = f"ai_rate_limit:{name}:lock"
+    if not shared_cache.add(lock_key, True, LOCK_TIMEOUT):
+        return LOCK_RETRY_DELAY
+
+    try:
+        bucket_key = f"ai_rate_limit:{name}:bucket"
+        rate = AI_RATE_LIMIT_PER_MINUTE / 60
+        tokens, updated_at = shared_cache.get(
+            bucket_key, (AI_RATE_LIMIT_BURST, now))
+        tokens = min(AI_RATE_LIMIT_BURST, tokens +
+                     max(0.0, now - updated_at) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        # Without calls the bucket refills completely, no need to keep it longer than that
+        shared_cache.set(bucket_key, (tokens, now),
+                         int(AI_RATE_LIMIT_BURST / rate) + 1)
+        return wait
+    finally:
+        shared_cache.delete(lock_key)
+
+
+def acquire_rate_limit_token(name, max_wait=AI_RATE_LIMIT_MAX_WAIT):
+    """
+    Wait for a token of the rate limit shared by every worker calling the provider.
+
+    Args:
+        name (str): Bucket name, usually the model
+        max_wait (float): Longest time to wait for a token
+    Raises:
+        AIUnavailableError: If no token frees up within max_wait
+    """
+    if AI_RATE_LIMIT_PER_MINUTE <= 0:
+        return
+
+    deadline = time.monotonic() + max_wait
+    while True:
+        # Wall clock, the bucket is shared with other processes and hosts
+        wait = _take_token(name, time.time())
+        if not wait:
+            return
+        remaining = deadline - time.monotonic()
+        if wait > remaining:
+            logger.warning(
+                f"AI rate limit for {name} is exhausted, no token within {max_wait}s")
+            raise AIUnavailableError(
+                "Too many AI requests right now, please try again in a moment")
+        time.sleep(wait)
@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import re
+import types
+from AI.completion_cache import fingerprint
+from AI.fake_provider import make_completion, make_stream
+
+logger = logging.getLogger(__name__)
+
+_IMAGE_DATA = re.compile(r'data:image/[^;]+;base64,[A-Za-z0-9+/=]+')
+
+
+def _recording_path(directory, model, messages, temperature, max_tokens, response_format=None):
+    return os.path.join(
+        directory, f"{fingerprint(model, messages, temperature, max_tokens, response_format)}.json")
+
+
+def _readable(messages):
+    """The request as stored next to the response, images are left out to keep recordings small"""
+    return json.loads(_IMAGE_DATA.sub('data:image/omitted', json.dumps(messages)))
+
+
+class ReplayMissError(Exception):
+    """No recording for the request, shaped like a 404 so it is never retried"""
+
+    def __init__(self, path):
+        super().__init__(f"No recorded AI response at {path}")
+        self.response = types.SimpleNamespace(status_code=404, headers={})
+
+
+class RecordingClient:
+    """
+    Wraps a real client and writes every successful completion to AI_RECORD_DIR, keyed by the
+    same fingerprint the completion cache uses. Streams are recorded once fully consumed.
+    """
+
+    def __init__(self, client, directory):
+        self.client = client
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.chat = types.SimpleNamespace(
+            completions=types.SimpleNamespace(create=self.create))
+
+    def _save(self, model, messages, temperature, max_tokens, content, response_format=None):
+        path = _recording_path(self.directory, model,
+                               messages, temperature, max_tokens, response_format)
+        recording = {
+            'model': model,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            'messages': _readable(messages),
+            'content': content,
+        }
+        # Written whole then renamed, concurrent replays never see half a file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(recording, file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def create(self, model, messages, temperature=None, max_tokens=None, stream=False, **kwargs):
+        response = self.client.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, max_tokens=max_tokens,
+            stream=stream, **kwargs)
+        if not stream:
+            self._save(model, messages, temperature, max_tokens,
+                       response.choices[0].message.content, kwargs.get('response_format'))
+            return response
+        return self._record_stream(response, model, messages, temperature, max_tokens)
+
+    def _record_stream(self, stream, model, messages, temperature, max_tokens):
+        pieces = []
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces.append(chunk.choices[0].delta.content)
+            yield chunk
+        self._save(model, messages, temperature, max_tokens, "".join(pieces))
+
+
+class ReplayClient:
+    """Serves completions recorded by RecordingClient, selected with AI_PROVIDER=replay"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.chat = types.SimpleNamespace(
+            completions=types.SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, temperature=None, max_tokens=None, stream=False, **kwargs):
+        path = _recording_path(self.directory, model,
+                               messages, temperature, max_tokens, kwargs.get('response_format'))
+        try:
+            with open(path, encoding='utf-8') as file:
+                content = json.load(file)['content']
+        except FileNotFoundError:
+            logger.error(f"No recorded AI response for this request: {path}")
+            raise ReplayMissError(path)
+        return make_stream(content) if stream else make_completion(content)
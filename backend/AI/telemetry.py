@@ -0,0 +1,222 @@
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from django.apps import apps
+from django.db import connections
+from django.utils import timezone
+from AI.chunk_text import estimate_prompt_tokens, estimate_tokens
+from main.settings import (AI_TELEMETRY_SINK, AI_TELEMETRY_FLUSH_SECONDS, AI_TELEMETRY_BATCH_SIZE,
+                           AI_PROMPT_TOKEN_PRICE, AI_COMPLETION_TOKEN_PRICE)
+
+logger = logging.getLogger(__name__)
+
+# Who the AI work is done for (institution_id, assessment_id), set by views and tasks
+_context = contextvars.ContextVar('ai_call_context', default={})
+# Record of the tracked operation in progress, filled in by the client layer and the parsers
+_current_call = contextvars.ContextVar('ai_current_call', default=None)
+
+# Records waiting for the writer thread, dropped rather than ever blocking an AI call
+_pending = queue.Queue(maxsize=10000)
+_writer = None
+_writer_lock = threading.Lock()
+
+
+@contextmanager
+def ai_call_context(institution_id=None, assessment_id=None):
+    """Attribute the AI calls made inside the block to an institution and/or assessment"""
+    previous = _context.get()
+    fields = {key: value for key, value in (('institution_id', institution_id), ('assessment_id', assessment_id))
+              if value is not None}
+    _context.set({**previous, **fields})
+    try:
+        yield
+    finally:
+        # Not reset(), the block may be left from another context (a generator resumed elsewhere)
+        _context.set(previous)
+
+
+def user_institution_id(user):
+    """Institution an AI call made by user is billed to: the user itself for institutions, else its first membership"""
+    if getattr(user, 'role', None) == 'Institution':
+        return user.id
+    institutions = getattr(user, 'institution', None)
+    return institutions.values_list('id', flat=True).first() if institutions is not None else None
+
+
+@contextmanager
+def track_ai_call(operation):
+    """
+    Record one AI operation: the provider call made inside the block, how its response was
+    parsed and whether it failed. Calls made outside any block are recorded on their own.
+
+    Yields:
+        dict: The record, note_parse_path and the client layer fill it in
+    """
+    record = _new_record(operation)
+    previous = _current_call.get()
+    _current_call.set(record)
+    try:
+        yield record
+    except Exception as e:
+        record['outcome'] = 'error'
+        # A provider failure already said what went wrong, the wrapping error would hide it
+        record['error_type'] = record['error_type'] or getattr(
+            e, 'default_code', None) or type(e).__name__
+        raise
+    finally:
+        _current_call.set(previous)
+        emit(record)
+
+
+def note_parse_path(path):
+    """Record how the response of the current call was parsed: structured, json, repaired, fallback or invalid"""
+    record = _current_call.get()
+    if record is not None:
+        record['parse_path'] = path
+
+
+def note_cache_hit(model):
+    record = _current_call.get()
+    if record is not None:
+        record['outcome'] = 'cache_hit'
+        record['model'] = model or ""
+
+
+def record_provider_call(model, messages, attempts, started_at, completion=None, completion_text=None, error=None):
+    """
+    Add a provider call (all its attempts) to the current record.
+
+    Token counts come from the provider's usage when it reports one, and are estimated otherwise.
+    """
+    record = _current_call.get()
+    standalone = record is None
+    if standalone:
+        record = _new_record('unscoped')
+
+    usage = getattr(completion, 'usage', None)
+    prompt_tokens = getattr(usage, 'prompt_tokens', None)
+    completion_tokens = getattr(usage, 'completion_tokens', None)
+    if prompt_tokens is None or completion_tokens is None:
+        if completion_text is None and completion is not None:
+            completion_text = completion.choices[0].message.content or ""
+        prompt_tokens = estimate_prompt_tokens(messages)
+        completion_tokens = estimate_tokens(completion_text or "")
+        record['tokens_estimated'] = True
+
+    record['model'] = model or ""
+    record['attempts'] += attempts
+    record['latency_ms'] += int((time.monotonic() - started_at) * 1000)
+    record['prompt_tokens'] += prompt_tokens
+    record['completion_tokens'] += completion_tokens
+    if error is not None:
+        record['outcome'] = 'error'
+        record['error_type'] = getattr(
+            error, 'default_code', None) or type(error).__name__
+    else:
+        # Also after a failed call to a model that was failed over, error_type keeps what happened
+        record['outcome'] = 'success'
+
+    if standalone:
+        emit(record)
+
+
+def _new_record(operation):
+    return {
+        'operation': operation,
+        'model': "",
+        'outcome': 'success',
+        'error_type': "",
+        'prompt_tokens': 0,
+        'completion_tokens': 0,
+        'tokens_estimated': False,
+        'latency_ms': 0,
+        'attempts': 0,
+        'parse_path': "",
+    }
+
+
+def emit(record):
+    """Hand a finished record to the configured sink"""
+    if AI_TELEMETRY_SINK == 'off':
+        return
+
+    record = {**record, **_context.get(), 'created_at': timezone.now()}
+    record['cost'] = (Decimal(record['prompt_tokens']) * Decimal(str(AI_PROMPT_TOKEN_PRICE)) +
+                      Decimal(record['completion_tokens']) * Decimal(str(AI_COMPLETION_TOKEN_PRICE))) / 1000000
+
+    if AI_TELEMETRY_SINK == 'log':
+        logger.info(json.dumps(record, default=str))
+        return
+
+    try:
+        _pending.put_nowait(record)
+    except queue.Full:
+        logger.warning("AI telemetry queue is full, dropping a record")
+        return
+    _ensure_writer()
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            # Started lazily so every forked worker gets its own
+            _writer = threading.Thread(
+                target=_write_forever, name='ai-telemetry-writer', daemon=True)
+            _writer.start()
+
+
+def _take_batch(wait):
+    batch = []
+    try:
+        batch.append(_pending.get(timeout=wait))
+        while len(batch) < AI_TELEMETRY_BATCH_SIZE:
+            batch.append(_pending.get_nowait())
+    except queue.Empty:
+        pass
+    return batch
+
+
+def _write(batch, close_connections=True):
+    if not batch:
+        return
+    AICallRecord = apps.get_model('analytics', 'AICallRecord')
+    try:
+        AICallRecord.objects.bulk_create(
+            [AICallRecord(**record) for record in batch])
+    except Exception as e:
+        logger.error(
+            f"Failed to write {len(batch)} AI telemetry records: {str(e)}")
+    finally:
+        if close_connections:
+            # The writer thread holds its own connection, don't leak it between batches
+            connections.close_all()
+
+
+def _write_forever():
+    while True:
+        batch = _take_batch(AI_TELEMETRY_FLUSH_SECONDS)
+        _write(batch)
+        if batch and len(batch) < AI_TELEMETRY_BATCH_SIZE:
+            # Let records accumulate instead of writing one row at a time
+            time.sleep(AI_TELEMETRY_FLUSH_SECONDS)
+
+
+def flush():
+    """Write every pending record now, in the calling thread"""
+    while True:
+        batch = _take_batch(0)
+        if not batch:
+            return
+        _write(batch, close_connections=False)
+
+
+atexit.register(flush)
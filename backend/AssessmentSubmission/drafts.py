@@ -0,0 +1,203 @@
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from django.apps import apps
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from main.settings import DRAFT_CACHE_URL
+from .errors import DraftBusy, DraftClosed, DraftsUnavailable
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every gunicorn worker must see the same drafts, and nothing else cached may push them out
+draft_cache = caches['drafts']
+
+# Drafts outlive the assessment's due date by this much, late submits still find them
+DRAFT_GRACE = timedelta(hours=1)
+# A draft is locked while a change is applied to it, the lock frees itself if the worker dies holding it
+DRAFT_LOCK_TIMEOUT = 5
+DRAFT_LOCK_ATTEMPTS = 40
+DRAFT_LOCK_WAIT = 0.025
+# Length of MCQQuestionScore.selected_answer
+MAX_ANSWER_LENGTH = 255
+MAX_DRAFT_ANSWERS = 1000
+
+
+def _draft_key(submission_id):
+    return f"submission_draft:{submission_id}"
+
+
+def _lock_key(submission_id):
+    return f"submission_draft_lock:{submission_id}"
+
+
+def _owner_key(assessment_id, user_id):
+    return f"submission_draft_owner:{assessment_id}:{user_id}"
+
+
+def _timeout(due_date):
+    return max(60, int((due_date + DRAFT_GRACE - timezone.now()).total_seconds()))
+
+
+@contextmanager
+def _draft_lock(submission_id):
+    key = _lock_key(submission_id)
+    for _ in range(DRAFT_LOCK_ATTEMPTS):
+        if draft_cache.add(key, True, DRAFT_LOCK_TIMEOUT):
+            break
+        time.sleep(DRAFT_LOCK_WAIT)
+    else:
+        raise DraftBusy()
+    try:
+        yield
+    finally:
+        draft_cache.delete(key)
+
+
+def draft_submission(assessment_id, student):
+    """
+    The submission a student's autosaves go to, cached so autosaving doesn't query the database.
+
+    Returns:
+        dict: submission_id, start_date and due_date
+    Raises:
+        DraftsUnavailable: If no cache for the drafts is configured
+        NotFound: If the assessment doesn't exist
+        PermissionDenied: If the student isn't enrolled in its course
+        DraftClosed: If the student already submitted it
+        ValidationError: If the assessment isn't open
+    """
+    if not DRAFT_CACHE_URL:
+        raise DraftsUnavailable()
+    key = _owner_key(assessment_id, student.id)
+    owner = draft_cache.get(key)
+    if owner is None:
+        Assessment = apps.get_model('assessment', 'Assessment')
+        Enrollments = apps.get_model('enrollments', 'Enrollments')
+        AssessmentSubmission = apps.get_model('AssessmentSubmission', 'AssessmentSubmission')
+        try:
+            assessment = Assessment.objects.get(id=assessment_id)
+        except Assessment.DoesNotExist:
+            raise NotFound("Assessment not found")
+        try:
+            enrollment = Enrollments.objects.get(user=student, course_id=assessment.course_id, is_completed=False)
+        except Enrollments.DoesNotExist:
+            raise PermissionDenied("You are not enrolled in this course")
+        submission = AssessmentSubmission.get_or_create_submission(assessment, enrollment)
+        if submission.is_submitted:
+            raise DraftClosed()
+        owner = {
+            'submission_id': str(submission.id),
+            'start_date': assessment.start_date,
+            'due_date': assessment.due_date,
+        }
+        draft_cache.set(key, owner, _timeout(assessment.due_date))
+
+    now = timezone.now()
+    if not owner['start_date'] <= now <= owner['due_date']:
+        raise ValidationError({"detail": "This assessment is not accepting submissions"})
+    return owner
+
+
+def _validate_answers(answers):
+    if not isinstance(answers, dict) or not answers:
+        raise ValidationError({"answers": "Must be a dictionary of question_id: selected_answer"})
+    for question_id, answer in answers.items():
+        if not isinstance(answer, str) or not answer or len(answer) > MAX_ANSWER_LENGTH:
+            raise ValidationError({"answers": f"Invalid answer for question {question_id}"})
+
+
+def save_draft_answers(owner, answers, version):
+    """
+    Save answer changes to the submission's draft and write them through to its mcq_answers.
+
+    Answers are only checked for shape here, they are checked against the questions when the
+    assessment is submitted.
+
+    Args:
+        owner (dict): From draft_submission
+        answers (dict): question_id: selected_answer
+        version (int): The student's version of these changes, higher for every later change. A change
+            older than the one the draft already has for a question is ignored, so autosaves arriving
+            out of order don't undo newer answers
+    Returns:
+        tuple: (draft version, ids of the questions whose change was ignored)
+    Raises:
+        DraftClosed: If the assessment was submitted in between
+        DraftBusy: If the draft stays locked
+    """
+    AssessmentSubmission = apps.get_model('AssessmentSubmission', 'AssessmentSubmission')
+
+    _validate_answers(answers)
+    submission_id = owner['submission_id']
+    submission = AssessmentSubmission.objects.filter(id=submission_id, is_submitted=False)
+    with _draft_lock(submission_id):
+        draft = draft_cache.get(_draft_key(submission_id))
+        if draft is None:
+            # Starts from the answers written so far, every save writes all of them
+            mcq_answers = submission.values_list('mcq_answers', flat=True).first()
+            if mcq_answers is None:
+                raise DraftClosed()
+            draft = {'answers': dict(mcq_answers), 'versions': {}, 'version': 0, 'closed': False,
+                     'due_date': owner['due_date']}
+        if draft['closed']:
+            raise DraftClosed()
+
+        stale = []
+        for question_id, answer in answers.items():
+            question_id = str(question_id)
+            if draft['versions'].get(question_id, -1) >= version:
+                stale.append(question_id)
+                continue
+            draft['answers'][question_id] = answer
+            draft['versions'][question_id] = version
+            draft['version'] += 1
+        if len(draft['answers']) > MAX_DRAFT_ANSWERS:
+            raise ValidationError({"answers": "Too many answers"})
+        if len(stale) < len(answers) and not submission.update(mcq_answers=draft['answers']):
+            raise DraftClosed()
+        draft_cache.set(_draft_key(submission_id), draft, _timeout(owner['due_date']))
+
+    return draft['version'], stale
+
+
+def get_draft(submission):
+    """
+    A submission's answers: the ones written to it, overlaid with the ones of its draft
+    Returns:
+        dict: answers and version, the number of answer changes saved to the draft so far
+    """
+    draft = draft_cache.get(_draft_key(submission.id))
+    if draft is None:
+        return {'answers': dict(submission.mcq_answers), 'version': 0}
+    return {'answers': {**submission.mcq_answers, **draft['answers']}, 'version': draft['version']}
+
+
+def close_draft(submission_id, due_date):
+    """
+    Refuse any further autosave of a submission being submitted. Closed before the draft is read for
+    the submit, so a later autosave is refused instead of lost.
+    """
+    with _draft_lock(submission_id):
+        draft = draft_cache.get(_draft_key(submission_id))
+        if draft is None:
+            draft = {'answers': {}, 'versions': {}, 'version': 0, 'closed': True, 'due_date': due_date}
+        draft['closed'] = True
+        draft_cache.set(_draft_key(submission_id), draft, _timeout(draft['due_date']))
+
+
+def reopen_draft(submission_id):
+    """Accept autosaves again after a submit that didn't go through"""
+    with _draft_lock(submission_id):
+        draft = draft_cache.get(_draft_key(submission_id))
+        if draft is None:
+            return
+        if not draft['version']:
+            # Only made by close_draft, dropped like it never existed
+            draft_cache.delete(_draft_key(submission_id))
+            return
+        draft['closed'] = False
+        draft_cache.set(_draft_key(submission_id), draft, _timeout(draft['due_date']))
+
@@ -0,0 +1,19 @@
+from rest_framework.exceptions import APIException
+
+
+class DraftClosed(APIException):
+    status_code = 409
+    default_detail = "This assessment was already submitted, its answers can't change anymore"
+    error_type = "draft_closed"
+
+
+class DraftBusy(APIException):
+    status_code = 503
+    default_detail = "Your answers are being saved, try again in a moment"
+    error_type = "draft_busy"
+
+
+class DraftsUnavailable(APIException):
+    status_code = 503
+    default_detail = "Autosave is not available, your answers are saved when you submit"
+    error_type = "drafts_unavailable"
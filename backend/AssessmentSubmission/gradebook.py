@@ -0,0 +1,182 @@
+import csv
+import json
+from collections import defaultdict
+from decimal import Decimal
+from itertools import islice
+from django.apps import apps
+from django.db.models import Sum
+from main.settings import GRADEBOOK_EXPORT_CHUNK_SIZE
+from assessment.rollups import as_score
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cells starting with these are formulas to spreadsheets, a student's name or a question could be one
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Echo:
+    """Stands in for the file csv.writer writes to, handing each line back instead"""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    """Text a spreadsheet would run as a formula, quoted so it's shown as is"""
+    if value and value[0] in FORMULA_PREFIXES:
+        return "'" + value
+    return value
+
+
+def _score(value):
+    return str(value) if value is not None else None
+
+
+def _student_name(user):
+    return " ".join(name for name in (user.first_name, user.middle_name, user.last_name) if name)
+
+
+def _has_dynamic_mcq(assessment):
+    DynamicMCQ = apps.get_model('DynamicMCQ', 'DynamicMCQ')
+    return DynamicMCQ.objects.filter(assessment=assessment).exists()
+
+
+def gradebook_columns(assessment):
+    """
+    The questions every student of an assessment answers, in section order. Dynamic MCQ questions
+    differ per student and are totalled in one column instead.
+
+    Returns:
+        list: dicts with id, type, question and max_score
+    """
+    McqQuestion = apps.get_model('mcqQuestion', 'McqQuestion')
+    HandwrittenQuestion = apps.get_model('HandwrittenQuestion', 'HandwrittenQuestion')
+
+    columns = []
+    for question in McqQuestion.objects.filter(assessment=assessment).order_by('section_number', 'created_at'):
+        columns.append({'id': question.id, 'type': 'mcq', 'question': question.question,
+                        'max_score': question.question_grade, 'section': question.section_number})
+    for question in HandwrittenQuestion.objects.filter(assessment=assessment).order_by('section_number', 'created_at'):
+        columns.append({'id': question.id, 'type': 'handwritten', 'question': question.question_text,
+                        'max_score': question.max_grade, 'section': question.section_number})
+    columns.sort(key=lambda column: column['section'])
+    return columns
+
+
+def gradebook_rows(assessment, enrollments, chunk_size=GRADEBOOK_EXPORT_CHUNK_SIZE):
+    """
+    The scores of each student of an assessment, read chunk_size students at a time.
+
+    The enrollments come from a server-side cursor and every score of a chunk is fetched in four
+    queries, so memory stays the same whatever the size of the class.
+
+    Args:
+        assessment: The assessment
+        enrollments: Queryset of the students' enrollments, with their users, in export order
+    Yields:
+        dict: enrollment, submission (None if the student has none), scores mapping the question
+            ids the student was scored on to their score, dynamic_mcq_score and total_score
+    """
+    MCQQuestionScore = apps.get_model('MCQQuestionScore', 'MCQQuestionScore')
+    HandwrittenQuestionScore = apps.get_model('HandwrittenQuestion', 'HandwrittenQuestionScore')
+    AssessmentSubmission = apps.get_model('AssessmentSubmission', 'AssessmentSubmission')
+
+    rows = enrollments.iterator(chunk_size=chunk_size)
+    exported = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            logger.info(f"Exported the gradebook of assessment {assessment.id}: {exported} students")
+            return
+        exported += len(chunk)
+        enrollment_ids = [enrollment.id for enrollment in chunk]
+
+        scores = defaultdict(dict)
+        for scored in (
+            MCQQuestionScore.objects.filter(question__assessment=assessment, enrollment_id__in=enrollment_ids),
+            HandwrittenQuestionScore.objects.filter(question__assessment=assessment, enrollment_id__in=enrollment_ids),
+        ):
+            for enrollment_id, question_id, score in scored.values_list('enrollment_id', 'question_id', 'score').order_by():
+                scores[enrollment_id][question_id] = score
+        dynamic_scores = dict(MCQQuestionScore.objects.filter(
+            dynamic_question__dynamic_mcq__assessment=assessment, enrollment_id__in=enrollment_ids,
+        ).values('enrollment_id').annotate(total=Sum('score')).order_by().values_list('enrollment_id', 'total'))
+        submissions = {submission.enrollment_id: submission for submission in AssessmentSubmission.objects.filter(
+            assessment=assessment, enrollment_id__in=enrollment_ids).only('id', 'enrollment_id', 'is_submitted', 'submitted_at')}
+
+        for enrollment in chunk:
+            student_scores = scores.get(enrollment.id, {})
+            dynamic_score = dynamic_scores.get(enrollment.id)
+            if dynamic_score is not None:
+                dynamic_score = as_score(dynamic_score)
+            yield {
+                'enrollment': enrollment,
+                'submission': submissions.get(enrollment.id),
+                'scores': student_scores,
+                'dynamic_mcq_score': dynamic_score,
+                'total_score': as_score(sum(student_scores.values(), Decimal(0)) + (dynamic_score or 0)),
+            }
+
+
+def stream_gradebook_csv(assessment, enrollments):
+    """
+    Yield the gradebook of an assessment as CSV lines: a header, then one line per student with a
+    column per question. Questions a student wasn't scored on are left empty, and text a spreadsheet
+    would run as a formula is quoted.
+    """
+    columns = gradebook_columns(assessment)
+    has_dynamic_mcq = _has_dynamic_mcq(assessment)
+    writer = csv.writer(_Echo())
+
+    header = ['student_email', 'student_name', 'submitted', 'submitted_at']
+    header += [_cell(f"{column['type']} {number}: {column['question']} ({column['max_score']})")
+               for number, column in enumerate(columns, 1)]
+    if has_dynamic_mcq:
+        header.append('dynamic_mcq')
+    yield writer.writerow(header + ['total_score', f"max_score ({assessment.grade})"])
+
+    for row in gradebook_rows(assessment, enrollments):
+        user = row['enrollment'].user
+        submission = row['submission']
+        line = [
+            _cell(user.email),
+            _cell(_student_name(user)),
+            bool(submission and submission.is_submitted),
+            submission.submitted_at.isoformat() if submission and submission.submitted_at else '',
+        ]
+        line += [_score(row['scores'].get(column['id'])) or '' for column in columns]
+        if has_dynamic_mcq:
+            line.append(_score(row['dynamic_mcq_score']) or '')
+        yield writer.writerow(line + [row['total_score'], assessment.grade])
+
+
+def stream_gradebook_jsonl(assessment, enrollments):
+    """
+    Yield the gradebook of an assessment as JSON lines: the assessment and its questions, then one
+    line per student with their scores by question id, null where they weren't scored.
+    """
+    columns = gradebook_columns(assessment)
+    has_dynamic_mcq = _has_dynamic_mcq(assessment)
+    yield json.dumps({
+        'assessment_id': str(assessment.id),
+        'assessment_title': assessment.title,
+        'max_score': str(assessment.grade),
+        'has_dynamic_mcq': has_dynamic_mcq,
+        'questions': [{'id': str(column['id']), 'type': column['type'], 'question': column['question'],
+                       'max_score': str(column['max_score'])} for column in columns],
+    }) + '\n'
+
+    for row in gradebook_rows(assessment, enrollments):
+        user = row['enrollment'].user
+        submission = row['submission']
+        yield json.dumps({
+            'enrollment_id': str(row['enrollment'].id),
+            'student_email': user.email,
+            'student_name': _student_name(user),
+            'submitted': bool(submission and submission.is_submitted),
+            'submitted_at': submission.submitted_at.isoformat() if submission and submission.submitted_at else None,
+            'scores': {str(column['id']): _score(row['scores'].get(column['id'])) for column in columns},
+            'dynamic_mcq_score': _score(row['dynamic_mcq_score']),
+            'total_score': str(row['total_score']),
+        }) + '\n'
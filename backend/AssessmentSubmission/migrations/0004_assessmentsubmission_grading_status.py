@@ -0,0 +1,40 @@
+# Generated by Django 5.2.2 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+def mark_submitted_as_graded(apps, schema_editor):
+    # Submissions made before grading moved to the background were graded inline
+    AssessmentSubmission = apps.get_model(
+        'AssessmentSubmission', 'AssessmentSubmission')
+    AssessmentSubmission.objects.filter(
+        is_submitted=True).update(grading_status='graded')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AssessmentSubmission', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assessmentsubmission',
+            name='grading_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('grading', 'Grading'), ('graded', 'Graded'), ('failed', 'Failed')],
+                                   default='pending', help_text='Progress of the background grading of the handwritten answers', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='assessmentsubmission',
+            name='grading_errors',
+            field=models.JSONField(
+                blank=True, default=dict, help_text='Dictionary of question_id: error for answers that could not be graded'),
+        ),
+        migrations.AddField(
+            model_name='assessmentsubmission',
+            name='graded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_submitted_as_graded,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:30
+
+from django.db import migrations
+
+
+def remove_draft_flush_task(apps, schema_editor):
+    # Autosaved answers are written to the submission right away, the periodic merge is gone
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTask.objects.filter(name='flush_submission_drafts').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AssessmentSubmission', '0004_assessmentsubmission_grading_status'),
+        ('django_celery_beat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_draft_flush_task,
+                             migrations.RunPython.noop),
+    ]
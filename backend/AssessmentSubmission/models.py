@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from assessment.models import Assessment
 from enrollments.models import Enrollments
 from django.core.exceptions import ValidationError
@@ -9,6 +10,17 @@ import uuid
 
 
 class AssessmentSubmission(models.Model):
+    GRADING_PENDING = 'pending'
+    GRADING_IN_PROGRESS = 'grading'
+    GRADING_DONE = 'graded'
+    GRADING_FAILED = 'failed'
+    GRADING_STATUS_CHOICES = [
+        (GRADING_PENDING, 'Pending'),
+        (GRADING_IN_PROGRESS, 'Grading'),
+        (GRADING_DONE, 'Graded'),
+        (GRADING_FAILED, 'Failed'),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     assessment = models.ForeignKey(
         Assessment, on_delete=models.CASCADE, related_name='submissions')
@@ -20,6 +32,12 @@ class AssessmentSubmission(models.Model):
         default=dict, help_text="Dictionary of question_id: image_path")
     submitted_at = models.DateTimeField(auto_now_add=True)
     is_submitted = models.BooleanField(default=False)
+    grading_status = models.CharField(
+        max_length=10, choices=GRADING_STATUS_CHOICES, default=GRADING_PENDING,
+        help_text="Progress of the background grading of the handwritten answers")
+    grading_errors = models.JSONField(
+        default=dict, blank=True, help_text="Dictionary of question_id: error for answers that could not be graded")
+    graded_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         app_label = 'AssessmentSubmission'
@@ -41,11 +59,11 @@ class AssessmentSubmission(models.Model):
                 # Create MCQ scores
                 self.create_mcq_scores()
 
-                # Create Handwritten scores
-                self.create_handwritten_scores()
-
                 # Update assessment score
                 self.update_assessment_score()
+
+                # Handwritten answers are graded in the background once this is committed
+                self.queue_handwritten_grading()
             except Exception as e:
                 # If any error occurs during validation or score creation,
                 # set is_submitted back to False and save again
@@ -105,120 +123,148 @@ class AssessmentSubmission(models.Model):
 
     def create_mcq_scores(self):
         """Create MCQQuestionScore records for each answer"""
-        from MCQQuestionScore.models import MCQQuestionScore
-        from mcqQuestion.models import McqQuestion
-        from DynamicMCQ.models import DynamicMCQQuestions
-
-        for question_id, selected_answer in self.mcq_answers.items():
-            try:
-                # Try to get regular MCQ question first
-                try:
-                    question = McqQuestion.objects.get(id=question_id)
-                    is_dynamic = False
-                except McqQuestion.DoesNotExist:
-                    # If not found, try to get dynamic MCQ question
-                    question = DynamicMCQQuestions.objects.get(
-                        id=question_id,
-                        dynamic_mcq__assessment=self.assessment,
-                        created_by=self.enrollment.user
-                    )
-                    is_dynamic = True
-
-                # Create or update score
-                score_data = {
-                    'enrollment': self.enrollment,
-                    'selected_answer': selected_answer,
-                    'is_correct': selected_answer == question.answer_key,
-                    'score': question.question_grade if selected_answer == question.answer_key else 0
-                }
-
-                if is_dynamic:
-                    score_data['dynamic_question'] = question
-                else:
-                    score_data['question'] = question
-
-                MCQQuestionScore.objects.update_or_create(
-                    question=question if not is_dynamic else None,
-                    dynamic_question=question if is_dynamic else None,
-                    enrollment=self.enrollment,
-                    defaults=score_data
-                )
-            except (McqQuestion.DoesNotExist, DynamicMCQQuestions.DoesNotExist):
-                raise ValidationError(f"Question {question_id} does not exist")
-            except Exception as e:
-                raise ValidationError(
-                    f"Error creating score for question {question_id}: {str(e)}")
-
-    def create_handwritten_scores(self):
-        """Create HandwrittenQuestionScore records for each answer"""
+        from MCQQuestionScore.scoring import score_mcq_answers
+
+        # Answers were checked against the options by validate_answers
+        score_mcq_answers(self.assessment, self.enrollment, self.mcq_answers, check_options=False)
+
+    def queue_handwritten_grading(self):
+        """Queue a grading task per handwritten answer, they run after the surrounding transaction commits"""
+        from .tasks import enqueue_handwritten_grading
+
+        # Status changes go through update() so the submission isn't validated and scored again
+        if not self.handwritten_answers:
+            self.set_grading_status(self.GRADING_DONE)
+            return
+
+        self.set_grading_status(self.GRADING_PENDING)
+        transaction.on_commit(lambda: enqueue_handwritten_grading(self))
+
+    def set_grading_status(self, grading_status, **fields):
+        if grading_status in (self.GRADING_DONE, self.GRADING_FAILED):
+            fields.setdefault('graded_at', timezone.now())
+        fields['grading_status'] = grading_status
+        type(self).objects.filter(pk=self.pk).update(**fields)
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    def grade_handwritten_answer(self, question_id):
+        """
+        Evaluate one handwritten answer with AI and store its HandwrittenQuestionScore.
+
+        Args:
+            question_id (str): ID of the HandwrittenQuestion
+        Returns:
+            HandwrittenQuestionScore: The score, also when the answer had already been graded
+        """
         from HandwrittenQuestion.models import HandwrittenQuestionScore, HandwrittenQuestion
         from AI.evaluate_handwritten_answer import evaluate_handwritten_answer
-
-        for question_id, file_path in self.handwritten_answers.items():
-            question = HandwrittenQuestion.objects.get(id=question_id)
-
-            try:
-                # Get the full path to the file
-                full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-
-                # Open the file
-                with open(full_path, 'rb') as file_obj:
-                    # Evaluate the answer using AI
-                    print("Evaluating answer using AI")
-                    score, feedback, extracted_text = evaluate_handwritten_answer(
-                        question=question.question_text,
-                        answer_key=question.answer_key,
-                        student_answer_image=file_obj,
-                        max_grade=float(question.max_grade)
-                    )
-
-                    print("Creating or updating score")
-                    # Create or update score
-                    score_obj, _ = HandwrittenQuestionScore.objects.update_or_create(
-                        question=question,
-                        enrollment=self.enrollment,
-                        defaults={
-                            'score': score,
-                            'feedback': feedback,
-                            'extracted_text': extracted_text
-                        }
-                    )
-
-                    print("Saving the file using Django's file handling")
-                    # Save the file using Django's file handling
-                    with open(full_path, 'rb') as f:
-                        score_obj.answer_image.save(
-                            os.path.basename(file_path),
-                            File(f),
-                            save=True
-                        )
-                if os.path.exists(full_path):
-                    os.remove(full_path)
-                    print(f"Deleted temporary file: {full_path}")
-
-                    # Delete empty parent directory
-                    dir_path = os.path.dirname(full_path)
-                    if os.path.exists(dir_path) and not os.listdir(dir_path):
-                        os.rmdir(dir_path)
-                        print(f"Deleted empty directory: {dir_path}")
-
-            except Exception as e:
-                raise ValidationError(
-                    f"Error evaluating handwritten answer: {str(e)}")
+        from AI.telemetry import ai_call_context
+
+        question = HandwrittenQuestion.objects.get(id=question_id)
+        existing = HandwrittenQuestionScore.objects.filter(
+            question=question, enrollment=self.enrollment).first()
+        if existing:
+            # A retried or duplicated task, the temporary file is already gone
+            return existing
+
+        file_path = self.handwritten_answers[str(question_id)]
+        full_path = os.path.join(settings.MEDIA_ROOT, file_path)
+
+        with open(full_path, 'rb') as file_obj, ai_call_context(
+                institution_id=self.enrollment.course.institution_id, assessment_id=self.assessment_id):
+            score, feedback, extracted_text = evaluate_handwritten_answer(
+                question=question.question_text,
+                answer_key=question.answer_key,
+                student_answer_image=file_obj,
+                max_grade=float(question.max_grade)
+            )
+
+        score_obj = HandwrittenQuestionScore(
+            question=question,
+            enrollment=self.enrollment,
+            score=score,
+            feedback=feedback,
+            extracted_text=extracted_text
+        )
+        # Saving the image saves the score, which also updates the assessment score
+        with open(full_path, 'rb') as f:
+            score_obj.answer_image.save(
+                os.path.basename(file_path),
+                File(f),
+                save=True
+            )
+
+        os.remove(full_path)
+        # Delete empty parent directory
+        dir_path = os.path.dirname(full_path)
+        if os.path.exists(dir_path) and not os.listdir(dir_path):
+            os.rmdir(dir_path)
+        return score_obj
+
+    def graded_question_ids(self):
+        from HandwrittenQuestion.models import HandwrittenQuestionScore
+
+        return {str(question_id) for question_id in HandwrittenQuestionScore.objects.filter(
+            enrollment=self.enrollment,
+            question_id__in=list(self.handwritten_answers)
+        ).values_list('question_id', flat=True)}
+
+    def finish_grading(self, question_id=None, error=None):
+        """
+        Record the outcome of one grading task and close the submission once every answer has one.
+
+        Args:
+            question_id (str): Question whose grading failed for good
+            error (str): Why it failed
+        """
+        with transaction.atomic():
+            # Tasks of the same submission finish concurrently, serialize the status update
+            submission = type(self).objects.select_for_update().get(pk=self.pk)
+            grading_errors = dict(submission.grading_errors)
+            if question_id is not None and error is not None:
+                grading_errors[str(question_id)] = error
+
+            graded = self.graded_question_ids()
+            remaining = set(submission.handwritten_answers) - \
+                graded - set(grading_errors)
+            if remaining:
+                if submission.grading_errors != grading_errors:
+                    submission.set_grading_status(
+                        submission.grading_status, grading_errors=grading_errors)
+            elif grading_errors:
+                submission.set_grading_status(
+                    self.GRADING_FAILED, grading_errors=grading_errors)
+            else:
+                submission.set_grading_status(self.GRADING_DONE)
+
+        self.grading_status = submission.grading_status
+        self.grading_errors = submission.grading_errors
+        self.graded_at = submission.graded_at
+
+    def grading_progress(self):
+        """Grading status payload for polling and streaming clients"""
+        graded = self.graded_question_ids() if self.handwritten_answers else set()
+        return {
+            'submission_id': str(self.id),
+            'grading_status': self.grading_status,
+            'total_questions': len(self.handwritten_answers),
+            'graded_questions': len(graded),
+            'failed_questions': list(self.grading_errors),
+            'graded_at': self.graded_at.isoformat() if self.graded_at else None,
+        }
 
     def update_assessment_score(self):
-        """Update the AssessmentScore with total score"""
+        """Make sure the submission has an AssessmentScore, even one nothing was scored for yet"""
         from assessment.models import AssessmentScore
 
-        assessment_score, created = AssessmentScore.objects.get_or_create(
+        # Its total is rolled up from the question scores as they are saved
+        AssessmentScore.objects.get_or_create(
             enrollment=self.enrollment,
             assessment=self.assessment,
             defaults={'total_score': 0}
         )
 
-        # The AssessmentScore's save method will automatically calculate the total score
-        assessment_score.save()
-
     @classmethod
     def get_or_create_submission(cls, assessment, enrollment):
         """Get existing submission or create a new one"""
@@ -17,11 +17,12 @@ class AssessmentSubmissionSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'assessment_id', 'enrollment_id', 'student_email',
             'assessment_title', 'course_name', 'mcq_answers',
-            'handwritten_answers',  'submitted_at', 'is_submitted'
+            'handwritten_answers',  'submitted_at', 'is_submitted',
+            'grading_status', 'graded_at'
         )
         read_only_fields = (
             'id', 'student_email', 'assessment_title',
-            'course_name', 'submitted_at'
+            'course_name', 'submitted_at', 'grading_status', 'graded_at'
         )
 
     def get_enrollment_id(self, obj):
@@ -0,0 +1,86 @@
+import json
+import time
+import logging
+from drf_sse import SSEMixin, SSEResponse
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from drf_spectacular.types import OpenApiTypes
+from assessment.authentication import EventStreamAuthentication
+
+from .models import AssessmentSubmission
+from .views import AssessmentSubmissionPermission
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two looks at the grading status
+POLL_INTERVAL = 2
+# Close the stream after this many seconds, clients reconnect or fall back to polling
+STREAM_TIMEOUT = 10 * 60
+
+
+class SubmissionGradingStatusStreamView(SSEMixin, APIView):
+    """
+    Server-Sent Events endpoint following the grading of a submission's handwritten answers.
+    GET /assessmentSubmission/grading-status/{submission_id}/stream/{token}/
+
+    An event with the same payload as grading-status/{submission_id}/ is sent whenever the
+    progress changes, the stream ends once the status is graded or failed.
+    """
+    authentication_classes = [EventStreamAuthentication]
+
+    @extend_schema(
+        description="SSE endpoint streaming the grading progress of a submission",
+        parameters=[
+            OpenApiParameter(
+                name='token',
+                description='JWT token for authentication',
+                required=True,
+                type=str,
+                location=OpenApiParameter.PATH
+            ),
+            OpenApiParameter(
+                name='submissionId',
+                description='ID of the submission',
+                required=True,
+                type=OpenApiTypes.UUID,
+                location=OpenApiParameter.PATH
+            ),
+        ],
+        responses={200: None},
+    )
+    def get(self, request, submissionId, token):
+        # Authenticate user with the token, EventSource can't send headers
+        user = self.authentication_classes[0]().authenticate(token)
+        if not user:
+            return Response({'error': 'Authentication failed'}, status=401)
+
+        request.user = user
+
+        try:
+            submission = AssessmentSubmission.objects.select_related(
+                'assessment__course', 'enrollment').get(id=submissionId)
+        except AssessmentSubmission.DoesNotExist:
+            return Response({'error': 'Submission not found'}, status=404)
+        if not AssessmentSubmissionPermission().has_object_permission(request, self, submission):
+            return Response({'error': 'You do not have permission to view this submission'}, status=403)
+
+        def iter_data():
+            last = None
+            deadline = time.monotonic() + STREAM_TIMEOUT
+            current = submission
+            while True:
+                progress = current.grading_progress()
+                if progress != last:
+                    yield json.dumps(progress)
+                    last = progress
+                if progress['grading_status'] in (AssessmentSubmission.GRADING_DONE, AssessmentSubmission.GRADING_FAILED):
+                    return
+                if time.monotonic() >= deadline:
+                    logger.info(
+                        f"Grading status stream of {submissionId} timed out")
+                    return
+                time.sleep(POLL_INTERVAL)
+                current = AssessmentSubmission.objects.get(id=submissionId)
+
+        return SSEResponse(iter_data())
@@ -0,0 +1,85 @@
+from celery import shared_task
+from django.core.cache import caches
+from main.settings import (AI_CALL_TIMEOUT, HANDWRITTEN_GRADING_MAX_RETRIES,
+                           HANDWRITTEN_GRADING_RETRY_DELAY, HANDWRITTEN_GRADING_SLOTS_PER_INSTITUTION)
+from .models import AssessmentSubmission
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A slot outlives the call it guards by a margin, and frees itself if the worker dies holding it
+GRADING_SLOT_TIMEOUT = int(AI_CALL_TIMEOUT * 2)
+# Seconds to wait before trying again when the institution has no free slot
+GRADING_SLOT_WAIT = 10
+
+
+def enqueue_handwritten_grading(submission):
+    """Queue a grading task for every handwritten answer of a submission"""
+    for question_id in submission.handwritten_answers:
+        try:
+            grade_handwritten_answer.delay(str(submission.id), question_id)
+        except Exception as e:
+            logger.error(
+                f"Failed to queue grading of question {question_id} for submission {submission.id}: {str(e)}")
+            submission.finish_grading(
+                question_id, "The answer could not be queued for grading")
+
+
+def acquire_grading_slot(institution_id):
+    """
+    Take one of the institution's grading slots.
+
+    Returns:
+        str: Cache key of the slot, None if all of them are taken
+    """
+    for slot in range(HANDWRITTEN_GRADING_SLOTS_PER_INSTITUTION):
+        key = f"handwritten_grading_slot:{institution_id}:{slot}"
+        # Shared, so the limit holds across every celery worker process
+        if caches['shared'].add(key, True, GRADING_SLOT_TIMEOUT):
+            return key
+    return None
+
+
+# Retries are limited by hand: waiting for a slot is unlimited, failures stop at HANDWRITTEN_GRADING_MAX_RETRIES
+@shared_task(bind=True, max_retries=None)
+def grade_handwritten_answer(self, submission_id, question_id, attempt=0):
+    """Grade one handwritten answer, at most HANDWRITTEN_GRADING_SLOTS_PER_INSTITUTION run per institution"""
+    try:
+        submission = AssessmentSubmission.objects.select_related(
+            'enrollment__course').get(id=submission_id)
+    except AssessmentSubmission.DoesNotExist:
+        return None
+    if question_id not in submission.handwritten_answers:
+        return None
+
+    slot = acquire_grading_slot(submission.enrollment.course.institution_id)
+    if slot is None:
+        # Waiting for a slot is not a failed attempt
+        raise self.retry(countdown=GRADING_SLOT_WAIT, max_retries=None)
+
+    try:
+        if submission.grading_status == AssessmentSubmission.GRADING_PENDING:
+            submission.set_grading_status(
+                AssessmentSubmission.GRADING_IN_PROGRESS)
+        score = submission.grade_handwritten_answer(question_id)
+    except Exception as e:
+        if attempt >= HANDWRITTEN_GRADING_MAX_RETRIES:
+            logger.error(
+                f"Giving up grading question {question_id} for submission {submission_id}: {str(e)}")
+            submission.finish_grading(question_id, str(e))
+            return None
+
+        logger.warning(
+            f"Grading question {question_id} for submission {submission_id} failed, retrying: {str(e)}")
+        raise self.retry(
+            exc=e,
+            countdown=HANDWRITTEN_GRADING_RETRY_DELAY * 2 ** attempt,
+            max_retries=None,
+            kwargs={'attempt': attempt + 1},
+        )
+    finally:
+        caches['shared'].delete(slot)
+
+    submission.finish_grading()
+    return str(score.score)
+
@@ -1,7 +1,17 @@
 from django.urls import path
-from .views import AssessmentSubmissionAPIView
+from .views import (AssessmentGradebookExportAPIView, AssessmentSubmissionAPIView, SubmissionDraftAPIView,
+                    SubmissionGradingStatusAPIView)
+from .sse import SubmissionGradingStatusStreamView
 
 urlpatterns = [
     path('<uuid:assessmentId>/', AssessmentSubmissionAPIView.as_view(),
          name='assessment-submission'),
+    path('<uuid:assessmentId>/draft/', SubmissionDraftAPIView.as_view(),
+         name='assessment-submission-draft'),
+    path('<uuid:assessmentId>/gradebook/', AssessmentGradebookExportAPIView.as_view(),
+         name='assessment-gradebook-export'),
+    path('grading-status/<uuid:submissionId>/', SubmissionGradingStatusAPIView.as_view(),
+         name='submission-grading-status'),
+    path('grading-status/<uuid:submissionId>/stream/<str:token>/', SubmissionGradingStatusStreamView.as_view(),
+         name='submission-grading-status-stream'),
 ]
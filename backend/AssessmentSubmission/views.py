@@ -1,8 +1,14 @@
 from rest_framework import generics, permissions
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from django.db import transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from .drafts import close_draft, draft_submission, get_draft, reopen_draft, save_draft_answers
+from .errors import DraftBusy
+from .gradebook import stream_gradebook_csv, stream_gradebook_jsonl
 from .models import AssessmentSubmission
 from .serializers import AssessmentSubmissionSerializer
 from assessment.models import Assessment
@@ -149,7 +155,7 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
         The response includes both MCQ and handwritten questions with their respective scores.
         """
         try:
-            assessment_id = kwargs.get('pk')
+            assessment_id = kwargs.get('assessmentId')
             assessment = Assessment.objects.get(id=assessment_id)
             user = request.user
 
@@ -232,6 +238,20 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
                 # Get MCQ answers for this submission
                 mcq_answers = submission.mcq_answers
 
+                # All of the submission's scores at once, looked up per question below
+                mcq_scores = {}
+                for score in MCQQuestionScore.objects.filter(
+                    Q(question__assessment=assessment) | Q(dynamic_question__dynamic_mcq__assessment=assessment),
+                    enrollment=submission.enrollment
+                ):
+                    mcq_scores[score.question_id or score.dynamic_question_id] = score
+                handwritten_scores = {
+                    score.question_id: score for score in HandwrittenQuestionScore.objects.filter(
+                        question__assessment=assessment,
+                        enrollment=submission.enrollment
+                    )
+                }
+
                 # Add MCQ questions with their answers
                 for question in mcq_questions:
                     question_data = {
@@ -246,11 +266,8 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
                     if str(question.id) in mcq_answers:
                         answer = mcq_answers[str(question.id)]
                         # Get the score for this question
-                        try:
-                            score = MCQQuestionScore.objects.get(
-                                question=question,
-                                enrollment=submission.enrollment
-                            )
+                        score = mcq_scores.get(question.id)
+                        if score:
                             question_data.update({
                                 'selected_answer': answer,
                                 'is_correct': answer == question.answer_key,
@@ -258,7 +275,7 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
                                 'max_score': str(question.question_grade)
                             })
                             response_data['total_score'] += float(score.score)
-                        except MCQQuestionScore.DoesNotExist:
+                        else:
                             question_data.update({
                                 'selected_answer': answer,
                                 'is_correct': answer == question.answer_key,
@@ -284,11 +301,8 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
                     if str(question.id) in mcq_answers:
                         answer = mcq_answers[str(question.id)]
                         # Get the score for this question
-                        try:
-                            score = MCQQuestionScore.objects.get(
-                                dynamic_question=question,
-                                enrollment=submission.enrollment
-                            )
+                        score = mcq_scores.get(question.id)
+                        if score:
                             question_data.update({
                                 'selected_answer': answer,
                                 'is_correct': answer == question.answer_key,
@@ -296,7 +310,7 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
                                 'max_score': str(question.question_grade)
                             })
                             response_data['total_score'] += float(score.score)
-                        except MCQQuestionScore.DoesNotExist:
+                        else:
                             question_data.update({
                                 'selected_answer': answer,
                                 'is_correct': answer == question.answer_key,
@@ -319,11 +333,8 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
 
                     # Add student's answer if available
                     if str(question.id) in submission.handwritten_answers:
-                        try:
-                            score = HandwrittenQuestionScore.objects.get(
-                                question=question,
-                                enrollment=submission.enrollment
-                            )
+                        score = handwritten_scores.get(question.id)
+                        if score:
                             question_data.update({
                                 'image_url': request.build_absolute_uri(score.answer_image.url) if score.answer_image else None,
                                 'extracted_text': score.extracted_text,
@@ -332,8 +343,6 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
                                 'max_score': str(question.max_grade)
                             })
                             response_data['total_score'] += float(score.score)
-                        except HandwrittenQuestionScore.DoesNotExist:
-                            pass
 
                     response_data['max_score'] += float(question.max_grade)
                     response_data['questions'].append(question_data)
@@ -376,15 +385,20 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
         1. Validates the assessment exists and is accepting submissions
         2. Checks student enrollment
         3. Validates answers against questions
-        4. Creates scores for each answer
+        4. Creates scores for each MCQ answer
         5. Updates the submission status
+        6. Queues the grading of the handwritten answers, follow it with
+           grading-status/{submission_id}/ or its stream
 
         Returns:
         - 201: Assessment submitted successfully
         - 400: Invalid input data
         - 403: Not authorized to submit
         - 404: Assessment not found
+        - 503: The student's autosaved answers are being saved, try again
         """
+        # Set once the draft is closed for the submit, and back to False once the submit is committed
+        draft_closed = False
         try:
             # Get assessment ID from URL
             assessment_id = kwargs.get('assessmentId')
@@ -471,7 +485,12 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
             # Process MCQ answers if provided
             mcq_data = request.data.get('mcq_answers')
             print(f"Received MCQ data: {mcq_data}")
-            if mcq_data is not None and (mcq_questions.exists() or dynamic_mcq_questions.exists()):
+            # Answers autosaved while the assessment was taken, the ones sent with the submission win.
+            # The draft is closed first, an autosave arriving from now on is refused instead of lost
+            close_draft(submission.id, assessment.due_date)
+            draft_closed = True
+            saved_answers = get_draft(submission)['answers']
+            if (mcq_data is not None or saved_answers) and (mcq_questions.exists() or dynamic_mcq_questions.exists()):
                 print(f"Processing MCQ answers: {mcq_data}")
                 # Get question details for better error messages
                 question_details = {}
@@ -494,7 +513,9 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
                         'question_grade': str(q.question_grade)
                     }
 
-                if isinstance(mcq_data, str):
+                if mcq_data is None:
+                    mcq_data = {}
+                elif isinstance(mcq_data, str):
                     try:
                         mcq_data = json.loads(mcq_data)
                     except json.JSONDecodeError:
@@ -532,6 +553,12 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
 
                     mcq_answers[question_id] = answer
 
+                # Saved answers the questions don't take anymore are dropped instead of failing the submission
+                for question_id, answer in saved_answers.items():
+                    if question_id not in mcq_answers and question_id in question_details \
+                            and answer in question_details[question_id]['options']:
+                        mcq_answers[question_id] = answer
+
             # Process Handwritten answers
             print(f"Processing files: {list(request.FILES.keys())}")
             for question_id, file in request.FILES.items():
@@ -565,7 +592,7 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Update submission and create scores
+            # Update submission and create scores, handwritten answers are graded in the background
             with transaction.atomic():
                 # Update submission
                 if mcq_answers:
@@ -580,10 +607,14 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
                 # Update assessment score
                 submission.update_assessment_score()
                 print("Updated assessment score")
+            # Submitted, the draft stays closed
+            draft_closed = False
 
             # Return success message with details
             response_data = {
                 "message": "Assessment submitted successfully",
+                "submission_id": str(submission.id),
+                "grading_status": submission.grading_status,
                 "submission_details": {
                     "mcq_answers_count": len(mcq_answers) if mcq_answers else 0,
                     "handwritten_answers_count": len(handwritten_answers) if handwritten_answers else 0,
@@ -592,6 +623,8 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
 
             return Response(response_data, status=status.HTTP_201_CREATED)
 
+        except DraftBusy:
+            raise
         except Exception as e:
             print(f"Error in create method: {str(e)}")
             import traceback
@@ -600,3 +633,152 @@ class AssessmentSubmissionAPIView(generics.CreateAPIView):
                 {"detail": f"An error occurred: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        finally:
+            # The submit was refused or failed, the student keeps autosaving
+            if draft_closed:
+                reopen_draft(submission.id)
+
+
+class SubmissionDraftAPIView(generics.GenericAPIView):
+    """
+    Autosave a student's MCQ answers while they take an assessment.
+
+    GET /assessmentSubmission/{assessment_id}/draft/
+    The answers saved so far, to resume the assessment after a crash or a reload.
+
+    PATCH /assessmentSubmission/{assessment_id}/draft/
+    ```json
+    {
+        "answers": {"question_id": "selected_answer"},
+        "version": 42
+    }
+    ```
+    version must grow with every change the student makes (e.g. a counter or a timestamp in ms),
+    an answer sent with a version older than the one saved for its question is ignored.
+
+    Changes are written to the submission right away, the draft in the cache only keeps the
+    version of each answer.
+
+    Returns:
+    ```json
+    {
+        "submission_id": "uuid",
+        "version": 17,
+        "answers": {"question_id": "selected_answer"},
+        "ignored": ["question_id"]
+    }
+    ```
+    answers only on GET, ignored only on PATCH. 409 once the assessment was submitted, 503 when
+    autosave isn't configured (no DRAFT_CACHE_URL or SHARED_CACHE_URL).
+    """
+    permission_classes = [permissions.IsAuthenticated, isStudent]
+    parser_classes = [JSONParser]
+
+    def get(self, request, *args, **kwargs):
+        owner = draft_submission(kwargs['assessmentId'], request.user)
+        submission = AssessmentSubmission.objects.only('id', 'mcq_answers').get(id=owner['submission_id'])
+        draft = get_draft(submission)
+        return Response({
+            'submission_id': owner['submission_id'],
+            'version': draft['version'],
+            'answers': draft['answers'],
+        })
+
+    def patch(self, request, *args, **kwargs):
+        version = request.data.get('version')
+        if isinstance(version, bool) or not isinstance(version, int) or version < 0:
+            raise ValidationError({"version": "Must be a non-negative integer"})
+
+        owner = draft_submission(kwargs['assessmentId'], request.user)
+        draft_version, ignored = save_draft_answers(owner, request.data.get('answers'), version)
+        return Response({
+            'submission_id': owner['submission_id'],
+            'version': draft_version,
+            'ignored': ignored,
+        })
+
+
+class SubmissionGradingStatusAPIView(generics.RetrieveAPIView):
+    """
+    Poll the grading of a submission's handwritten answers.
+
+    GET /assessmentSubmission/grading-status/{submission_id}/
+
+    Returns:
+    ```json
+    {
+        "submission_id": "uuid",
+        "grading_status": "pending | grading | graded | failed",
+        "total_questions": 3,
+        "graded_questions": 1,
+        "failed_questions": ["question_id"],
+        "graded_at": "datetime or null"
+    }
+    ```
+    """
+    permission_classes = [permissions.IsAuthenticated,
+                          AssessmentSubmissionPermission]
+    queryset = AssessmentSubmission.objects.select_related(
+        'assessment__course', 'enrollment')
+    lookup_url_kwarg = 'submissionId'
+
+    def retrieve(self, request, *args, **kwargs):
+        submission = self.get_object()
+        return Response(submission.grading_progress())
+
+
+class AssessmentGradebookExportAPIView(generics.GenericAPIView):
+    """
+    Export the gradebook of an assessment: one row per student of the course, one column per question.
+
+    GET /assessmentSubmission/{assessment_id}/gradebook/?export_format=csv|jsonl&is_completed=false
+
+    csv (the default) has a header row, then per student their email, name, whether and when they
+    submitted, their score on each MCQ and handwritten question (empty if not scored), their dynamic
+    MCQ total if the assessment has dynamic MCQ, their total score and the assessment's grade.
+
+    jsonl starts with a line describing the assessment and its questions, followed by a line per
+    student with their scores keyed by question id.
+
+    The rows are streamed as they are read, a chunk of students at a time.
+
+    Permissions:
+    - Teachers: For the courses they teach
+    - Institutions: For their courses
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    export_formats = {
+        'csv': (stream_gradebook_csv, 'text/csv'),
+        'jsonl': (stream_gradebook_jsonl, 'application/x-ndjson'),
+    }
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get('export_format', 'csv').lower()
+        if export_format not in self.export_formats:
+            raise ValidationError({"export_format": f"Must be one of {', '.join(self.export_formats)}"})
+
+        try:
+            assessment = Assessment.objects.select_related('course').get(id=kwargs['assessmentId'])
+        except Assessment.DoesNotExist:
+            raise NotFound("Assessment not found")
+
+        user = request.user
+        if user.role == "Teacher":
+            allowed = assessment.course.instructors.filter(id=user.id).exists()
+        elif user.role == "Institution":
+            allowed = assessment.course.institution_id == user.id
+        else:
+            allowed = False
+        if not allowed:
+            raise PermissionDenied("You don't have permission to view these submissions")
+
+        is_completed = request.query_params.get('is_completed', 'false').lower() == 'true'
+        enrollments = Enrollments.objects.filter(
+            course=assessment.course,
+            is_completed=is_completed
+        ).select_related('user').order_by('user__email', 'id')
+
+        stream, content_type = self.export_formats[export_format]
+        response = StreamingHttpResponse(stream(assessment, enrollments), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="gradebook-{assessment.id}.{export_format}"'
+        return response
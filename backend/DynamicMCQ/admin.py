@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import DynamicMCQ, DynamicMCQQuestions
+from .models import DynamicMCQ, DynamicMCQQuestions, DynamicMCQPoolQuestion
 
 admin.site.register(DynamicMCQ)
 admin.site.register(DynamicMCQQuestions)
+admin.site.register(DynamicMCQPoolQuestion)
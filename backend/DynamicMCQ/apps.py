@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DynamicMCQConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'DynamicMCQ'
+
+    def ready(self):
+        import DynamicMCQ.signals  # Import signals when app is ready
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.2 on 2026-10-18 10:00
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DynamicMCQ', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DynamicMCQPoolQuestion',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4,
+                 editable=False, primary_key=True, serialize=False)),
+                ('question', models.TextField()),
+                ('options', models.JSONField(
+                    help_text='List of options for the question')),
+                ('answer_key', models.CharField(
+                    help_text='The correct answer from the options', max_length=255)),
+                ('difficulty', models.CharField(choices=[('1', 'Very Easy'), ('2', 'Easy'), (
+                    '3', 'Medium'), ('4', 'Hard'), ('5', 'Very Hard')], default='3', max_length=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('dynamic_mcq', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                 related_name='pool', to='DynamicMCQ.dynamicmcq')),
+            ],
+            options={
+                'verbose_name': 'Dynamic MCQ Pool Question',
+                'verbose_name_plural': 'Dynamic MCQ Pool Questions',
+                'ordering': ['dynamic_mcq', 'created_at'],
+            },
+        ),
+    ]
@@ -1,7 +1,15 @@
-from django.db import models
+from django.db import models, transaction
+from django.apps import apps
+from django.core.exceptions import ValidationError
+import logging
+import random
 import uuid
+from functools import partial
 from assessment.models import Assessment
 from users.models import User
+from main.settings import DYNAMIC_MCQ_POOL_MULTIPLIER
+
+logger = logging.getLogger(__name__)
 
 
 class DynamicMCQ(models.Model):
@@ -45,6 +53,155 @@ class DynamicMCQ(models.Model):
             raise models.ValidationError(
                 "Number of options must be between 2 and 6")
 
+    @property
+    def pool_target_size(self):
+        """Number of questions the background builder keeps in the pool"""
+        return self.number_of_questions * DYNAMIC_MCQ_POOL_MULTIPLIER
+
+    def generate_questions(self, number_of_questions, fallback=True):
+        """
+        Generate questions with the AI from the context, falling back to the lecture PDFs
+        Args:
+            number_of_questions (int): Number of questions to generate
+            fallback (bool): Allow the generators to return a sample question instead of failing
+        Returns:
+            list: MCQ dictionaries with question, options and correct_answer
+        """
+        from AI.generate_mcq_from_text import generate_mcqs_from_text, MAX_TEXT_LENGTH
+        from AI.generate_mcqs_from_multiple_pdfs import generate_mcqs_from_multiple_pdfs
+        from AI.telemetry import ai_call_context
+        Lecture = apps.get_model('lecture', 'Lecture')
+
+        generated_questions = None
+        # The AI calls are billed to the assessment's institution
+        call_context = partial(
+            ai_call_context, institution_id=self.assessment.course.institution_id, assessment_id=self.assessment_id)
+
+        # First try to use context if available
+        if self.context:
+            try:
+                with call_context():
+                    generated_questions = generate_mcqs_from_text(
+                        text=self.context,
+                        number_of_questions=number_of_questions,
+                        difficulty=self.difficulty,
+                        num_options=self.num_options,
+                        fallback=fallback
+                    )
+            except Exception as e:
+                logger.error(
+                    f"Error generating questions from context: {str(e)}")
+                if not self.lecture_ids:
+                    raise
+
+        # If context generation failed or no context, try lecture_ids
+        if not generated_questions and self.lecture_ids:
+            # Ensure lecture_ids is a list of valid UUIDs
+            lecture_ids = [str(id) for id in self.lecture_ids if id]
+            lectures = Lecture.objects.filter(
+                id__in=lecture_ids,
+                attachment__isnull=False
+            ).select_related('text')
+
+            # Get all PDF attachments
+            pdf_lectures = [lecture for lecture in lectures
+                            if lecture.attachment and lecture.attachment.name.endswith('.pdf')]
+            pdf_files = [lecture.attachment for lecture in pdf_lectures]
+            if not pdf_files:
+                raise ValidationError("No PDF attachments found in lectures")
+
+            with call_context():
+                generated_questions = generate_mcqs_from_multiple_pdfs(
+                    pdf_files=pdf_files,
+                    # Text extracted at upload time, lectures that aren't ready are parsed here
+                    texts=[lecture.extracted_text(MAX_TEXT_LENGTH)
+                           for lecture in pdf_lectures],
+                    # Shared out across the lectures by the generator
+                    number_of_questions=number_of_questions,
+                    source_ids=[str(lecture.id) for lecture in pdf_lectures],
+                    difficulty=self.difficulty,
+                    num_options=self.num_options,
+                    fallback=fallback
+                )
+
+        return generated_questions or []
+
+    def fill_pool(self, target=None):
+        """
+        Top the question pool up to target questions, skipping duplicates and malformed questions
+        Args:
+            target (int): Pool size to reach, defaults to pool_target_size
+        Returns:
+            int: Number of questions added
+        """
+        target = target or self.pool_target_size
+        seen = set(self.pool.values_list('question', flat=True))
+        added = 0
+
+        while len(seen) < target:
+            batch = min(self.number_of_questions, target - len(seen))
+            new_questions = []
+            for q in self.generate_questions(batch, fallback=False):
+                if not isinstance(q, dict) or not q.get('question') or q['question'] in seen:
+                    continue
+                options = q.get('options')
+                answer = q.get('correct_answer')
+                if not isinstance(options, list) or answer not in options or len(str(answer)) > 255:
+                    continue
+                seen.add(q['question'])
+                new_questions.append(DynamicMCQPoolQuestion(
+                    dynamic_mcq=self,
+                    question=q['question'],
+                    options=options,
+                    answer_key=answer,
+                    difficulty=self.difficulty
+                ))
+
+            # The source may not support more distinct questions, don't spin on it
+            if not new_questions:
+                break
+            DynamicMCQPoolQuestion.objects.bulk_create(new_questions)
+            added += len(new_questions)
+
+        logger.info(
+            f"Added {added} questions to the pool of {self.id}, pool has {len(seen)}/{target}")
+        return added
+
+    def draw_questions_for_student(self, student):
+        """
+        Give a student their own set of questions drawn at random from the pool.
+
+        If the pool can't cover the set yet, the rest is generated on the spot and a pool build is queued.
+        Returns:
+            list: The created DynamicMCQQuestions
+        """
+        pool = list(self.pool.all())
+        picked = random.sample(pool, min(len(pool), self.number_of_questions))
+        drafts = [(q.question, q.options, q.answer_key) for q in picked]
+
+        missing = self.number_of_questions - len(drafts)
+        if missing:
+            from DynamicMCQ.tasks import enqueue_pool_build
+            logger.warning(
+                f"Question pool of {self.id} has {len(pool)} questions, generating {missing} on the request path")
+            transaction.on_commit(lambda: enqueue_pool_build(self.id))
+            for q in self.generate_questions(missing)[:missing]:
+                drafts.append((q['question'], q['options'], q['correct_answer']))
+
+        question_grade = self.total_grade / self.number_of_questions
+        return DynamicMCQQuestions.objects.bulk_create([
+            DynamicMCQQuestions(
+                dynamic_mcq=self,
+                question=question,
+                options=options,
+                answer_key=answer_key,
+                question_grade=question_grade,
+                created_by=student,
+                difficulty=self.difficulty
+            )
+            for question, options, answer_key in drafts
+        ])
+
 
 class DynamicMCQQuestions(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -78,3 +235,29 @@ class DynamicMCQQuestions(models.Model):
         if self.answer_key not in self.options:
             raise models.ValidationError(
                 "Answer key must be one of the provided options")
+
+
+class DynamicMCQPoolQuestion(models.Model):
+    """A pre-generated question that student sets are drawn from"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    dynamic_mcq = models.ForeignKey(
+        DynamicMCQ, on_delete=models.CASCADE, related_name='pool')
+    question = models.TextField()
+    options = models.JSONField(help_text="List of options for the question")
+    answer_key = models.CharField(
+        max_length=255, help_text="The correct answer from the options")
+    difficulty = models.CharField(
+        max_length=1,
+        choices=DynamicMCQ.DIFFICULTY_CHOICES,
+        default='3'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Pool question for {self.dynamic_mcq}"
+
+    class Meta:
+        app_label = 'DynamicMCQ'
+        verbose_name = "Dynamic MCQ Pool Question"
+        verbose_name_plural = "Dynamic MCQ Pool Questions"
+        ordering = ['dynamic_mcq', 'created_at']
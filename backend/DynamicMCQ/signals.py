@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save
+from django.dispatch import receiver
+from .models import DynamicMCQ
+from .tasks import enqueue_pool_build
+
+# Fields the generated questions depend on
+POOL_SOURCE_FIELDS = ['context', 'lecture_ids', 'difficulty', 'num_options']
+
+
+@receiver(pre_save, sender=DynamicMCQ)
+def drop_stale_pool(sender, instance, **kwargs):
+    """
+    Empty the question pool when the source or shape of its questions changes
+    """
+    if instance._state.adding:
+        return
+
+    try:
+        old = DynamicMCQ.objects.get(pk=instance.pk)
+    except DynamicMCQ.DoesNotExist:
+        return
+
+    if any(getattr(old, field) != getattr(instance, field) for field in POOL_SOURCE_FIELDS):
+        old.pool.all().delete()
+
+
+@receiver(post_save, sender=DynamicMCQ)
+def build_pool_on_save(sender, instance, **kwargs):
+    """
+    Start filling the question pool as soon as the DynamicMCQ is saved
+    """
+    transaction.on_commit(lambda: enqueue_pool_build(instance.id))
@@ -0,0 +1,76 @@
+from celery import shared_task
+from datetime import timedelta
+from django.core.cache import caches
+from django.db.models import Count, F
+from django.utils import timezone
+from main.settings import DYNAMIC_MCQ_POOL_LEAD_HOURS, DYNAMIC_MCQ_POOL_MULTIPLIER
+from .models import DynamicMCQ
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Builds run on every celery worker, they must all see the same lock
+shared_cache = caches['shared']
+
+# Longest a single pool build may hold its lock
+POOL_BUILD_LOCK_TIMEOUT = 30 * 60
+
+
+def enqueue_pool_build(dynamic_mcq_id):
+    """Queue a pool build, a missing broker must not break the request that asked for it"""
+    try:
+        build_question_pool.delay(str(dynamic_mcq_id))
+    except Exception as e:
+        logger.error(
+            f"Failed to queue question pool build for {dynamic_mcq_id}: {str(e)}")
+
+
+def fill_pool_exclusively(dynamic_mcq_id):
+    """
+    Fill a DynamicMCQ's question pool up to its target size, unless a build of it is already running
+    Returns:
+        int: Number of questions added, None if another build holds the pool
+    """
+    lock_key = f"dynamic_mcq_pool_build:{dynamic_mcq_id}"
+    # Refills and saves can queue the same pool twice, only one build runs at a time
+    if not shared_cache.add(lock_key, True, POOL_BUILD_LOCK_TIMEOUT):
+        logger.info(f"Question pool of {dynamic_mcq_id} is already being built")
+        return None
+
+    try:
+        try:
+            dynamic_mcq = DynamicMCQ.objects.get(id=dynamic_mcq_id)
+        except DynamicMCQ.DoesNotExist:
+            return 0
+        return dynamic_mcq.fill_pool()
+    finally:
+        shared_cache.delete(lock_key)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def build_question_pool(self, dynamic_mcq_id):
+    """Fill a DynamicMCQ's question pool up to its target size"""
+    try:
+        return fill_pool_exclusively(dynamic_mcq_id) or 0
+    except Exception as e:
+        logger.error(
+            f"Failed to build question pool of {dynamic_mcq_id}: {str(e)}")
+        raise self.retry(exc=e)
+
+
+@shared_task
+def refill_question_pools():
+    """Queue a build for every pool that is short and whose assessment opens soon or is open"""
+    now = timezone.now()
+    short_pools = DynamicMCQ.objects.filter(
+        assessment__start_date__lte=now +
+        timedelta(hours=DYNAMIC_MCQ_POOL_LEAD_HOURS),
+        assessment__due_date__gt=now,
+    ).annotate(
+        pool_size=Count('pool')
+    ).filter(
+        pool_size__lt=F('number_of_questions') * DYNAMIC_MCQ_POOL_MULTIPLIER
+    ).values_list('id', flat=True)
+
+    for dynamic_mcq_id in short_pools:
+        enqueue_pool_build(dynamic_mcq_id)
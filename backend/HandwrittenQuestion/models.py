@@ -5,11 +5,12 @@ from users.models import User
 from enrollments.models import Enrollments
 from django.conf import settings
 import os
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, pre_delete
 from django.dispatch import receiver
 from django.core.validators import MinValueValidator, MaxValueValidator, FileExtensionValidator
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from assessment.rollups import add_score_change, as_score, loaded_score
 import logging
 
 logger = logging.getLogger(__name__)
@@ -140,51 +141,19 @@ class HandwrittenQuestionScore(models.Model):
         #     )
         #     os.makedirs(upload_path, exist_ok=True)
 
+        previous_score = loaded_score(self)
         super().save(*args, **kwargs)
+        self._loaded_score = self.score
 
-        # Update assessment score
-        assessment = self.question.assessment
-        from assessment.models import AssessmentScore
-        assessment_score, created = AssessmentScore.objects.get_or_create(
-            enrollment=self.enrollment,
-            assessment=assessment,
-            defaults={'total_score': 0}
-        )
-
-        # Calculate total score including both MCQ and Handwritten scores
-        mcq_total = float(assessment.mcq_questions.filter(
-            scores__enrollment=self.enrollment
-        ).aggregate(total=models.Sum('scores__score'))['total'] or 0)
-
-        handwritten_total = float(assessment.handwritten_questions.filter(
-            scores__enrollment=self.enrollment
-        ).aggregate(total=models.Sum('scores__score'))['total'] or 0)
-
-        # Calculate total possible score
-        mcq_max = float(assessment.mcq_questions.aggregate(
-            total=models.Sum('question_grade'))['total'] or 0)
-        handwritten_max = float(assessment.handwritten_questions.aggregate(
-            total=models.Sum('max_grade'))['total'] or 0)
-        total_max = mcq_max + handwritten_max
-
-        # Calculate percentage score
-        if total_max > 0:
-            percentage_score = (
-                (mcq_total + handwritten_total) / total_max) * 100
-        else:
-            percentage_score = 0
-
-        # Update assessment score
-        assessment_score.total_score = mcq_total + handwritten_total
-        assessment_score.percentage_score = percentage_score
-        assessment_score.save()
-
-        logger.info(
-            f"Updated assessment score for enrollment {self.enrollment.id} and assessment {assessment.id}")
-        logger.info(
-            f"MCQ total: {mcq_total}, Handwritten total: {handwritten_total}")
-        logger.info(
-            f"Total score: {assessment_score.total_score}, Percentage: {percentage_score}%")
+        # Only the change reaches the assessment and enrollment totals, once the transaction commits
+        add_score_change(self.enrollment_id, self.question.assessment_id, as_score(self.score) - previous_score)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What save() rolls up is the difference to this
+        instance._loaded_score = instance.__dict__.get('score')
+        return instance
 
     def clean(self):
         if self.answer_image:
@@ -199,27 +168,8 @@ class HandwrittenQuestionScore(models.Model):
                 raise ValidationError(f"Invalid image file: {str(e)}")
 
 
-@receiver(post_delete, sender=HandwrittenQuestionScore)
+@receiver(pre_delete, sender=HandwrittenQuestionScore)
 def update_assessment_score_on_delete(sender, instance, **kwargs):
-    """Update AssessmentScore when a HandwrittenQuestionScore is deleted"""
-    try:
-        assessment = instance.question.assessment
-        from assessment.models import AssessmentScore
-        assessment_score = AssessmentScore.objects.get(
-            enrollment=instance.enrollment,
-            assessment=assessment
-        )
-
-        # Recalculate total score
-        mcq_total = assessment.mcq_questions.filter(
-            scores__enrollment=instance.enrollment
-        ).aggregate(total=models.Sum('scores__score'))['total'] or 0
-
-        handwritten_total = assessment.handwritten_questions.filter(
-            scores__enrollment=instance.enrollment
-        ).aggregate(total=models.Sum('scores__score'))['total'] or 0
-
-        assessment_score.total_score = mcq_total + handwritten_total
-        assessment_score.save()
-    except AssessmentScore.DoesNotExist:
-        pass
+    """Take a deleted HandwrittenQuestionScore out of the assessment and enrollment totals"""
+    # Before the delete, its question may go with it. The change is dropped if the delete rolls back
+    add_score_change(instance.enrollment_id, instance.question.assessment_id, -as_score(instance.score))
@@ -8,6 +8,7 @@ from .models import HandwrittenQuestion, HandwrittenQuestionScore
 from .serializers import HandwrittenQuestionSerializer, HandwrittenQuestionScoreSerializer
 from enrollments.models import Enrollments
 from AI.evaluate_handwritten_answer import evaluate_handwritten_answer
+from AI.telemetry import ai_call_context
 from django.db.models import Q
 from django.utils import timezone
 from django.core.exceptions import ValidationError
@@ -368,12 +369,14 @@ class HandwrittenQuestionViewSet(viewsets.ModelViewSet):
 
             # Evaluate the answer using AI
             try:
-                score, feedback, extracted_text = evaluate_handwritten_answer(
-                    question=question.question_text,
-                    answer_key=question.answer_key,
-                    student_answer_image=answer_image,
-                    max_grade=question.max_grade
-                )
+                with ai_call_context(institution_id=question.assessment.course.institution_id,
+                                     assessment_id=question.assessment_id):
+                    score, feedback, extracted_text = evaluate_handwritten_answer(
+                        question=question.question_text,
+                        answer_key=question.answer_key,
+                        student_answer_image=answer_image,
+                        max_grade=question.max_grade
+                    )
             except Exception as e:
                 logger.error(f"AI evaluation error: {str(e)}")
                 return Response(
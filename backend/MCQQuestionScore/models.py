@@ -1,8 +1,10 @@
 from django.db import models
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
 from mcqQuestion.models import McqQuestion
 from users.models import User
 from courses.models import Course
-from assessment.models import AssessmentScore
+from assessment.rollups import add_score_change, as_score, loaded_score
 from enrollments.models import Enrollments
 from DynamicMCQ.models import DynamicMCQQuestions
 import uuid
@@ -52,46 +54,28 @@ class MCQQuestionScore(models.Model):
                 self.is_correct = False
                 self.score = 0
 
-        # Save the MCQQuestionScore first
+        previous_score = loaded_score(self)
         super().save(*args, **kwargs)
+        self._loaded_score = self.score
 
-        try:
-            # Update or create AssessmentScore
-            assessment = self.question.assessment if self.question else self.dynamic_question.dynamic_mcq.assessment
-            assessment_score, created = AssessmentScore.objects.get_or_create(
-                enrollment=self.enrollment,
-                assessment=assessment,
-                defaults={'total_score': 0}
-            )
-            
-            # Calculate total score including both MCQ and Handwritten scores
-            mcq_total = float(assessment.mcq_questions.filter(
-                scores__enrollment=self.enrollment
-            ).aggregate(total=models.Sum('scores__score'))['total'] or 0)
-            
-            handwritten_total = float(assessment.handwritten_questions.filter(
-                scores__enrollment=self.enrollment
-            ).aggregate(total=models.Sum('scores__score'))['total'] or 0)
-            
-            # Calculate total possible score
-            mcq_max = float(assessment.mcq_questions.aggregate(total=models.Sum('question_grade'))['total'] or 0)
-            handwritten_max = float(assessment.handwritten_questions.aggregate(total=models.Sum('max_grade'))['total'] or 0)
-            total_max = mcq_max + handwritten_max
-            
-            # Calculate percentage score
-            if total_max > 0:
-                percentage_score = ((mcq_total + handwritten_total) / total_max) * 100
-            else:
-                percentage_score = 0
-                
-            # Update assessment score
-            assessment_score.total_score = mcq_total + handwritten_total
-            assessment_score.percentage_score = percentage_score
-            assessment_score.save()
-            
-            logger.info(f"Updated assessment score for enrollment {self.enrollment.id} and assessment {assessment.id}")
-            logger.info(f"MCQ total: {mcq_total}, Handwritten total: {handwritten_total}")
-            logger.info(f"Total score: {assessment_score.total_score}, Percentage: {percentage_score}%")
-        except Exception as e:
-            # Log the error but don't prevent the MCQQuestionScore from being saved
-            logger.error(f"Error saving score: {str(e)}")
+        # Only the change reaches the assessment and enrollment totals, once the transaction commits
+        add_score_change(self.enrollment_id, self.get_assessment_id(), as_score(self.score) - previous_score)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What save() rolls up is the difference to this
+        instance._loaded_score = instance.__dict__.get('score')
+        return instance
+
+    def get_assessment_id(self):
+        if self.question_id:
+            return self.question.assessment_id
+        return self.dynamic_question.dynamic_mcq.assessment_id
+
+
+@receiver(pre_delete, sender=MCQQuestionScore)
+def roll_up_deleted_score(sender, instance, **kwargs):
+    """Take a deleted MCQQuestionScore out of the assessment and enrollment totals"""
+    # Before the delete, its question may go with it. The change is dropped if the delete rolls back
+    add_score_change(instance.enrollment_id, instance.get_assessment_id(), -as_score(instance.score))
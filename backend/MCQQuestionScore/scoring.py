@@ -0,0 +1,109 @@
+import uuid
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Q
+from assessment.rollups import add_score_change, as_score
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Columns an answer given again overwrites, the rest of the row is kept
+UPSERT_FIELDS = ['selected_answer', 'is_correct', 'score', 'updated_at']
+
+
+def _question_ids(answers):
+    ids = {}
+    for question_id in answers:
+        try:
+            ids[str(question_id)] = uuid.UUID(str(question_id))
+        except ValueError:
+            raise ValidationError(f"Question {question_id} does not exist")
+    return ids
+
+
+def _upsert(scores, unique_fields):
+    """Insert the scores, overwriting the ones the enrollment already has for the same questions"""
+    if not scores:
+        return
+    MCQQuestionScore = apps.get_model('MCQQuestionScore', 'MCQQuestionScore')
+    # MySQL picks the conflicting unique key itself and refuses one being named
+    target = {'unique_fields': unique_fields} if connection.features.supports_update_conflicts_with_target else {}
+    MCQQuestionScore.objects.bulk_create(
+        scores, update_conflicts=True, update_fields=UPSERT_FIELDS, **target)
+
+
+def score_mcq_answers(assessment, enrollment, answers, check_options=True):
+    """
+    Grade a student's MCQ answers and store their scores in a fixed number of queries.
+
+    Questions are looked up in one query for the assessment's MCQ questions and one for the
+    student's dynamic MCQ questions, graded in memory and written with one upsert per kind of
+    question. MCQQuestionScore.save() is bypassed, the scores' total change is rolled up into the
+    AssessmentScore and the enrollment's total once.
+
+    Args:
+        assessment: The Assessment answered
+        enrollment: The student's Enrollment
+        answers (dict): question_id: selected_answer
+        check_options (bool): Reject answers that aren't one of the question's options
+    Returns:
+        list: The MCQQuestionScores, one per question in the order of answers
+    Raises:
+        ValidationError: If a question isn't part of the assessment or an answer isn't an option
+    """
+    McqQuestion = apps.get_model('mcqQuestion', 'McqQuestion')
+    DynamicMCQQuestions = apps.get_model('DynamicMCQ', 'DynamicMCQQuestions')
+    MCQQuestionScore = apps.get_model('MCQQuestionScore', 'MCQQuestionScore')
+    Enrollments = apps.get_model('enrollments', 'Enrollments')
+
+    ids = _question_ids(answers)
+    fields = ('id', 'options', 'answer_key', 'question_grade')
+    questions = {question.id: (question, False) for question in McqQuestion.objects.filter(
+        id__in=ids.values(), assessment=assessment).only(*fields)}
+    remaining = [question_uuid for question_uuid in ids.values() if question_uuid not in questions]
+    if remaining:
+        questions.update({question.id: (question, True) for question in DynamicMCQQuestions.objects.filter(
+            id__in=remaining, dynamic_mcq__assessment=assessment, created_by_id=enrollment.user_id).only(*fields)})
+
+    # Keyed by question so the same question spelled twice is only written once
+    scores = {}
+    for question_id, selected_answer in answers.items():
+        question_uuid = ids[str(question_id)]
+        if question_uuid not in questions:
+            raise ValidationError(f"Question {question_id} does not exist")
+        question, is_dynamic = questions[question_uuid]
+        if check_options and selected_answer not in question.options:
+            raise ValidationError(f"Invalid answer for question {question_id}")
+
+        is_correct = selected_answer == question.answer_key
+        scores[question_uuid] = MCQQuestionScore(
+            question=None if is_dynamic else question,
+            dynamic_question=question if is_dynamic else None,
+            enrollment=enrollment,
+            selected_answer=selected_answer,
+            is_correct=is_correct,
+            score=question.question_grade if is_correct else 0,
+        )
+    scores = list(scores.values())
+
+    with transaction.atomic():
+        # Concurrent scorings of the same enrollment (e.g. a double submit) take turns, otherwise
+        # both would read the old scores below and roll the same change up twice. The enrollment is
+        # locked too, answers scored for the first time have no row to lock yet
+        list(Enrollments.objects.select_for_update().filter(id=enrollment.id).values_list('id', flat=True))
+        # What the answers given again scored before, their change is what gets rolled up
+        previous_scores = MCQQuestionScore.objects.select_for_update().filter(enrollment=enrollment).filter(
+            Q(question_id__in=[score.question_id for score in scores if score.question_id]) |
+            Q(dynamic_question_id__in=[score.dynamic_question_id for score in scores if score.dynamic_question_id])
+        ).values_list('score', flat=True)
+        previous_total = sum(as_score(score) for score in previous_scores)
+
+        _upsert([score for score in scores if score.question_id], ['question', 'enrollment'])
+        _upsert([score for score in scores if score.dynamic_question_id], ['dynamic_question', 'enrollment'])
+        add_score_change(enrollment.id, assessment.id,
+                         sum(as_score(score.score) for score in scores) - as_score(previous_total))
+
+    logger.info(
+        f"Scored {len(scores)} MCQ answers of enrollment {enrollment.id} for assessment {assessment.id}")
+    return scores
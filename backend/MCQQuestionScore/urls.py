@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import MCQQuestionScoreListCreateView, MCQQuestionScoreDetailView
+from .views import MCQQuestionScoreListCreateView, MCQQuestionScoreDetailView, MCQQuestionScoreBulkView
 
 urlpatterns = [
     path('mcq-scores/', MCQQuestionScoreListCreateView.as_view(), name='mcq-score-list-create'),
+    path('mcq-scores/bulk/', MCQQuestionScoreBulkView.as_view(), name='mcq-score-bulk'),
     path('mcq-scores/<str:pk>/', MCQQuestionScoreDetailView.as_view(), name='mcq-score-detail'),
 ] 
\ No newline at end of file
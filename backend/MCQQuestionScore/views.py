@@ -6,11 +6,12 @@ from .models import MCQQuestionScore
 from .serializers import MCQQuestionScoreSerializer
 from users.permissions import isStudent, isTeacher, isInstitution
 from mcqQuestion.models import McqQuestion
-from assessment.models import Assessment, AssessmentScore
+from assessment.models import Assessment
 from django.db import transaction
 from django.utils import timezone
 from django.db.models import Q, Sum
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from .scoring import score_mcq_answers
 
 # Create your views here.
 
@@ -105,7 +106,7 @@ class MCQQuestionScoreListCreateView(generics.ListCreateAPIView):
 
         try:
             with transaction.atomic():
-                # Update or create the score
+                # Update or create the score, saving it rolls the change up into the AssessmentScore
                 score, created = MCQQuestionScore.objects.update_or_create(
                     enrollment=enrollment,
                     question=question,
@@ -116,13 +117,6 @@ class MCQQuestionScoreListCreateView(generics.ListCreateAPIView):
                     }
                 )
 
-                # Update or create AssessmentScore
-                assessment_score, created = AssessmentScore.objects.update_or_create(
-                    enrollment=enrollment,
-                    assessment=assessment,
-                    defaults={'total_score': assessment.get_student_score(user)}
-                )
-
                 return score
         except Exception as e:
             raise ValidationError({"detail": f"Error saving score: {str(e)}"})
@@ -223,50 +217,28 @@ class MCQQuestionScoreBulkView(generics.CreateAPIView):
         if not assessment.accepting_submissions:
             raise ValidationError({"detail": "This assessment is not accepting submissions"})
 
-        results = []
-        with transaction.atomic():
-            for answer in answers:
-                question_id = answer.get('question_id')
-                selected_answer = answer.get('selected_answer')
-
-                if not question_id or not selected_answer:
-                    raise ValidationError("Each answer must include question_id and selected_answer")
-
-                try:
-                    question = McqQuestion.objects.get(
-                        id=question_id,
-                        assessment=assessment
-                    )
-                except McqQuestion.DoesNotExist:
-                    raise ValidationError(f"Question {question_id} not found or not part of this assessment")
+        selected_answers = {}
+        for answer in answers:
+            question_id = answer.get('question_id') if isinstance(answer, dict) else None
+            selected_answer = answer.get('selected_answer') if isinstance(answer, dict) else None
 
-                # Validate selected answer
-                if selected_answer not in question.options:
-                    raise ValidationError(f"Invalid answer for question {question_id}")
+            if not question_id or not selected_answer:
+                raise ValidationError("Each answer must include question_id and selected_answer")
+            selected_answers[question_id] = selected_answer
 
-                # Create or update score
-                score, created = MCQQuestionScore.objects.update_or_create(
-                    question=question,
-                    enrollment=enrollment,
-                    defaults={
-                        'selected_answer': selected_answer,
-                        'is_correct': selected_answer == question.answer_key,
-                        'score': question.question_grade if selected_answer == question.answer_key else 0
-                    }
-                )
-
-                results.append({
-                    'question_id': str(question_id),
-                    'is_correct': score.is_correct,
-                    'score': str(score.score)
-                })
-
-            # Update assessment score
-            AssessmentScore.objects.update_or_create(
-                enrollment=enrollment,
-                assessment=assessment,
-                defaults={'total_score': assessment.get_student_score(request.user)}
-            )
+        # Every answer is graded and stored at once, the assessment score is updated once
+        try:
+            scores = score_mcq_answers(assessment, enrollment, selected_answers)
+        except DjangoValidationError as e:
+            raise ValidationError(e.messages)
+
+        results = [
+            {
+                'question_id': str(score.question_id or score.dynamic_question_id),
+                'is_correct': score.is_correct,
+                'score': str(score.score)
+            } for score in scores
+        ]
 
         return Response({
             'message': 'Answers submitted successfully',
@@ -0,0 +1,132 @@
+import uuid
+from datetime import timedelta
+from django.db.models import Avg, Count, Max, Q, Sum
+from django.utils import timezone
+from rest_framework import generics, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from .models import AICallRecord
+
+GROUP_FIELDS = {
+    'operation': 'operation',
+    'model': 'model',
+    'parse_path': 'parse_path',
+    'institution': 'institution_id',
+    'assessment': 'assessment_id',
+}
+
+
+class AIMetricsView(generics.GenericAPIView):
+    """
+    API endpoint for AI call telemetry: latency, tokens, retries, errors and cost.
+
+    GET /api/analytics/ai-metrics/?days=7&group_by=operation
+
+    group_by is one of operation, model, parse_path, institution or assessment.
+    Groups are sorted by the total time spent waiting on the AI.
+
+    Accessible by:
+    - Staff (every institution, or one with ?institution_id=)
+    - Institutions (only their own calls)
+    """
+    permission_classes = [IsAuthenticated]
+
+    @staticmethod
+    def p95_latencies(records, field, calls):
+        """
+        95th percentile latency of every group, in one query streamed in group and latency order.
+
+        Args:
+            calls (dict): Number of calls of each group, keyed by its value of field
+        Returns:
+            dict: Group value: p95 latency in ms
+        """
+        p95_latencies = {}
+        current, position = object(), 0
+        rows = records.order_by(field, 'latency_ms').values_list(field, 'latency_ms')
+        for value, latency_ms in rows.iterator():
+            if value != current:
+                current, position = value, 0
+            if value in calls and position == max(0, int(calls[value] * 0.95) - 1):
+                p95_latencies[value] = latency_ms
+            position += 1
+        return p95_latencies
+
+    def get(self, request):
+        user = request.user
+
+        records = AICallRecord.objects.all()
+        if user.is_staff:
+            if request.query_params.get('institution_id'):
+                try:
+                    institution_id = uuid.UUID(request.query_params['institution_id'])
+                except ValueError:
+                    return Response(
+                        {"detail": "institution_id must be a valid UUID"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                records = records.filter(institution_id=institution_id)
+        elif user.role == "Institution":
+            records = records.filter(institution=user)
+        else:
+            return Response(
+                {"detail": "Only institutions can access this endpoint"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            days = int(request.query_params.get('days', 7))
+        except ValueError:
+            days = 0
+        group_by = request.query_params.get('group_by', 'operation')
+        if days < 1 or group_by not in GROUP_FIELDS:
+            return Response(
+                {"detail": f"days must be a positive number and group_by one of {', '.join(GROUP_FIELDS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        field = GROUP_FIELDS[group_by]
+        records = records.filter(created_at__gte=timezone.now() - timedelta(days=days))
+        groups = records.values(field).annotate(
+            calls=Count('id'),
+            errors=Count('id', filter=Q(outcome='error')),
+            cache_hits=Count('id', filter=Q(outcome='cache_hit')),
+            avg_latency_ms=Avg('latency_ms'),
+            max_latency_ms=Max('latency_ms'),
+            total_latency_ms=Sum('latency_ms'),
+            total_prompt_tokens=Sum('prompt_tokens'),
+            total_completion_tokens=Sum('completion_tokens'),
+            total_attempts=Sum('attempts'),
+            provider_calls=Count('id', filter=Q(attempts__gt=0)),
+            total_cost=Sum('cost'),
+        ).order_by('-total_latency_ms')
+
+        groups = list(groups)
+        p95_latencies = self.p95_latencies(records, field, {group[field]: group['calls'] for group in groups})
+
+        results = []
+        for group in groups:
+            p95_latency_ms = p95_latencies.get(group[field])
+            results.append({
+                group_by: str(group[field]) if group[field] is not None else None,
+                'calls': group['calls'],
+                'errors': group['errors'],
+                'error_rate': round(group['errors'] / group['calls'] * 100, 2),
+                'cache_hits': group['cache_hits'],
+                'avg_latency_ms': round(group['avg_latency_ms'] or 0),
+                'p95_latency_ms': p95_latency_ms,
+                'max_latency_ms': group['max_latency_ms'],
+                'prompt_tokens': group['total_prompt_tokens'],
+                'completion_tokens': group['total_completion_tokens'],
+                # Attempts beyond the first of every call that reached the provider
+                'retries': group['total_attempts'] - group['provider_calls'],
+                'cost': group['total_cost'],
+            })
+
+        return Response({
+            'days': days,
+            'group_by': group_by,
+            'total_calls': sum(result['calls'] for result in results),
+            'total_cost': sum((result['cost'] for result in results), 0),
+            'groups': results,
+        })
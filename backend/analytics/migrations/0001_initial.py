@@ -0,0 +1,52 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:00
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('assessment', '0003_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AICallRecord',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4,
+                 editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('operation', models.CharField(
+                    help_text='What the call was for, e.g. generate_mcqs or evaluate_handwritten_answer', max_length=50)),
+                ('model', models.CharField(blank=True, max_length=255)),
+                ('outcome', models.CharField(choices=[('success', 'Success'), ('cache_hit', 'Cache hit'), (
+                    'error', 'Error')], default='success', max_length=10)),
+                ('error_type', models.CharField(blank=True, max_length=100)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveIntegerField(default=0)),
+                ('tokens_estimated', models.BooleanField(default=False,
+                 help_text='The provider reported no usage, token counts are estimates')),
+                ('latency_ms', models.PositiveIntegerField(default=0,
+                 help_text='Time spent on the provider, retries and backoff included')),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('parse_path', models.CharField(blank=True,
+                 help_text='How the response was parsed: json, repaired, fallback or invalid', max_length=20)),
+                ('cost', models.DecimalField(
+                    decimal_places=6, default=0, max_digits=12)),
+                ('assessment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL,
+                 related_name='ai_calls', to='assessment.assessment')),
+                ('institution', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL,
+                 related_name='ai_calls', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['operation', 'created_at'], name='analytics_a_operati_ccb39c_idx'), models.Index(fields=['institution', 'created_at'], name='analytics_a_institu_0813a1_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+import uuid
+from django.db import models
+from assessment.models import Assessment
+from users.models import User
+
+
+class AICallRecord(models.Model):
+    """One AI operation (a provider call, or a completion served from the cache) with what it cost"""
+    OUTCOME_SUCCESS = 'success'
+    OUTCOME_CACHE_HIT = 'cache_hit'
+    OUTCOME_ERROR = 'error'
+    OUTCOME_CHOICES = [
+        (OUTCOME_SUCCESS, 'Success'),
+        (OUTCOME_CACHE_HIT, 'Cache hit'),
+        (OUTCOME_ERROR, 'Error'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_at = models.DateTimeField(db_index=True)
+    operation = models.CharField(
+        max_length=50, help_text="What the call was for, e.g. generate_mcqs or evaluate_handwritten_answer")
+    model = models.CharField(max_length=255, blank=True)
+    outcome = models.CharField(
+        max_length=10, choices=OUTCOME_CHOICES, default=OUTCOME_SUCCESS)
+    error_type = models.CharField(max_length=100, blank=True)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    tokens_estimated = models.BooleanField(
+        default=False, help_text="The provider reported no usage, token counts are estimates")
+    latency_ms = models.PositiveIntegerField(
+        default=0, help_text="Time spent on the provider, retries and backoff included")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    parse_path = models.CharField(
+        max_length=20, blank=True, help_text="How the response was parsed: json, repaired, fallback or invalid")
+    cost = models.DecimalField(max_digits=12, decimal_places=6, default=0)
+    institution = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='ai_calls',
+        limit_choices_to={"role": "Institution"})
+    assessment = models.ForeignKey(
+        Assessment, on_delete=models.SET_NULL, null=True, blank=True, related_name='ai_calls')
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['operation', 'created_at']),
+            models.Index(fields=['institution', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.operation} ({self.model}) - {self.outcome} in {self.latency_ms} ms"
@@ -8,6 +8,7 @@ from .student_metrics_view import StudentMetricsView
 from .Student_Dashboard import CourseCountView
 from .Course_Progress import CourseLectureProgressView
 from .Student_Dashboard import StudentDashboardView
+from .ai_metrics_view import AIMetricsView
 
 urlpatterns = [
     path('', TeacherAnalyticsView.as_view(), name='teacher-analytics'),
@@ -26,4 +27,5 @@ urlpatterns = [
          CourseLectureProgressView.as_view(), name='lecture-progress'),
     path('student-dashboard/', StudentDashboardView.as_view(),
          name='student-dashboard'),
+    path('ai-metrics/', AIMetricsView.as_view(), name='ai-metrics'),
 ]
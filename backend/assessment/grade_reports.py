@@ -0,0 +1,194 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+from django.apps import apps
+from django.core.cache import caches
+from django.db.models import F, FilteredRelation, Q
+from .student_questions import questions_version
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every gunicorn worker must see the reports and score versions the others cached
+shared_cache = caches['shared']
+
+# A report is only ever replaced by a newer version, this just lets the unread ones expire
+GRADE_REPORT_TIMEOUT = int(timedelta(days=7).total_seconds())
+# Roles shown the options and answer key of the MCQ and dynamic MCQ questions
+MCQ_ANSWER_ROLES = ('Teacher', 'Institution', 'Student')
+# Roles shown the answer key of the handwritten questions
+HANDWRITTEN_ANSWER_ROLES = ('Teacher', 'Institution')
+
+
+def _score_version_key(assessment_id, enrollment_id):
+    return f"grade_report_score_version:{assessment_id}:{enrollment_id}"
+
+
+def _report_key(submission_id, questions, scores):
+    return f"grade_report:{submission_id}:{questions}:{scores}"
+
+
+def _score_version(assessment_id, enrollment_id):
+    # Starts from the clock, so a version evicted and started again can't reuse an old report
+    return shared_cache.get_or_set(_score_version_key(assessment_id, enrollment_id), time.time_ns(), None)
+
+
+def scores_changed(keys):
+    """
+    Retire the cached reports of enrollments whose question scores changed.
+
+    Args:
+        keys: (enrollment_id, assessment_id) of the changed scores
+    """
+    for enrollment_id, assessment_id in set(keys):
+        key = _score_version_key(assessment_id, enrollment_id)
+        try:
+            shared_cache.incr(key)
+        except ValueError:
+            # Never read or evicted, the next read starts a version no cached report has
+            pass
+
+
+def build_grade_reports(assessment, enrollments):
+    """
+    Per-question breakdown of the grades of several students in an assessment, in three queries
+    whatever their number.
+
+    Answer images are left as relative URLs and every answer key is included, present_grade_report
+    adapts a report to the request it answers.
+
+    Args:
+        assessment: The assessment, with its course
+        enrollments: The students' enrollments in its course
+    Returns:
+        dict: enrollment_id: report
+    """
+    MCQQuestionScore = apps.get_model('MCQQuestionScore', 'MCQQuestionScore')
+    HandwrittenQuestionScore = apps.get_model('HandwrittenQuestion', 'HandwrittenQuestionScore')
+    DynamicMCQQuestions = apps.get_model('DynamicMCQ', 'DynamicMCQQuestions')
+
+    enrollments = list(enrollments)
+    enrollment_ids = [enrollment.id for enrollment in enrollments]
+    user_enrollments = defaultdict(list)
+    for enrollment in enrollments:
+        user_enrollments[enrollment.user_id].append(enrollment.id)
+    questions = {enrollment_id: [] for enrollment_id in enrollment_ids}
+    totals = defaultdict(float)
+
+    mcq_scores = MCQQuestionScore.objects.filter(
+        question__assessment=assessment, enrollment_id__in=enrollment_ids).select_related('question')
+    for mcq_score in mcq_scores:
+        questions[mcq_score.enrollment_id].append({
+            'question_id': str(mcq_score.question.id),
+            'question_text': mcq_score.question.question,
+            'student_answer': mcq_score.selected_answer,
+            'is_correct': mcq_score.is_correct,
+            'score': str(mcq_score.score),
+            'max_score': str(mcq_score.question.question_grade),
+            'type': 'mcq',
+            'options': mcq_score.question.options,
+            'correct_answer': mcq_score.question.answer_key,
+        })
+        totals[mcq_score.enrollment_id] += float(mcq_score.score)
+
+    handwritten_scores = HandwrittenQuestionScore.objects.filter(
+        question__assessment=assessment, enrollment_id__in=enrollment_ids).select_related('question')
+    for handwritten_score in handwritten_scores:
+        questions[handwritten_score.enrollment_id].append({
+            'question_id': str(handwritten_score.question.id),
+            'question_text': handwritten_score.question.question_text,
+            'type': 'handwritten',
+            'score': str(handwritten_score.score),
+            'max_score': str(handwritten_score.question.max_grade),
+            'extracted_text': handwritten_score.extracted_text,
+            'feedback': handwritten_score.feedback,
+            'answer_image': handwritten_score.answer_image.url if handwritten_score.answer_image else None,
+            'correct_answer': handwritten_score.question.answer_key,
+        })
+        totals[handwritten_score.enrollment_id] += float(handwritten_score.score)
+
+    # Each student's generated questions, joined to their score when they answered them. None are
+    # found for an assessment without dynamic MCQ
+    dynamic_questions = DynamicMCQQuestions.objects.filter(
+        dynamic_mcq__assessment=assessment,
+        created_by_id__in=list(user_enrollments),
+    ).annotate(
+        student_score=FilteredRelation('scores', condition=Q(scores__enrollment_id__in=enrollment_ids)),
+    ).values(
+        'id', 'question', 'question_grade', 'difficulty', 'options', 'answer_key', 'created_by_id',
+        score_enrollment_id=F('student_score__enrollment_id'),
+        score=F('student_score__score'),
+        is_correct=F('student_score__is_correct'),
+        selected_answer=F('student_score__selected_answer'),
+    )
+    for question in dynamic_questions:
+        if question['score_enrollment_id'] is not None:
+            owners = [question['score_enrollment_id']]
+        else:
+            owners = user_enrollments[question['created_by_id']]
+        for enrollment_id in owners:
+            questions[enrollment_id].append({
+                'question_id': str(question['id']),
+                'question_text': question['question'],
+                'type': 'dynamic_mcq',
+                'max_score': str(question['question_grade']),
+                'difficulty': question['difficulty'],
+                'score': str(question['score']) if question['score'] is not None else '0',
+                'is_correct': bool(question['is_correct']),
+                'student_answer': question['selected_answer'],
+                'options': question['options'],
+                'correct_answer': question['answer_key'],
+            })
+            totals[enrollment_id] += float(question['score'] or 0)
+
+    return {
+        enrollment_id: {
+            'assessment_id': str(assessment.id),
+            'assessment_title': assessment.title,
+            'course': assessment.course.name,
+            'questions': questions[enrollment_id],
+            'total_score': totals[enrollment_id],
+            'total_max_score': float(assessment.grade),
+        }
+        for enrollment_id in enrollment_ids
+    }
+
+
+def grade_report(assessment, enrollment, submission):
+    """
+    A student's grade report, cached per submission until one of their scores or the assessment's
+    questions change.
+
+    Args:
+        assessment: The assessment, with its course
+        enrollment: The student's enrollment
+        submission: Their submission of the assessment
+    Returns:
+        dict: The report, see build_grade_reports
+    """
+    # Read before building, a score changed meanwhile retires the report right away
+    key = _report_key(submission.id, questions_version(assessment.id),
+                      _score_version(assessment.id, enrollment.id))
+    report = shared_cache.get(key)
+    if report is None:
+        report = build_grade_reports(assessment, [enrollment])[enrollment.id]
+        shared_cache.set(key, report, GRADE_REPORT_TIMEOUT)
+    return report
+
+
+def present_grade_report(report, request):
+    """A copy of a report with absolute answer image URLs and only the answer keys the user may see"""
+    role = request.user.role
+    questions = []
+    for question in report['questions']:
+        question = dict(question)
+        if question['type'] == 'handwritten':
+            if question['answer_image']:
+                question['answer_image'] = request.build_absolute_uri(question['answer_image'])
+            if role not in HANDWRITTEN_ANSWER_ROLES:
+                del question['correct_answer']
+        elif role not in MCQ_ANSWER_ROLES:
+            del question['options']
+            del question['correct_answer']
+        questions.append(question)
+    return {**report, 'questions': questions}
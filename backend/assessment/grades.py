@@ -0,0 +1,91 @@
+import threading
+from contextlib import contextmanager
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Sum
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Assessments whose questions changed inside the thread's deferred_grade_updates block
+_deferred = threading.local()
+
+
+def question_grade_totals(assessment_ids):
+    """
+    Sum of the MCQ, dynamic MCQ and handwritten question grades of each assessment, in three queries.
+
+    Returns:
+        dict: assessment_id: total, assessments without questions are left out
+    """
+    McqQuestion = apps.get_model('mcqQuestion', 'McqQuestion')
+    DynamicMCQ = apps.get_model('DynamicMCQ', 'DynamicMCQ')
+    HandwrittenQuestion = apps.get_model('HandwrittenQuestion', 'HandwrittenQuestion')
+
+    totals = {}
+    for questions, grade in (
+        (McqQuestion.objects, 'question_grade'),
+        (DynamicMCQ.objects, 'total_grade'),
+        (HandwrittenQuestion.objects, 'max_grade'),
+    ):
+        rows = questions.filter(assessment_id__in=assessment_ids).values(
+            'assessment_id').annotate(total=Sum(grade)).order_by()
+        for row in rows:
+            totals[row['assessment_id']] = totals.get(row['assessment_id'], 0) + (row['total'] or 0)
+    return totals
+
+
+def update_assessment_grades(assessment_ids):
+    """Set the grade of each assessment to the sum of its question grades, deleted ones are skipped"""
+    Assessment = apps.get_model('assessment', 'Assessment')
+
+    totals = question_grade_totals(assessment_ids)
+    for assessment in Assessment.objects.filter(id__in=assessment_ids).select_related('course'):
+        assessment.grade = totals.get(assessment.id, 0)
+        # Only update the grade field
+        assessment.save(update_fields=['grade'])
+
+
+def assessment_grade_changed(assessment_id):
+    """
+    A question of the assessment was added, changed or removed. Its grade is updated right away,
+    or once when the deferred_grade_updates block it happened in ends.
+    """
+    if not assessment_id:
+        return
+    assessment_ids = getattr(_deferred, 'assessment_ids', None)
+    if assessment_ids is not None:
+        assessment_ids.add(assessment_id)
+        return
+    update_assessment_grades([assessment_id])
+
+
+@contextmanager
+def deferred_grade_updates():
+    """
+    Update the grade of the assessments whose questions change inside the block once each, when it
+    ends, instead of once per question.
+
+    Nested blocks join the outermost one. Open it inside the transaction the questions are saved in:
+    the grades are then updated before it commits, and a grade the course can't take rolls the
+    question changes back with it.
+    """
+    if getattr(_deferred, 'assessment_ids', None) is not None:
+        yield
+        return
+
+    assessment_ids = _deferred.assessment_ids = set()
+    try:
+        yield
+    except Exception:
+        _deferred.assessment_ids = None
+        # Outside of a transaction the changes made before the error are kept, so must their grades
+        if assessment_ids and not transaction.get_connection().in_atomic_block:
+            try:
+                update_assessment_grades(assessment_ids)
+            except Exception as e:
+                logger.error(f"Failed to update the grades of assessments {assessment_ids}: {str(e)}")
+        raise
+    _deferred.assessment_ids = None
+    if assessment_ids:
+        update_assessment_grades(assessment_ids)
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from assessment.rollups import find_score_drift, fix_score_drift
+from enrollments.models import Enrollments
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Checks the AssessmentScore and enrollment totals rolled up from the question scores '
+            'against the question scores themselves')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', help='Only check the enrollments of this course id')
+        parser.add_argument('--fix', action='store_true',
+                            help='Overwrite the totals that drifted with the ones recomputed from the question scores')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Enrollments checked per round of queries')
+
+    def handle(self, *args, **options):
+        enrollments = Enrollments.objects.order_by('id')
+        if options['course']:
+            enrollments = enrollments.filter(course_id=options['course'])
+        enrollment_ids = list(enrollments.values_list('id', flat=True))
+
+        drifted_assessments = drifted_enrollments = 0
+        batch_size = max(1, options['batch_size'])
+        for start in range(0, len(enrollment_ids), batch_size):
+            batch = Enrollments.objects.filter(id__in=enrollment_ids[start:start + batch_size])
+            assessment_drift, enrollment_drift = find_score_drift(batch)
+
+            for (enrollment_id, assessment_id), (stored, expected) in assessment_drift.items():
+                self.stdout.write(
+                    f"AssessmentScore of enrollment {enrollment_id} for assessment {assessment_id}: "
+                    f"{'missing' if stored is None else stored}, question scores add up to {expected}")
+            for enrollment_id, (stored, expected) in enrollment_drift.items():
+                self.stdout.write(
+                    f"Total score of enrollment {enrollment_id}: {stored}, question scores add up to {expected}")
+
+            if options['fix'] and (assessment_drift or enrollment_drift):
+                fix_score_drift(assessment_drift, enrollment_drift)
+            drifted_assessments += len(assessment_drift)
+            drifted_enrollments += len(enrollment_drift)
+
+        summary = (f"Checked {len(enrollment_ids)} enrollments: {drifted_assessments} assessment scores "
+                   f"and {drifted_enrollments} enrollment totals drifted")
+        if not drifted_assessments and not drifted_enrollments:
+            self.stdout.write(self.style.SUCCESS(summary))
+        elif options['fix']:
+            logger.warning(f"{summary}, fixed")
+            self.stdout.write(self.style.SUCCESS(f"{summary}, all fixed"))
+        else:
+            raise CommandError(f"{summary}, run with --fix to overwrite them")
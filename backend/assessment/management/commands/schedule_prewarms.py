@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from assessment.scheduler import schedule_upcoming_prewarms
+
+
+class Command(BaseCommand):
+    help = ('Schedules the pre-warm of every assessment that hasn\'t opened yet. New and edited assessments '
+            'are scheduled as they are saved, run this once for the ones created before that')
+
+    def handle(self, *args, **options):
+        scheduled = schedule_upcoming_prewarms()
+        self.stdout.write(self.style.SUCCESS(f"Scheduled the pre-warm of {scheduled} upcoming assessments"))
@@ -6,6 +6,9 @@ from django.db.models import Sum
 from enrollments.models import Enrollments
 from django.core.exceptions import ValidationError
 from django.apps import apps
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class Assessment(models.Model):
@@ -121,189 +124,61 @@ class Assessment(models.Model):
             enrollment=enrollment
         ).aggregate(total=Sum('score'))['total'] or 0
 
-    def get_all_questions_for_student(self, student):
+    def get_all_questions_for_student(self, student, snapshot=None):
         """
-        Get all questions for a specific student from:
-        1. DynamicMCQ app - Get or generate questions for the student
-        2. MCQQuestion app - Get all MCQ questions
-        3. HandwrittenQuestion app - Get all handwritten questions
+        Get all questions for a specific student:
+        1. DynamicMCQ app - Get or draw questions for the student from the pool
+        2. MCQQuestion app - Get all MCQ questions, from the cached question snapshot
+        3. HandwrittenQuestion app - Get all handwritten questions, from the cached question snapshot
+        Args:
+            snapshot (dict): The assessment's question_snapshot, looked up if not given
         """
         DynamicMCQQuestions = apps.get_model(
             'DynamicMCQ', 'DynamicMCQQuestions')
-        McqQuestion = apps.get_model('mcqQuestion', 'McqQuestion')
-        HandwrittenQuestion = apps.get_model(
-            'HandwrittenQuestion', 'HandwrittenQuestion')
-        Lecture = apps.get_model('lecture', 'Lecture')
         from DynamicMCQ.models import DynamicMCQ
-        from AI.generate_mcq_from_text import generate_mcqs_from_text
-        from AI.generate_mcqs_from_multiple_pdfs import generate_mcqs_from_multiple_pdfs
+        from assessment.student_questions import question_snapshot
 
+        snapshot = snapshot or question_snapshot(self)
         questions = {
             'dynamic_mcq': [],
-            'mcq': [],
-            'handwritten': [],
+            # Answer keys stay out of what students get
+            'mcq': [
+                {key: question[key] for key in ('id', 'question', 'options', 'grade', 'section_number')}
+                for question in snapshot['mcq']
+            ],
+            'handwritten': [
+                {key: question[key] for key in ('id', 'question', 'max_grade', 'section_number')}
+                for question in snapshot['handwritten']
+            ],
         }
 
-        # 1. Get Dynamic MCQ Questions
-        try:
-            # Check if there's a DynamicMCQ entry for this assessment
-            dynamic_mcq = DynamicMCQ.objects.get(assessment=self)
-
-            if dynamic_mcq:
+        # 1. Get Dynamic MCQ Questions, the only part that differs between students
+        dynamic_mcq = snapshot['dynamic_mcq']
+        if dynamic_mcq is not None:
+            try:
                 # Get existing questions for this student
-                dynamic_questions = DynamicMCQQuestions.objects.filter(
-                    dynamic_mcq=dynamic_mcq,
+                dynamic_questions = list(DynamicMCQQuestions.objects.filter(
+                    dynamic_mcq_id=dynamic_mcq['id'],
                     created_by=student
-                )
-
-                if not dynamic_questions.exists():
-                    # First try to use context if available
-                    if dynamic_mcq.context:
-                        try:
-                            # Generate questions using AI from context
-                            from AI.generate_mcq_from_text import generate_mcqs_from_text
-                            generated_questions = generate_mcqs_from_text(
-                                text=dynamic_mcq.context,
-                                number_of_questions=dynamic_mcq.number_of_questions,
-                                difficulty=dynamic_mcq.difficulty,
-                                num_options=dynamic_mcq.num_options  # Pass num_options from model
-                            )
-                        except Exception as e:
-                            print(
-                                f"Error generating questions from context: {str(e)}")
-                            generated_questions = None
-                    else:
-                        generated_questions = None
-
-                    # If context generation failed or no context, try lecture_ids
-                    if not generated_questions and dynamic_mcq.lecture_ids:
-                        try:
-                            # Ensure lecture_ids is a list of valid UUIDs
-                            lecture_ids = [
-                                str(id) for id in dynamic_mcq.lecture_ids if id]
-                            if not lecture_ids:
-                                print("No valid lecture IDs found")
-                                return questions
-
-                            # Get lectures and their attachments
-                            lectures = Lecture.objects.filter(
-                                id__in=lecture_ids,
-                                attachment__isnull=False
-                            )
-
-                            if lectures.exists():
-                                # Get all PDF attachments
-                                pdf_files = []
-                                for lecture in lectures:
-                                    if lecture.attachment and lecture.attachment.name.endswith('.pdf'):
-                                        pdf_files.append(lecture.attachment)
-
-                                if not pdf_files:
-                                    raise ValidationError(
-                                        "No PDF attachments found in lectures")
-
-                                # Generate questions using AI from PDFs with specified difficulty
-                                generated_questions = generate_mcqs_from_multiple_pdfs(
-                                    pdf_files=pdf_files,
-                                    # Distribute questions evenly
-                                    number_of_questions=dynamic_mcq.number_of_questions // len(
-                                        pdf_files),
-                                    difficulty=dynamic_mcq.difficulty,  # Pass the difficulty from DynamicMCQ model
-                                    num_options=dynamic_mcq.num_options  # Pass num_options from model
-                                )
-
-                                # Create questions for this student
-                                for q in generated_questions:
-                                    question = DynamicMCQQuestions.objects.create(
-                                        dynamic_mcq=dynamic_mcq,
-                                        question=q['question'],
-                                        options=q['options'],
-                                        answer_key=q['correct_answer'],
-                                        question_grade=dynamic_mcq.total_grade / dynamic_mcq.number_of_questions,
-                                        created_by=student,
-                                        difficulty=dynamic_mcq.difficulty  # Store the difficulty level
-                                    )
-                                    questions['dynamic_mcq'].append({
-                                        'id': str(question.id),
-                                        'question': question.question,
-                                        'options': question.options,
-                                        'grade': question.question_grade,
-                                        'section_number': dynamic_mcq.section_number,
-                                        'difficulty': question.difficulty  # Include difficulty in response
-                                    })
-                        except Exception as e:
-                            print(
-                                f"Error getting dynamic MCQ questions: {str(e)}")
-                    # If no lectures with attachments but context is provided, generate MCQs from the context
-                    elif dynamic_mcq.context:
-                        # Generate questions using AI from text context with specified difficulty
-                        generated_questions = generate_mcqs_from_text(
-                            text=dynamic_mcq.context,
-                            number_of_questions=dynamic_mcq.number_of_questions,
-                            difficulty=dynamic_mcq.difficulty,
-                            num_options=dynamic_mcq.num_options  # Pass num_options from model
-                        )
-
-                        # Create questions for this student
-                        for q in generated_questions:
-                            question = DynamicMCQQuestions.objects.create(
-                                dynamic_mcq=dynamic_mcq,
-                                question=q['question'],
-                                options=q['options'],
-                                answer_key=q['correct_answer'],
-                                question_grade=dynamic_mcq.total_grade / dynamic_mcq.number_of_questions,
-                                created_by=student,
-                                difficulty=dynamic_mcq.difficulty
-                            )
-                            questions['dynamic_mcq'].append({
-                                'id': str(question.id),
-                                'question': question.question,
-                                'options': question.options,
-                                'grade': question.question_grade,
-                                'section_number': dynamic_mcq.section_number,
-                                'difficulty': question.difficulty
-                            })
-                else:
-                    # Return existing questions
-                    for question in dynamic_questions:
-                        questions['dynamic_mcq'].append({
-                            'id': str(question.id),
-                            'question': question.question,
-                            'options': question.options,
-                            'grade': question.question_grade,
-                            'section_number': dynamic_mcq.section_number,
-                            'difficulty': question.difficulty  # Include difficulty in response
-                        })
-        except Exception as e:
-            print(f"Error getting dynamic MCQ questions: {str(e)}")
-
-        # 2. Get Regular MCQ Questions
-        try:
-            mcq_questions = McqQuestion.objects.filter(assessment=self)
-            for question in mcq_questions:
-                questions['mcq'].append({
-                    'id': str(question.id),
-                    'question': question.question,
-                    'options': question.options,
-                    'grade': question.question_grade,
-                    'section_number': question.section_number
-                })
-        except Exception as e:
-            print(f"Error getting MCQ questions: {str(e)}")
-
-        # 3. Get Handwritten Questions
-        try:
-            handwritten_questions = HandwrittenQuestion.objects.filter(
-                assessment=self)
-            for question in handwritten_questions:
-                questions['handwritten'].append({
-                    'id': str(question.id),
-                    'question': question.question_text,
-                    'max_grade': question.max_grade,
-                    'section_number': question.section_number
-                })
-        except Exception as e:
-            print(f"Error getting handwritten questions: {str(e)}")
+                ))
+
+                if not dynamic_questions:
+                    # Draw this student's set from the pre-generated pool
+                    dynamic_questions = DynamicMCQ.objects.get(
+                        id=dynamic_mcq['id']).draw_questions_for_student(student)
+
+                for question in dynamic_questions:
+                    questions['dynamic_mcq'].append({
+                        'id': str(question.id),
+                        'question': question.question,
+                        'options': question.options,
+                        'grade': question.question_grade,
+                        'section_number': dynamic_mcq['section_number'],
+                        'difficulty': question.difficulty  # Include difficulty in response
+                    })
+            except Exception as e:
+                logger.error(
+                    f"Failed to get the dynamic MCQ questions of student {student.id} for assessment {self.id}: {str(e)}")
 
         return questions
 
@@ -315,6 +190,7 @@ class Assessment(models.Model):
             return None
 
         from AI.generate_mcqs_from_multiple_pdfs import generate_mcqs_from_multiple_pdfs
+        from .grades import deferred_grade_updates
         McqQuestion = apps.get_model('mcqQuestion', 'McqQuestion')
         Enrollments = apps.get_model('enrollments', 'Enrollments')
         Lecture = apps.get_model('lecture', 'Lecture')
@@ -357,19 +233,20 @@ class Assessment(models.Model):
                     pdf_files)
             )
 
-            # Create questions for this student
+            # Create questions for this student, the assessment grade is updated once for all of them
             created_questions = []
-            for q in questions:
-                question = McqQuestion.objects.create(
-                    assessment=self,
-                    question=q['question'],
-                    options=q['options'],
-                    answer_key=q['correct_answer'],
-                    created_by=student,
-                    # Distribute grade evenly
-                    question_grade=self.grade / len(questions)
-                )
-                created_questions.append(question)
+            with deferred_grade_updates():
+                for q in questions:
+                    question = McqQuestion.objects.create(
+                        assessment=self,
+                        question=q['question'],
+                        options=q['options'],
+                        answer_key=q['correct_answer'],
+                        created_by=student,
+                        # Distribute grade evenly
+                        question_grade=self.grade / len(questions)
+                    )
+                    created_questions.append(question)
 
             return created_questions
 
@@ -452,6 +329,7 @@ class AssessmentScore(models.Model):
         Assessment, on_delete=models.CASCADE, related_name='scores')
     enrollment = models.ForeignKey(
         Enrollments, on_delete=models.CASCADE, related_name='assessment_scores')
+    # Sum of the enrollment's question scores, kept up to date by assessment.rollups
     total_score = models.DecimalField(
         max_digits=5, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -463,31 +341,3 @@ class AssessmentScore(models.Model):
 
     def __str__(self):
         return f"{self.assessment.title} - {self.enrollment.user.email}"
-
-    def save(self, *args, **kwargs):
-        # Calculate total score from MCQ and Handwritten scores
-        MCQQuestionScore = apps.get_model(
-            'MCQQuestionScore', 'MCQQuestionScore')
-        HandwrittenQuestionScore = apps.get_model(
-            'HandwrittenQuestion', 'HandwrittenQuestionScore')
-        # Get regular MCQ scores
-        mcq_score = MCQQuestionScore.objects.filter(
-            question__assessment=self.assessment,
-            enrollment=self.enrollment
-        ).aggregate(total=Sum('score'))['total'] or 0
-
-        # Get dynamic MCQ scores
-        dynamic_mcq_score = MCQQuestionScore.objects.filter(
-            dynamic_question__dynamic_mcq__assessment=self.assessment,
-            enrollment=self.enrollment
-        ).aggregate(total=Sum('score'))['total'] or 0
-
-        # Get handwritten scores
-        handwritten_score = HandwrittenQuestionScore.objects.filter(
-            question__assessment=self.assessment,
-            enrollment=self.enrollment
-        ).aggregate(total=Sum('score'))['total'] or 0
-
-        # Calculate total score
-        self.total_score = mcq_score + dynamic_mcq_score + handwritten_score
-        super().save(*args, **kwargs)
@@ -0,0 +1,263 @@
+import threading
+import weakref
+from collections import defaultdict
+from decimal import Decimal
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from .grade_reports import scores_changed
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Question, assessment and enrollment scores all have two decimal places
+SCORE_PLACES = Decimal('0.01')
+
+# Score changes of the open transactions of the thread, waiting for them to commit. Batches are held
+# weakly, only by the commit hook they are registered as: rolling back their transaction or savepoint
+# discards the hook, and the batch leaves the mapping with it
+_pending = threading.local()
+
+
+def as_score(value):
+    """A score as its DecimalField stores it"""
+    return Decimal(str(value or 0)).quantize(SCORE_PLACES)
+
+
+def loaded_score(instance):
+    """
+    The score a question score had in the database before it is saved, 0 for a new one.
+
+    The models keep it in _loaded_score when they are loaded, it is only looked up if it wasn't.
+    """
+    if instance._state.adding:
+        return Decimal(0)
+    score = getattr(instance, '_loaded_score', None)
+    if score is None:
+        score = type(instance).objects.filter(pk=instance.pk).values_list('score', flat=True).first()
+    return as_score(score)
+
+
+class _ScoreChanges:
+    """The score changes made in one transaction or savepoint, written once it commits"""
+
+    def __init__(self, savepoints):
+        self.savepoints = savepoints
+        self.deltas = defaultdict(Decimal)
+
+    def __call__(self):
+        batches = _batches()
+        if batches.get(self.savepoints) is self:
+            del batches[self.savepoints]
+        apply_score_changes(self.deltas)
+
+
+def _batches():
+    batches = getattr(_pending, 'batches', None)
+    if batches is None:
+        batches = _pending.batches = weakref.WeakValueDictionary()
+    return batches
+
+
+def _batch():
+    """The batch collecting the score changes of the current transaction and savepoint"""
+    # Savepoint ids are never reused, a savepoint rolled back and opened again gets a new batch
+    savepoints = frozenset(transaction.get_connection().savepoint_ids)
+    batches = _batches()
+    batch = batches.get(savepoints)
+    if batch is None:
+        batch = batches[savepoints] = _ScoreChanges(savepoints)
+        # Registered from inside the savepoint, so rolling it back drops its changes too
+        transaction.on_commit(batch)
+    return batch
+
+
+def add_score_change(enrollment_id, assessment_id, delta):
+    """
+    Roll a change of one of an enrollment's question scores up into its AssessmentScore and its
+    total score.
+
+    Inside a transaction the change is held until the transaction commits, the changes to the same
+    enrollment are added up and written together. Outside of one it is written right away. A change
+    of 0 writes no total but still retires the enrollment's cached grade report.
+
+    Args:
+        enrollment_id: The enrollment whose question score changed
+        assessment_id: The assessment of the question
+        delta: New score minus old score
+    """
+    delta = as_score(delta)
+    if not transaction.get_connection().in_atomic_block:
+        apply_score_changes({(enrollment_id, assessment_id): delta})
+        return
+    _batch().deltas[(enrollment_id, assessment_id)] += delta
+
+
+def _create_assessment_scores(keys):
+    """Create the missing AssessmentScores at 0, skipping those whose enrollment or assessment is gone"""
+    AssessmentScore = apps.get_model('assessment', 'AssessmentScore')
+    Assessment = apps.get_model('assessment', 'Assessment')
+    Enrollments = apps.get_model('enrollments', 'Enrollments')
+
+    enrollment_ids = set(Enrollments.objects.filter(
+        id__in={enrollment_id for enrollment_id, _ in keys}).values_list('id', flat=True))
+    assessment_ids = set(Assessment.objects.filter(
+        id__in={assessment_id for _, assessment_id in keys}).values_list('id', flat=True))
+    keys = [(enrollment_id, assessment_id) for enrollment_id, assessment_id in keys
+            if enrollment_id in enrollment_ids and assessment_id in assessment_ids]
+    # Another transaction can create the same one in between, the change is added afterwards either way
+    AssessmentScore.objects.bulk_create([
+        AssessmentScore(enrollment_id=enrollment_id, assessment_id=assessment_id, total_score=0)
+        for enrollment_id, assessment_id in keys
+    ], ignore_conflicts=True)
+    return keys
+
+
+def apply_score_changes(deltas):
+    """
+    Add score changes to the AssessmentScores and the enrollments' total scores. The total score of
+    an enrollment whose score was set by hand is left alone.
+
+    Every row is updated with an F() expression, once per AssessmentScore and once per enrollment,
+    so concurrent changes to the same scores add up instead of overwriting each other. The grade
+    reports of every enrollment in deltas are retired once the totals are written.
+
+    Args:
+        deltas (dict): (enrollment_id, assessment_id): change of the sum of the question scores
+    """
+    changed = list(deltas)
+    # Rows are always locked in the same order, concurrent batches can't deadlock on each other
+    deltas = sorted(((key, delta) for key, delta in deltas.items() if delta), key=lambda item: str(item[0]))
+    if deltas:
+        _write_score_changes(deltas)
+    scores_changed(changed)
+
+
+def _write_score_changes(deltas):
+    AssessmentScore = apps.get_model('assessment', 'AssessmentScore')
+    Enrollments = apps.get_model('enrollments', 'Enrollments')
+
+    now = timezone.now()
+
+    def add(enrollment_id, assessment_id, delta):
+        return AssessmentScore.objects.filter(enrollment_id=enrollment_id, assessment_id=assessment_id).update(
+            total_score=F('total_score') + delta, updated_at=now)
+
+    with transaction.atomic():
+        enrollment_deltas = defaultdict(Decimal)
+        missing = []
+        for (enrollment_id, assessment_id), delta in deltas:
+            enrollment_deltas[enrollment_id] += delta
+            if not add(enrollment_id, assessment_id, delta):
+                missing.append((enrollment_id, assessment_id))
+
+        if missing:
+            changes = dict(deltas)
+            for key in _create_assessment_scores(missing):
+                add(*key, changes[key])
+
+        for enrollment_id, delta in sorted(enrollment_deltas.items(), key=lambda item: str(item[0])):
+            if delta:
+                Enrollments.objects.filter(id=enrollment_id, score_override__isnull=True).update(
+                    total_score=F('total_score') + delta)
+
+    logger.debug(f"Rolled up {len(deltas)} score changes into {len(enrollment_deltas)} enrollments")
+
+
+def question_score_totals(enrollments):
+    """
+    Sum of the question scores of each enrollment per assessment, in three queries.
+
+    Args:
+        enrollments: Queryset of the enrollments to total
+    Returns:
+        dict: (enrollment_id, assessment_id): total
+    """
+    MCQQuestionScore = apps.get_model('MCQQuestionScore', 'MCQQuestionScore')
+    HandwrittenQuestionScore = apps.get_model('HandwrittenQuestion', 'HandwrittenQuestionScore')
+
+    totals = defaultdict(Decimal)
+    for scores, assessment in (
+        (MCQQuestionScore.objects.filter(question__isnull=False), 'question__assessment_id'),
+        (MCQQuestionScore.objects.filter(dynamic_question__isnull=False), 'dynamic_question__dynamic_mcq__assessment_id'),
+        (HandwrittenQuestionScore.objects.all(), 'question__assessment_id'),
+    ):
+        rows = scores.filter(enrollment__in=enrollments).values(
+            'enrollment_id', assessment_ref=F(assessment)).annotate(total=Sum('score')).order_by()
+        for row in rows:
+            totals[(row['enrollment_id'], row['assessment_ref'])] += row['total'] or 0
+    return totals
+
+
+def find_score_drift(enrollments):
+    """
+    Compare the materialized AssessmentScore and enrollment totals with their question scores.
+    The total score of an enrollment whose score was set by hand is not checked.
+
+    Args:
+        enrollments: Queryset of the enrollments to check
+    Returns:
+        tuple: (assessment_drift, enrollment_drift). assessment_drift maps (enrollment_id, assessment_id)
+            to (stored, expected) with stored None for a missing AssessmentScore, enrollment_drift maps
+            enrollment_id to (stored, expected)
+    """
+    AssessmentScore = apps.get_model('assessment', 'AssessmentScore')
+
+    expected = question_score_totals(enrollments)
+    stored = {(row['enrollment_id'], row['assessment_id']): row['total_score'] for row in
+              AssessmentScore.objects.filter(enrollment__in=enrollments).values(
+                  'enrollment_id', 'assessment_id', 'total_score')}
+
+    assessment_drift = {}
+    for key in set(expected) | set(stored):
+        total = as_score(expected.get(key))
+        if stored.get(key) != total and (key in stored or total):
+            assessment_drift[key] = (stored.get(key), total)
+
+    expected_enrollment = defaultdict(Decimal)
+    for (enrollment_id, _), total in expected.items():
+        expected_enrollment[enrollment_id] += total
+    enrollment_drift = {}
+    for enrollment_id, total_score in enrollments.filter(score_override__isnull=True).values_list('id', 'total_score'):
+        total = as_score(expected_enrollment.get(enrollment_id))
+        if total_score != total:
+            enrollment_drift[enrollment_id] = (total_score, total)
+    return assessment_drift, enrollment_drift
+
+
+def fix_score_drift(assessment_drift, enrollment_drift):
+    """Overwrite the drifted totals find_score_drift found with the expected ones"""
+    AssessmentScore = apps.get_model('assessment', 'AssessmentScore')
+    Enrollments = apps.get_model('enrollments', 'Enrollments')
+
+    with transaction.atomic():
+        missing = [key for key, (stored, _) in assessment_drift.items() if stored is None]
+        _create_assessment_scores(missing)
+        for (enrollment_id, assessment_id), (_, total) in assessment_drift.items():
+            AssessmentScore.objects.filter(enrollment_id=enrollment_id, assessment_id=assessment_id).update(
+                total_score=total, updated_at=timezone.now())
+        for enrollment_id, (_, total) in enrollment_drift.items():
+            # Set by hand since it was checked, the score set is kept
+            Enrollments.objects.filter(id=enrollment_id, score_override__isnull=True).update(total_score=total)
+
+
+def set_score_override(enrollment_id, score):
+    """
+    Set an enrollment's total score by hand, question score changes stop rolling up into it.
+
+    Args:
+        enrollment_id: The enrollment
+        score: The score, or None to go back to the sum of its question scores
+    """
+    Enrollments = apps.get_model('enrollments', 'Enrollments')
+
+    if score is not None:
+        Enrollments.objects.filter(id=enrollment_id).update(score_override=score, total_score=score)
+        return
+    with transaction.atomic():
+        # Locked so another change of the override waits for this one
+        enrollments = Enrollments.objects.select_for_update().filter(id=enrollment_id)
+        list(enrollments.values_list('id', flat=True))
+        total = as_score(sum(question_score_totals(enrollments).values(), Decimal(0)))
+        enrollments.update(score_override=None, total_score=total)
@@ -0,0 +1,76 @@
+import json
+from datetime import timedelta
+from django.utils import timezone
+from django_celery_beat.models import ClockedSchedule, PeriodicTask
+from main.settings import ASSESSMENT_PREWARM_MINUTES
+
+
+def _task_name(assessment_id):
+    return f"prewarm_assessment:{assessment_id}"
+
+
+def in_prewarm_window(assessment):
+    """Whether the assessment opens within ASSESSMENT_PREWARM_MINUTES"""
+    now = timezone.now()
+    return now < assessment.start_date <= now + timedelta(minutes=ASSESSMENT_PREWARM_MINUTES)
+
+
+def schedule_prewarm(assessment):
+    """
+    Run prewarm_assessment ASSESSMENT_PREWARM_MINUTES before the assessment opens.
+
+    An assessment opening sooner than that is prepared right away, one already open isn't.
+    """
+    from assessment.tasks import enqueue_prewarm
+
+    now = timezone.now()
+    run_at = assessment.start_date - timedelta(minutes=ASSESSMENT_PREWARM_MINUTES)
+    if assessment.start_date <= now or assessment.due_date <= now:
+        unschedule_prewarm(assessment.id)
+        return
+    if run_at <= now:
+        unschedule_prewarm(assessment.id)
+        enqueue_prewarm(assessment.id)
+        return
+
+    # Each assessment has its own clocked schedule, moved along with its start date
+    task = PeriodicTask.objects.filter(name=_task_name(assessment.id)).select_related('clocked').first()
+    if task is not None and task.clocked is not None:
+        clocked = task.clocked
+        clocked.clocked_time = run_at
+        clocked.save(update_fields=['clocked_time'])
+    else:
+        clocked = ClockedSchedule.objects.create(clocked_time=run_at)
+
+    PeriodicTask.objects.update_or_create(
+        name=_task_name(assessment.id),
+        defaults={
+            "clocked": clocked,
+            "one_off": True,
+            "enabled": True,
+            "task": "assessment.tasks.prewarm_assessment",
+            "args": json.dumps([str(assessment.id)]),
+        }
+    )
+
+
+def unschedule_prewarm(assessment_id):
+    # The task goes with its clocked schedule
+    ClockedSchedule.objects.filter(periodictask__name=_task_name(assessment_id)).delete()
+    PeriodicTask.objects.filter(name=_task_name(assessment_id)).delete()
+
+
+def schedule_upcoming_prewarms():
+    """
+    Schedule every assessment that hasn't opened yet, e.g. the ones created before the scheduler existed
+
+    Returns:
+        int: Number of assessments scheduled
+    """
+    from assessment.models import Assessment
+
+    scheduled = 0
+    for assessment in Assessment.objects.filter(start_date__gt=timezone.now()).iterator():
+        schedule_prewarm(assessment)
+        scheduled += 1
+    return scheduled
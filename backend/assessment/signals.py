@@ -1,29 +1,44 @@
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from .grades import assessment_grade_changed
+from .models import Assessment
+from .scheduler import in_prewarm_window, schedule_prewarm, unschedule_prewarm
+from .student_questions import invalidate_student_questions
+from .tasks import enqueue_prewarm
 from mcqQuestion.models import McqQuestion
 from HandwrittenQuestion.models import HandwrittenQuestion
 from DynamicMCQ.models import DynamicMCQ
 
 
-def update_assessment_grade(assessment):
-    if assessment:
-        # Use the property to sum all question grades
-        assessment.grade = assessment.total_grade
-        # Only update the grade field
-        assessment.save(update_fields=['grade'])
-
-
 @receiver([post_save, post_delete], sender=McqQuestion)
 def mcq_question_changed(sender, instance, **kwargs):
-    update_assessment_grade(instance.assessment)
+    assessment_grade_changed(instance.assessment_id)
 
 
 @receiver([post_save, post_delete], sender=DynamicMCQ)
 def dynamic_mcq_question_changed(sender, instance, **kwargs):
-    if hasattr(instance, 'assessment') and instance.assessment:
-        update_assessment_grade(instance.assessment)
+    assessment_grade_changed(instance.assessment_id)
 
 
 @receiver([post_save, post_delete], sender=HandwrittenQuestion)
 def handwritten_question_changed(sender, instance, **kwargs):
-    update_assessment_grade(instance.assessment)
+    assessment_grade_changed(instance.assessment_id)
+
+
+@receiver(post_save, sender=Assessment)
+def prepare_assessment(sender, instance, update_fields=None, **kwargs):
+    """
+    Drop the cached student payloads and (re)schedule the pre-warm when the dates change
+    """
+    invalidate_student_questions(instance.id)
+    if update_fields is None or {'start_date', 'due_date'} & set(update_fields):
+        transaction.on_commit(lambda: schedule_prewarm(instance))
+    elif in_prewarm_window(instance):
+        # The payloads just dropped are needed within minutes, build them again now
+        transaction.on_commit(lambda: enqueue_prewarm(instance.id))
+
+
+@receiver(post_delete, sender=Assessment)
+def unschedule_assessment_prewarm(sender, instance, **kwargs):
+    unschedule_prewarm(instance.id)
@@ -0,0 +1,215 @@
+import hashlib
+import json
+from datetime import timedelta
+from django.apps import apps
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every gunicorn worker must see the payloads the pre-warm task cached
+shared_cache = caches['shared']
+
+# Payloads outlive the assessment's due date by this much, late requests are rejected anyway
+PAYLOAD_GRACE = timedelta(hours=1)
+
+
+def _version_key(assessment_id):
+    return f"assessment_questions_version:{assessment_id}"
+
+
+def _payload_key(assessment_id, student_id, version):
+    return f"assessment_student_questions:{assessment_id}:{version}:{student_id}"
+
+
+def _snapshot_key(assessment_id, version):
+    return f"assessment_question_snapshot:{assessment_id}:{version}"
+
+
+def _timeout(assessment):
+    return max(60, int((assessment.due_date + PAYLOAD_GRACE - timezone.now()).total_seconds()))
+
+
+def _version(assessment_id):
+    return shared_cache.get_or_set(_version_key(assessment_id), 1, None)
+
+
+def questions_version(assessment_id):
+    """Changes whenever the questions or details of the assessment do, for caches built from them"""
+    return _version(assessment_id)
+
+
+def invalidate_student_questions(assessment_id):
+    """Drop the cached snapshot and every cached payload of an assessment, its questions or details changed"""
+    key = _version_key(assessment_id)
+    shared_cache.add(key, 1, None)
+    try:
+        shared_cache.incr(key)
+    except ValueError:
+        # Evicted in between, the payloads keyed by the old version can't be found anymore either
+        pass
+
+
+def build_question_snapshot(assessment):
+    """
+    The part of an assessment that is the same for every student: its details, MCQ and handwritten
+    questions with their answer keys, and what the dynamic MCQ section draws from.
+    """
+    McqQuestion = apps.get_model('mcqQuestion', 'McqQuestion')
+    HandwrittenQuestion = apps.get_model('HandwrittenQuestion', 'HandwrittenQuestion')
+    DynamicMCQ = apps.get_model('DynamicMCQ', 'DynamicMCQ')
+
+    dynamic_mcq = DynamicMCQ.objects.filter(assessment=assessment).values(
+        'id', 'section_number', 'number_of_questions').first()
+    return {
+        'assessment': {
+            'id': str(assessment.id),
+            'title': assessment.title,
+            'type': assessment.type,
+            'due_date': assessment.due_date,
+            'grade': assessment.grade,
+            'total_grade': assessment.total_grade,
+            'course': assessment.course.name
+        },
+        'mcq': [
+            {
+                'id': str(question.id),
+                'question': question.question,
+                'options': question.options,
+                'answer_key': question.answer_key,
+                'grade': question.question_grade,
+                'section_number': question.section_number,
+                'created_by': str(question.created_by_id) if question.created_by_id else None
+            } for question in McqQuestion.objects.filter(assessment=assessment)
+        ],
+        'handwritten': [
+            {
+                'id': str(question.id),
+                'question': question.question_text,
+                'answer_key': question.answer_key,
+                'max_grade': question.max_grade,
+                'section_number': question.section_number,
+                'created_by': str(question.created_by_id) if question.created_by_id else None
+            } for question in HandwrittenQuestion.objects.filter(assessment=assessment)
+        ],
+        'dynamic_mcq': dynamic_mcq,
+    }
+
+
+def question_snapshot(assessment):
+    """The static question bundle of an assessment, cached until the assessment or its questions change"""
+    version = _version(assessment.id)
+    key = _snapshot_key(assessment.id, version)
+    snapshot = shared_cache.get(key)
+    if snapshot is None:
+        snapshot = build_question_snapshot(assessment)
+        shared_cache.set(key, snapshot, _timeout(assessment))
+    return snapshot
+
+
+def payload_etag(payload):
+    """Strong ETag of a JSON response body"""
+    body = json.dumps(payload, sort_keys=True, default=str)
+    return quote_etag(hashlib.sha256(body.encode()).hexdigest()[:32])
+
+
+def etag_matches(request, etag):
+    """Whether the client's If-None-Match already names etag, the response can then be a 304"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags or etag in [tag.removeprefix('W/') for tag in etags]
+
+
+def build_student_questions(assessment, student):
+    """
+    The assessment as a student sees it: the snapshot's details and questions without answer keys,
+    and the student's dynamic MCQ set, sorted by section.
+
+    Draws the student's dynamic MCQ set from the pool if they don't have one yet.
+    """
+    snapshot = question_snapshot(assessment)
+    questions = assessment.get_all_questions_for_student(student, snapshot=snapshot)
+
+    formatted_questions = [
+        {
+            'type': 'dynamic_mcq',
+            'id': q['id'],
+            'question': q['question'],
+            'options': q['options'],
+            'grade': q['grade'],
+            'section_number': q['section_number']
+        } for q in questions['dynamic_mcq']
+    ] + [
+        {
+            'type': 'mcq',
+            'id': q['id'],
+            'question': q['question'],
+            'options': q['options'],
+            'grade': q['grade'],
+            'section_number': q['section_number']
+        } for q in questions['mcq']
+    ] + [
+        {
+            'type': 'handwritten',
+            'id': q['id'],
+            'question': q['question'],
+            'max_grade': q['max_grade'],
+            'section_number': q['section_number']
+        } for q in questions['handwritten']
+    ]
+
+    # Sort questions by section number
+    formatted_questions.sort(key=lambda x: x['section_number'])
+
+    return {
+        'assessment': snapshot['assessment'],
+        'questions': formatted_questions
+    }
+
+
+def cache_student_questions(assessment, student):
+    """
+    Build a student's payload and store it with its ETag until the assessment is over.
+
+    A payload whose dynamic MCQ set came out short, e.g. because drawing it failed, is returned but
+    not stored, so the student's next request tries again.
+    Returns:
+        tuple: (payload, etag)
+    """
+    version = _version(assessment.id)
+    payload = build_student_questions(assessment, student)
+    etag = payload_etag(payload)
+
+    dynamic_mcq = question_snapshot(assessment)['dynamic_mcq']
+    drawn = sum(1 for question in payload['questions'] if question['type'] == 'dynamic_mcq')
+    if dynamic_mcq is not None and drawn < dynamic_mcq['number_of_questions']:
+        logger.warning(
+            f"Student {student.id} got {drawn}/{dynamic_mcq['number_of_questions']} dynamic MCQ questions "
+            f"of assessment {assessment.id}, not caching their questions")
+        return payload, etag
+
+    shared_cache.set(_payload_key(assessment.id, student.id, version), (payload, etag), _timeout(assessment))
+    return payload, etag
+
+
+def get_student_questions(assessment, student):
+    """
+    A student's payload and its ETag from the cache, built and cached on a miss
+    Returns:
+        tuple: (payload, etag)
+    """
+    cached = shared_cache.get(_payload_key(assessment.id, student.id, _version(assessment.id)))
+    if cached is None:
+        cached = cache_student_questions(assessment, student)
+    return cached
+
+
+def cached_student_ids(assessment, student_ids):
+    """The students among student_ids whose payload is cached for the current version of the assessment"""
+    version = _version(assessment.id)
+    keys = {_payload_key(assessment.id, student_id, version): student_id for student_id in student_ids}
+    return {keys[key] for key in shared_cache.get_many(list(keys))}
@@ -0,0 +1,107 @@
+from celery import shared_task
+from django.apps import apps
+from django.core.cache import caches
+from django.db.models import Count
+from django.utils import timezone
+from .models import Assessment
+from .student_questions import cache_student_questions, cached_student_ids
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Longest a single pre-warm may hold its lock
+PREWARM_LOCK_TIMEOUT = 30 * 60
+# Seconds between attempts while an assessment isn't ready, as long as it hasn't opened
+PREWARM_RETRY_DELAY = 60
+
+
+def enqueue_prewarm(assessment_id):
+    """Queue a pre-warm, a missing broker must not break the save that asked for it"""
+    try:
+        prewarm_assessment.delay(str(assessment_id))
+    except Exception as e:
+        logger.error(
+            f"Failed to queue pre-warm of assessment {assessment_id}: {str(e)}")
+
+
+def prewarm_status(assessment_id):
+    """
+    Readiness found by the last pre-warm of an assessment
+    Returns:
+        dict: students, ready, pool_size and checked_at, None if it wasn't pre-warmed
+    """
+    return caches['shared'].get(f"assessment_prewarm_status:{assessment_id}")
+
+
+@shared_task(bind=True, max_retries=10, default_retry_delay=PREWARM_RETRY_DELAY)
+def prewarm_assessment(self, assessment_id):
+    """
+    Prepare an assessment for the students who will open it at once when it starts.
+
+    Fills the dynamic MCQ pool, draws every enrolled student's question set and caches the
+    payload AssessmentStudentQuestionsAPIView returns, then checks every student is ready.
+    An assessment that isn't ready is tried again until it opens.
+    Returns:
+        int: Number of students ready
+    """
+    from DynamicMCQ.models import DynamicMCQ
+    from DynamicMCQ.tasks import fill_pool_exclusively
+    Enrollments = apps.get_model('enrollments', 'Enrollments')
+    DynamicMCQQuestions = apps.get_model('DynamicMCQ', 'DynamicMCQQuestions')
+
+    lock_key = f"assessment_prewarm:{assessment_id}"
+    # Shared, pre-warms queued by saves in the window can land on any worker
+    if not caches['shared'].add(lock_key, True, PREWARM_LOCK_TIMEOUT):
+        logger.info(f"Assessment {assessment_id} is already being pre-warmed")
+        return 0
+
+    try:
+        try:
+            assessment = Assessment.objects.select_related('course').get(id=assessment_id)
+        except Assessment.DoesNotExist:
+            return 0
+        if assessment.due_date <= timezone.now():
+            return 0
+
+        # Generate what the pool is missing first, so the sets below are drawn without AI calls
+        dynamic_mcq = DynamicMCQ.objects.filter(assessment=assessment).first()
+        if dynamic_mcq is not None:
+            fill_pool_exclusively(dynamic_mcq.id)
+
+        students = [enrollment.user for enrollment in Enrollments.objects.filter(
+            course=assessment.course, is_completed=False, user__role="Student").select_related('user')]
+        for student in students:
+            try:
+                cache_student_questions(assessment, student)
+            except Exception as e:
+                logger.error(
+                    f"Failed to pre-warm assessment {assessment_id} for student {student.id}: {str(e)}")
+
+        # Verify: every payload is cached and every student has a full dynamic set
+        ready = cached_student_ids(assessment, [student.id for student in students])
+        pool_size = None
+        if dynamic_mcq is not None:
+            pool_size = dynamic_mcq.pool.count()
+            set_sizes = dict(DynamicMCQQuestions.objects.filter(
+                dynamic_mcq=dynamic_mcq, created_by__in=ready
+            ).values('created_by').annotate(count=Count('id')).values_list('created_by', 'count'))
+            ready = {student_id for student_id in ready
+                     if set_sizes.get(student_id, 0) >= dynamic_mcq.number_of_questions}
+
+        caches['shared'].set(f"assessment_prewarm_status:{assessment_id}", {
+            'students': len(students),
+            'ready': len(ready),
+            'pool_size': pool_size,
+            'checked_at': timezone.now(),
+        }, max(60, int((assessment.due_date - timezone.now()).total_seconds())))
+        logger.info(
+            f"Pre-warmed assessment {assessment_id}: {len(ready)}/{len(students)} students ready")
+    finally:
+        caches['shared'].delete(lock_key)
+
+    if len(ready) < len(students) and timezone.now() < assessment.start_date \
+            and self.request.retries < self.max_retries:
+        logger.warning(
+            f"Assessment {assessment_id} is not ready for {len(students) - len(ready)} students, trying again")
+        raise self.retry()
+    return len(ready)
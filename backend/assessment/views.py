@@ -3,15 +3,15 @@ from rest_framework.exceptions import PermissionDenied
 from .models import Assessment, AssessmentScore
 from .serializers import AssessmentSerializer, AssessmentScoreSerializer, AssessmentListSerializer
 from .filters import AssessmentFilterSet
+from .grades import deferred_grade_updates
+from .grade_reports import grade_report, present_grade_report
+from .student_questions import get_student_questions, question_snapshot, payload_etag, etag_matches
 from enrollments.models import Enrollments
 from mcqQuestion.models import McqQuestion
 from mcqQuestion.serializers import McqQuestionSerializer
-from MCQQuestionScore.models import MCQQuestionScore
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Sum
 from django.http import Http404
-from HandwrittenQuestion.models import HandwrittenQuestionScore
 from AssessmentSubmission.models import AssessmentSubmission
 from django.apps import apps
 from users.permissions import isStudent
@@ -234,7 +234,9 @@ class AssessmentRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIVi
             raise PermissionDenied(
                 "You can only delete assessments for your institution's courses")
 
-        instance.delete()
+        # Its questions go with it, none of them should update the grade of the assessment on the way
+        with deferred_grade_updates():
+            instance.delete()
 
 # ----------------------
 # Assessment Score Views
@@ -471,7 +473,7 @@ class StudentGradesAPIView(generics.GenericAPIView):
             {
                 "question_id": "uuid",
                 "question_text": "string",
-                "type": "mcq|handwritten",
+                "type": "mcq|handwritten|dynamic_mcq",
                 "student_answer": "string",
                 "is_correct": "boolean",  // For MCQ
                 "score": "string",
@@ -492,7 +494,7 @@ class StudentGradesAPIView(generics.GenericAPIView):
     - 200: Successfully retrieved grades
     - 400: Assessment not submitted
     - 403: Not authorized to view grades
-    - 404: Assessment or score not found
+    - 404: Assessment not found
 
     Permissions:
     - Students: Can view their own grades
@@ -512,7 +514,7 @@ class StudentGradesAPIView(generics.GenericAPIView):
 
             # Get the assessment
             try:
-                assessment = Assessment.objects.get(id=assessment_id)
+                assessment = Assessment.objects.select_related('course').get(id=assessment_id)
             except Assessment.DoesNotExist:
                 return Response({
                     'detail': 'Assessment not found'
@@ -547,140 +549,9 @@ class StudentGradesAPIView(generics.GenericAPIView):
                     'detail': 'You haven\'t submitted this assessment yet'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Get the assessment score
-            try:
-                assessment_score = AssessmentScore.objects.select_related(
-                    'assessment__course',
-                    'enrollment__user'
-                ).get(
-                    enrollment=enrollment,
-                    assessment=assessment
-                )
-            except AssessmentScore.DoesNotExist:
-                return Response({
-                    'detail': 'No assessment score found for this assessment'
-                }, status=status.HTTP_404_NOT_FOUND)
-
-            # Get all MCQ questions and scores for this assessment and student
-            mcq_scores = MCQQuestionScore.objects.filter(
-                question__assessment=assessment_score.assessment,
-                enrollment=assessment_score.enrollment
-            ).select_related('question')
-
-            # Get all handwritten questions and scores
-            handwritten_scores = HandwrittenQuestionScore.objects.filter(
-                question__assessment=assessment_score.assessment,
-                enrollment=assessment_score.enrollment
-            ).select_related('question')
-
-            # Get all Dynamic MCQ questions
-            DynamicMCQ = apps.get_model('DynamicMCQ', 'DynamicMCQ')
-            DynamicMCQQuestions = apps.get_model(
-                'DynamicMCQ', 'DynamicMCQQuestions')
-
-            # Get all Dynamic MCQ questions for this assessment
-            dynamic_mcq = DynamicMCQ.objects.get(assessment=assessment)
-            dynamic_mcq_questions = DynamicMCQQuestions.objects.filter(
-                dynamic_mcq=dynamic_mcq,
-                created_by=request.user
-            )
-
-            # Calculate total score of answered questions
-            mcq_total = float(mcq_scores.aggregate(
-                total=Sum('score'))['total'] or 0)
-            handwritten_total = float(handwritten_scores.aggregate(
-                total=Sum('score'))['total'] or 0)
-
-            # Build questions data with student scores
-            questions_data = []
-
-            # Add MCQ questions
-            for mcq_score in mcq_scores:
-                question_data = {
-                    'question_id': str(mcq_score.question.id),
-                    'question_text': mcq_score.question.question,
-                    'student_answer': mcq_score.selected_answer,
-                    'is_correct': mcq_score.is_correct,
-                    'score': str(mcq_score.score),
-                    'max_score': str(mcq_score.question.question_grade),
-                    'type': 'mcq'
-                }
-
-                if request.user.role in ['Teacher', 'Institution', 'Student']:
-                    question_data.update({
-                        'options': mcq_score.question.options,
-                        'correct_answer': mcq_score.question.answer_key
-                    })
-
-                questions_data.append(question_data)
-
-            # Add Handwritten questions
-            for handwritten_score in handwritten_scores:
-                question_data = {
-                    'question_id': str(handwritten_score.question.id),
-                    'question_text': handwritten_score.question.question_text,
-                    'type': 'handwritten',
-                    'score': str(handwritten_score.score),
-                    'max_score': str(handwritten_score.question.max_grade),
-                    'extracted_text': handwritten_score.extracted_text,
-                    'feedback': handwritten_score.feedback,
-                    'answer_image': request.build_absolute_uri(handwritten_score.answer_image.url) if handwritten_score.answer_image else None
-                }
-
-                if request.user.role in ['Teacher', 'Institution']:
-                    question_data.update({
-                        'correct_answer': handwritten_score.question.answer_key
-                    })
-
-                questions_data.append(question_data)
-
-            # Add Dynamic MCQ questions
-            dynamic_mcq_total = 0
-            for question in dynamic_mcq_questions:
-                # Get the score for this question from MCQQuestionScore using dynamic_question_id
-                score = MCQQuestionScore.objects.filter(
-                    dynamic_question_id=question.id,  # Match by dynamic_question_id
-                    enrollment=assessment_score.enrollment
-                ).first()
-
-                if score:
-                    dynamic_mcq_total += float(score.score)
-
-                # Get the student's answer from the score's selected_answer field
-                student_answer = score.selected_answer if score and hasattr(
-                    score, 'selected_answer') else None
-
-                question_data = {
-                    'question_id': str(question.id),
-                    'question_text': question.question,
-                    'type': 'dynamic_mcq',
-                    'max_score': str(question.question_grade),
-                    'difficulty': question.difficulty,
-                    'score': str(score.score) if score else '0',
-                    'is_correct': score.is_correct if score else False,
-                    'student_answer': student_answer
-                }
-
-                if request.user.role in ['Teacher', 'Institution', 'Student']:
-                    question_data.update({
-                        'options': question.options,
-                        'correct_answer': question.answer_key
-                    })
-
-                questions_data.append(question_data)
-
-            total_answered_score = mcq_total + handwritten_total + dynamic_mcq_total
-
-            response_data = {
-                'assessment_id': str(assessment_score.assessment.id),
-                'assessment_title': assessment_score.assessment.title,
-                'course': assessment_score.assessment.course.name,
-                'questions': questions_data,
-                'total_score': total_answered_score,
-                'total_max_score': float(assessment_score.assessment.grade)
-            }
-
-            return Response(response_data)
+            # Built from the score tables once per change of the student's scores
+            report = grade_report(assessment, enrollment, submission)
+            return Response(present_grade_report(report, request))
 
         except Exception as e:
             return Response({
@@ -721,8 +592,11 @@ class AssessmentAllQuestionsAPIView(generics.RetrieveAPIView):
     }
     ```
 
+    The response carries an ETag, send it back in If-None-Match to get a 304 while nothing changed.
+
     Status Codes:
     - 200: Successfully retrieved questions
+    - 304: The questions are the ones the client already has
     - 403: Not authorized to view questions
     - 404: Assessment not found
     """
@@ -739,29 +613,26 @@ class AssessmentAllQuestionsAPIView(generics.RetrieveAPIView):
         try:
             assessment = self.get_object()
 
-            # Get all questions based on user role
+            # MCQ and handwritten questions come from the cached snapshot, only the
+            # students' dynamic MCQ sets are read on every request
+            snapshot = question_snapshot(assessment)
             if request.user.role == "Student":
                 # For students, only get their own questions
-                mcq_questions = assessment.mcq_questions.filter(
-                    assessment=assessment,
-                    created_by=request.user
-                )
-                handwritten_questions = assessment.handwritten_questions.filter(
-                    assessment=assessment,
-                    created_by=request.user
-                )
+                user_id = str(request.user.id)
+                mcq_questions = [question for question in snapshot['mcq']
+                                 if question['created_by'] == user_id]
+                handwritten_questions = [question for question in snapshot['handwritten']
+                                         if question['created_by'] == user_id]
             else:
                 # For teachers and institutions, get all questions
-                mcq_questions = assessment.mcq_questions.all()
-                handwritten_questions = assessment.handwritten_questions.all()
+                mcq_questions = snapshot['mcq']
+                handwritten_questions = snapshot['handwritten']
 
             # Get dynamic MCQs
-            DynamicMCQ = apps.get_model('DynamicMCQ', 'DynamicMCQ')
             DynamicMCQQuestions = apps.get_model(
                 'DynamicMCQ', 'DynamicMCQQuestions')
-            dynamic_mcqs = DynamicMCQ.objects.filter(assessment=assessment)
             dynamic_questions = DynamicMCQQuestions.objects.filter(
-                dynamic_mcq__in=dynamic_mcqs)
+                dynamic_mcq__assessment=assessment)
 
             # Prepare response data
             response_data = {
@@ -775,40 +646,43 @@ class AssessmentAllQuestionsAPIView(generics.RetrieveAPIView):
                 question_data = {
                     'id': str(question.id),
                     'type': 'dynamic_mcq',
-                    'question': question.question_text,
+                    'question': question.question,
                     'options': question.options,
                     'answer_key': question.answer_key,
                     'difficulty': question.difficulty,
-                    'created_by': str(question.created_by.id) if question.created_by else None
+                    'created_by': str(question.created_by_id) if question.created_by_id else None
                 }
                 response_data['questions'].append(question_data)
 
             # Add MCQ questions
             for question in mcq_questions:
                 question_data = {
-                    'id': str(question.id),
+                    'id': question['id'],
                     'type': 'mcq',
-                    'question': question.question,
-                    'options': question.options,
-                    'answer_key': question.answer_key,
-                    'question_grade': str(question.question_grade),
-                    'created_by': str(question.created_by.id) if question.created_by else None
+                    'question': question['question'],
+                    'options': question['options'],
+                    'answer_key': question['answer_key'],
+                    'question_grade': str(question['grade']),
+                    'created_by': question['created_by']
                 }
                 response_data['questions'].append(question_data)
 
             # Add Handwritten questions
             for question in handwritten_questions:
                 question_data = {
-                    'id': str(question.id),
+                    'id': question['id'],
                     'type': 'handwritten',
-                    'question': question.question_text,
-                    'answer_key': question.answer_key,
-                    'max_grade': str(question.max_grade),
-                    'created_by': str(question.created_by.id) if question.created_by else None
+                    'question': question['question'],
+                    'answer_key': question['answer_key'],
+                    'max_grade': str(question['max_grade']),
+                    'created_by': question['created_by']
                 }
                 response_data['questions'].append(question_data)
 
-            return Response(response_data, status=status.HTTP_200_OK)
+            etag = payload_etag(response_data)
+            if etag_matches(request, etag):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+            return Response(response_data, status=status.HTTP_200_OK, headers={'ETag': etag})
 
         except Exception as e:
             return Response(
@@ -829,7 +703,7 @@ class AssessmentStudentQuestionsAPIView(generics.RetrieveAPIView):
             # Check if student is enrolled in the course
             if not Enrollments.objects.filter(
                 user=self.request.user,
-                course=assessment.course
+                course_id=assessment.course_id
             ).exists():
                 raise PermissionDenied("You are not enrolled in this course")
 
@@ -848,7 +722,7 @@ class AssessmentStudentQuestionsAPIView(generics.RetrieveAPIView):
         # check if assessment is already submitted
         enrollment = Enrollments.objects.get(
             user=request.user,
-            course=assessment.course,
+            course_id=assessment.course_id,
             is_completed=False
         )
         if AssessmentSubmission.objects.filter(
@@ -859,65 +733,13 @@ class AssessmentStudentQuestionsAPIView(generics.RetrieveAPIView):
                 "You have already submitted this assessment")
 
         try:
-            # Get all questions for the student
-            questions = assessment.get_all_questions_for_student(request.user)
-
-            # Format all questions into a single list with their types
-            formatted_questions = []
-
-            # Add dynamic MCQ questions
-            formatted_questions.extend([
-                {
-                    'type': 'dynamic_mcq',
-                    'id': str(q['id']),
-                    'question': q['question'],
-                    'options': q['options'],
-                    'grade': q.get('grade', 0),
-                    'section_number': q.get('section_number', 1)
-                } for q in questions.get('dynamic_mcq', [])
-            ])
-
-            # Add regular MCQ questions
-            formatted_questions.extend([
-                {
-                    'type': 'mcq',
-                    'id': str(q['id']),
-                    'question': q['question'],
-                    'options': q['options'],
-                    'grade': q.get('grade', 0),
-                    'section_number': q.get('section_number', 1)
-                } for q in questions.get('mcq', [])
-            ])
-
-            # Add handwritten questions
-            formatted_questions.extend([
-                {
-                    'type': 'handwritten',
-                    'id': str(q['id']),
-                    'question': q['question'],
-                    'max_grade': q.get('max_grade', 0),
-                    'section_number': q.get('section_number', 1)
-                } for q in questions.get('handwritten', [])
-            ])
-
-            # Sort questions by section number
-            formatted_questions.sort(key=lambda x: x['section_number'])
-
-            # Add assessment details
-            response_data = {
-                'assessment': {
-                    'id': str(assessment.id),
-                    'title': assessment.title,
-                    'type': assessment.type,
-                    'due_date': assessment.due_date,
-                    'grade': assessment.grade,
-                    'total_grade': assessment.total_grade,
-                    'course': assessment.course.name
-                },
-                'questions': formatted_questions
-            }
+            # Pre-warmed before the assessment opens, see assessment.tasks.prewarm_assessment
+            response_data, etag = get_student_questions(assessment, request.user)
 
-            return Response(response_data, status=status.HTTP_200_OK)
+            # The client already has this version of the questions
+            if etag_matches(request, etag):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+            return Response(response_data, status=status.HTTP_200_OK, headers={'ETag': etag})
 
         except Exception as e:
             return Response(
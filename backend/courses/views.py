@@ -1,6 +1,7 @@
 from courses.filter import CourseFilterSet
 from courses.serializers import CourseSerializer
 from courses.models import Course
+from assessment.grades import deferred_grade_updates
 from enrollments.models import Enrollments
 from users.models import User
 from rest_framework import generics
@@ -47,6 +48,11 @@ class RetrieveUpdateDestroyCourseDetailAPIView(generics.RetrieveUpdateDestroyAPI
             self.permission_classes = [isInstitution]
         return super().get_permissions()
 
+    def perform_destroy(self, instance):
+        # The questions of its assessments go with it, none of them should update an assessment grade
+        with deferred_grade_updates():
+            instance.delete()
+
 
 class CourseProgressListAPIView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
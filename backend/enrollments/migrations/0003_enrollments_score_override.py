@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollments',
+            name='score_override',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True),
+        ),
+    ]
@@ -19,6 +19,10 @@ class Enrollments(models.Model):
     is_summer_enrollment = models.BooleanField(default=False)
     total_score = models.DecimalField(
         max_digits=5, decimal_places=2, default=0)
+    # Score a teacher or the institution set by hand, total_score holds it while it's set and the
+    # question score changes don't roll up into it
+    score_override = models.DecimalField(
+        max_digits=5, decimal_places=2, null=True, blank=True)
 
     def __str__(self):
         return f"{self.user.email} - {self.course.name}"
@@ -24,6 +24,7 @@ class EnrollmentsSerializer(serializers.ModelSerializer):
     user_data = StudentSerializer(source='user', read_only=True)
     course_data = serializers.SerializerMethodField()
     total_score = serializers.DecimalField(max_digits=5, decimal_places=2)
+    score_override = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
 
     class Meta:
         model = Enrollments
@@ -37,7 +38,8 @@ class EnrollmentsSerializer(serializers.ModelSerializer):
             'is_completed',
             'is_passed',
             'is_summer_enrollment',
-            'total_score'
+            'total_score',
+            'score_override'
         )
 
     def to_representation(self, instance):
@@ -17,6 +17,7 @@ from courses.serializers import CourseSerializer
 import uuid
 from uuid import UUID
 from assessment.models import AssessmentScore
+from assessment.rollups import set_score_override
 from institution_policy.models import InstitutionPolicy
 from users.models import User
 from enrollments.serializers import (
@@ -435,7 +436,10 @@ class EnrollmentScoreView(generics.RetrieveAPIView):
 
 class EnrollmentUpdateScoreView(generics.UpdateAPIView):
     """
-    API view to update the total score for a specific enrollment
+    API view to set the total score for a specific enrollment by hand.
+
+    The score is kept as the enrollment's score override, question score changes stop rolling up
+    into it. Send "total_score": null to go back to the sum of the question scores.
     """
     permission_classes = [IsAuthenticated]
     serializer_class = EnrollmentsSerializer
@@ -456,9 +460,16 @@ class EnrollmentUpdateScoreView(generics.UpdateAPIView):
                 "You can only update scores for your institution's courses")
 
         # Get the new score from request data
+        if 'total_score' not in request.data:
+            return Response({"error": "total_score is required"}, status=status.HTTP_400_BAD_REQUEST)
         new_score = request.data.get('total_score')
         if new_score is None:
-            return Response({"error": "total_score is required"}, status=status.HTTP_400_BAD_REQUEST)
+            set_score_override(enrollment.id, None)
+            enrollment.refresh_from_db()
+            return Response(
+                self.get_serializer(enrollment).data,
+                status=status.HTTP_200_OK
+            )
 
         try:
             # Convert to Decimal and validate
@@ -470,8 +481,8 @@ class EnrollmentUpdateScoreView(generics.UpdateAPIView):
                 )
 
             # Update the score
-            enrollment.total_score = score
-            enrollment.save()
+            set_score_override(enrollment.id, score)
+            enrollment.refresh_from_db()
 
             return Response(
                 self.get_serializer(enrollment).data,
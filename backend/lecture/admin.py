@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import Lecture
+from .models import Lecture, LectureText
 
 # Register your models here.
 
 admin.site.register(Lecture)
+admin.site.register(LectureText)
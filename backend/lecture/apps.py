@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LectureConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'lecture'
+
+    def ready(self):
+        import lecture.signals
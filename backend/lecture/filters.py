@@ -15,6 +15,7 @@ class LectureFilter(filters.FilterSet):
     created_at_before = filters.DateTimeFilter(
         field_name='created_at', lookup_expr='lte')
     assessment_id = filters.UUIDFilter(method='filter_by_assessment')
+    text_status = filters.CharFilter(field_name='text__status')
 
     def filter_by_assessment(self, queryset, name, value):
         try:
@@ -26,4 +27,4 @@ class LectureFilter(filters.FilterSet):
     class Meta:
         model = Lecture
         fields = ['id', 'title', 'description',
-                  'chapter', 'created_at', 'assessment_id']
+                  'chapter', 'created_at', 'assessment_id', 'text_status']
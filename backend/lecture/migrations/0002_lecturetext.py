@@ -0,0 +1,33 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecture', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LectureText',
+            fields=[
+                ('lecture', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True,
+                                                 related_name='text', serialize=False, to='lecture.lecture')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('extracting', 'Extracting'), ('ready', 'Ready'), (
+                    'empty', 'No text'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('pages', models.JSONField(blank=True, default=list,
+                                           help_text='Normalized text of each page, in page order')),
+                ('char_count', models.PositiveIntegerField(default=0)),
+                ('token_count', models.PositiveIntegerField(
+                    default=0, help_text='Estimated AI tokens of the whole text')),
+                ('content_hash', models.CharField(blank=True, max_length=64,
+                                                  help_text='SHA-256 of the attachment the text was extracted from')),
+                ('extractor_version', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('extracted_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -19,6 +19,78 @@ class Lecture(models.Model):
     def __str__(self):
         return self.title
 
+    @property
+    def text_status(self):
+        """Extraction status of the attachment's text, None when there is nothing to extract"""
+        try:
+            return self.text.status
+        except LectureText.DoesNotExist:
+            return None
+
+    @property
+    def text_ready(self):
+        return self.text_status == LectureText.STATUS_READY
+
+    def extracted_text(self, max_chars=None):
+        """
+        Text extracted from the attachment at upload time.
+
+        Lectures uploaded before extraction moved to upload time are queued on first use.
+
+        Args:
+            max_chars (int): Truncate the text to this many characters
+        Returns:
+            str: The text, or None when it isn't ready yet and the caller has to extract it itself
+        """
+        if self.text_status is None and self.attachment:
+            from .tasks import enqueue_text_extraction
+            LectureText.objects.get_or_create(lecture=self)
+            enqueue_text_extraction(self.id)
+            return None
+        if not self.text_ready:
+            return None
+        text = self.text.text
+        return text[:max_chars] if max_chars else text
+
+
+class LectureText(models.Model):
+    """Normalized per-page text of a lecture's PDF attachment, extracted in the background after upload"""
+    STATUS_PENDING = 'pending'
+    STATUS_EXTRACTING = 'extracting'
+    STATUS_READY = 'ready'
+    STATUS_EMPTY = 'empty'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_EXTRACTING, 'Extracting'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_EMPTY, 'No text'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    lecture = models.OneToOneField(
+        Lecture, on_delete=models.CASCADE, primary_key=True, related_name='text')
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    pages = models.JSONField(
+        default=list, blank=True, help_text="Normalized text of each page, in page order")
+    char_count = models.PositiveIntegerField(default=0)
+    token_count = models.PositiveIntegerField(
+        default=0, help_text="Estimated AI tokens of the whole text")
+    content_hash = models.CharField(
+        max_length=64, blank=True, help_text="SHA-256 of the attachment the text was extracted from")
+    extractor_version = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    extracted_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.lecture.title} - {self.status}'
+
+    @property
+    def text(self):
+        # Joined the way extract_text_from_pdf joins pages, so both paths feed the AI the same text
+        return "\n".join(self.pages).strip()
+
 
 class LectureProgress(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
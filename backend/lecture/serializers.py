@@ -19,10 +19,17 @@ class LectureSerializer(serializers.ModelSerializer):
         queryset=Chapter.objects.all(), write_only=True
     )
 
+    # Whether the attachment's text is extracted and questions can be generated from it
+    text_status = serializers.CharField(read_only=True)
+    text_ready = serializers.BooleanField(read_only=True)
+    text_token_count = serializers.IntegerField(
+        source='text.token_count', read_only=True, default=None)
+
     class Meta:
         model = Lecture
         fields = ('id', 'title', 'video', 'attachment',
-                  'chapter', 'chapter_detials', 'description', 'updated_at')
+                  'chapter', 'chapter_detials', 'description', 'updated_at',
+                  'text_status', 'text_ready', 'text_token_count')
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
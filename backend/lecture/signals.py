@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Lecture, LectureText
+from .tasks import enqueue_text_extraction
+from AI.pdf_text_cache import invalidate_pdf
+
+
+@receiver(pre_save, sender=Lecture)
+def invalidate_replaced_attachment_text(sender, instance, **kwargs):
+    """
+    Drop the cached text of the old attachment when a lecture's attachment is replaced
+    """
+    if instance._state.adding:
+        instance._attachment_changed = bool(instance.attachment)
+        return
+
+    try:
+        old_attachment = Lecture.objects.get(pk=instance.pk).attachment
+    except Lecture.DoesNotExist:
+        instance._attachment_changed = bool(instance.attachment)
+        return
+
+    instance._attachment_changed = old_attachment.name != instance.attachment.name
+    if old_attachment and instance._attachment_changed:
+        invalidate_pdf(old_attachment)
+
+
+@receiver(post_save, sender=Lecture)
+def extract_attachment_text(sender, instance, **kwargs):
+    """
+    Extract the text of a new or replaced attachment in the background, so generation never parses PDFs
+    """
+    if not getattr(instance, '_attachment_changed', False):
+        return
+    instance._attachment_changed = False
+
+    if not instance.attachment or not instance.attachment.name.lower().endswith('.pdf'):
+        LectureText.objects.filter(lecture=instance).delete()
+        return
+
+    # Not ready until the new attachment is extracted, the old text must not be used meanwhile
+    LectureText.objects.update_or_create(
+        lecture=instance,
+        defaults={'status': LectureText.STATUS_PENDING, 'pages': [], 'char_count': 0,
+                  'token_count': 0, 'content_hash': "", 'error': ""},
+    )
+    transaction.on_commit(lambda: enqueue_text_extraction(instance.id))
+
+
+@receiver(post_delete, sender=Lecture)
+def invalidate_deleted_attachment_text(sender, instance, **kwargs):
+    """
+    Drop the cached text of a deleted lecture's attachment
+    """
+    if instance.attachment:
+        invalidate_pdf(instance.attachment)
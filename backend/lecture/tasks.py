@@ -0,0 +1,87 @@
+from celery import shared_task
+from django.core.cache import caches
+from django.utils import timezone
+from AI.chunk_text import estimate_tokens
+from AI.extract_text_from_pdf import EXTRACTOR_VERSION, iter_pdf_pages
+from AI.pdf_text_cache import hash_pdf
+from .models import Lecture, LectureText
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Longest a single extraction may hold its lock
+EXTRACTION_LOCK_TIMEOUT = 10 * 60
+# Seconds before a run queued while another extraction of the lecture holds the lock tries again
+EXTRACTION_LOCK_WAIT = 15
+
+
+def enqueue_text_extraction(lecture_id):
+    """Queue a text extraction, a missing broker must not break the upload that asked for it"""
+    try:
+        extract_lecture_text.delay(str(lecture_id))
+    except Exception as e:
+        logger.error(
+            f"Failed to queue text extraction for lecture {lecture_id}: {str(e)}")
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def extract_lecture_text(self, lecture_id):
+    """Extract and store the normalized text of a lecture's PDF attachment"""
+    lock_key = f"lecture_text_extraction:{lecture_id}"
+    # A replaced attachment can queue the lecture again while the first run is going, on any worker.
+    # The new run may be for a newer file, so it is queued again rather than dropped. Queued afresh
+    # instead of retried, waiting must not use up the retries of a failed extraction
+    if not caches['shared'].add(lock_key, True, EXTRACTION_LOCK_TIMEOUT):
+        logger.info(f"Text of lecture {lecture_id} is already being extracted, trying again later")
+        extract_lecture_text.apply_async(args=[lecture_id], countdown=EXTRACTION_LOCK_WAIT)
+        return None
+
+    try:
+        try:
+            lecture = Lecture.objects.get(id=lecture_id)
+        except Lecture.DoesNotExist:
+            return None
+        attachment = lecture.attachment
+        if not attachment or not attachment.name.lower().endswith('.pdf'):
+            LectureText.objects.filter(lecture=lecture).delete()
+            return None
+
+        content_hash = hash_pdf(attachment)
+        lecture_text, _ = LectureText.objects.get_or_create(lecture=lecture)
+        if lecture_text.status == LectureText.STATUS_READY and lecture_text.content_hash == content_hash \
+                and lecture_text.extractor_version == EXTRACTOR_VERSION:
+            return lecture_text.token_count
+
+        LectureText.objects.filter(lecture=lecture).update(
+            status=LectureText.STATUS_EXTRACTING)
+        pages = list(iter_pdf_pages(attachment))
+        text = "\n".join(pages).strip()
+
+        # Replaced while it was read, the run queued for the new file stores its text
+        if not Lecture.objects.filter(id=lecture_id, attachment=attachment.name).exists():
+            logger.info(f"Attachment of lecture {lecture_id} changed during extraction, discarding")
+            return None
+
+        LectureText.objects.filter(lecture=lecture).update(
+            status=LectureText.STATUS_READY if text else LectureText.STATUS_EMPTY,
+            pages=pages,
+            char_count=len(text),
+            token_count=estimate_tokens(text),
+            content_hash=content_hash,
+            extractor_version=EXTRACTOR_VERSION,
+            error="",
+            extracted_at=timezone.now(),
+        )
+        logger.info(
+            f"Extracted {len(pages)} pages ({len(text)} characters) from lecture {lecture_id}")
+        return estimate_tokens(text)
+    except Exception as e:
+        logger.error(
+            f"Failed to extract the text of lecture {lecture_id}: {str(e)}")
+        if self.request.retries >= self.max_retries:
+            LectureText.objects.filter(lecture_id=lecture_id).update(
+                status=LectureText.STATUS_FAILED, error=str(e))
+            return None
+        raise self.retry(exc=e)
+    finally:
+        caches['shared'].delete(lock_key)
@@ -24,14 +24,14 @@ class LectureListCreateAPIView(generics.ListCreateAPIView):
         user = self.request.user
 
         if user.role == "Institution":
-            return Lecture.objects.filter(
+            return Lecture.objects.select_related('text').filter(
                 chapter__course__institution=user
             )
 
         elif user.role in ["Student", "Teacher"]:
             institutions = user.institution.all()
             if institutions.exists():
-                return Lecture.objects.filter(
+                return Lecture.objects.select_related('text').filter(
                     chapter__course__institution__in=institutions
                 )
 
@@ -75,14 +75,14 @@ class LectureRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView)
         user = self.request.user
 
         if user.role == "Institution":
-            return Lecture.objects.filter(
+            return Lecture.objects.select_related('text').filter(
                 chapter__course__institution=user
             )
 
         elif user.role in ["Student", "Teacher"]:
             institutions = user.institution.all()
             if institutions.exists():
-                return Lecture.objects.filter(
+                return Lecture.objects.select_related('text').filter(
                     chapter__course__institution__in=institutions
                 )
 
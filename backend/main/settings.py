@@ -1,6 +1,7 @@
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import timedelta
+import json
 import os
 load_dotenv()
 
@@ -269,11 +270,43 @@ SPECTACULAR_SETTINGS = {
     # "SWAGGER_UI_FAVICON_HREF": settings.STATIC_URL + "your_company_favicon.png", # default is swagger favicon
 }
 
+# Redis keeping the answers students autosave during an assessment, see the 'drafts' cache below
+DRAFT_CACHE_URL = os.environ.get('DRAFT_CACHE_URL') or os.environ.get('SHARED_CACHE_URL')
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
-    }
+    },
+    # AI completions by prompt fingerprint, least recently used entries are culled past MAX_ENTRIES
+    'ai_completions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ai-completions',
+        'TIMEOUT': int(os.environ.get('AI_COMPLETION_CACHE_TTL', 24 * 60 * 60)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('AI_COMPLETION_CACHE_MAX_ENTRIES', 1000)),
+        },
+    },
+    # State every gunicorn and celery worker must agree on (AI rate limit, circuit breaker),
+    # falls back to a per-process cache when no Redis URL is configured
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('SHARED_CACHE_URL'),
+    } if os.environ.get('SHARED_CACHE_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    },
+    # Autosaved answers, apart from the entries above so caching those can't push a draft out. Every
+    # worker must see the same drafts, autosave is turned off when no Redis URL is configured. Point
+    # DRAFT_CACHE_URL at a Redis that never evicts keys (maxmemory-policy noeviction) to keep them
+    # safe from whatever else shares SHARED_CACHE_URL
+    'drafts': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': DRAFT_CACHE_URL,
+        'KEY_PREFIX': 'drafts',
+    } if DRAFT_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
 }
 
 # Email Config
@@ -304,3 +337,133 @@ AI_API_KEY = os.environ.get('AI_API_KEY')
 AI_PROVIDER = os.environ.get('AI_PROVIDER')
 AI_MODEL = os.environ.get('AI_MODEL')
 CODER_AI_MODEL = os.environ.get('CODER_AI_MODEL')
+# Cheaper, faster model for easy or small requests and for failover, defaults to AI_MODEL
+AI_FAST_MODEL = os.environ.get('AI_FAST_MODEL') or AI_MODEL
+# Model that reads handwritten answer images, defaults to AI_MODEL
+AI_VISION_MODEL = os.environ.get('AI_VISION_MODEL') or AI_MODEL
+# JSON list of routing rules replacing the defaults, see AI/model_router.py
+AI_ROUTING_RULES = json.loads(os.environ.get('AI_ROUTING_RULES') or 'null')
+# Seconds a model's smoothed call latency may reach before requests fail over, 0 disables the check
+AI_LATENCY_SLO = float(os.environ.get('AI_LATENCY_SLO', 0))
+# Seconds without calls after which a model's latency is forgotten and it gets traffic again
+AI_LATENCY_WINDOW = float(os.environ.get('AI_LATENCY_WINDOW', 300))
+# Worker pool size for fanning out per-PDF / per-chunk generation
+AI_MAX_WORKERS = int(os.environ.get('AI_MAX_WORKERS', 4))
+# Process-wide cap on in-flight provider calls across all pools
+AI_MAX_CONCURRENT_CALLS = int(os.environ.get('AI_MAX_CONCURRENT_CALLS', 8))
+# Seconds before a single provider call is abandoned
+AI_CALL_TIMEOUT = float(os.environ.get('AI_CALL_TIMEOUT', 120))
+# Context window in tokens of the smallest model requests are routed to, prompts that don't fit are never sent
+AI_CONTEXT_TOKENS = int(os.environ.get('AI_CONTEXT_TOKENS', 8192))
+# Rough characters per token used to estimate prompt size (lower is more conservative)
+AI_CHARS_PER_TOKEN = float(os.environ.get('AI_CHARS_PER_TOKEN', 3.5))
+# Most chunks a single text is split into for MCQ generation
+AI_MAX_CHUNKS = int(os.environ.get('AI_MAX_CHUNKS', 8))
+# Constrained decoding of MCQ responses against a JSON schema: on, off, or auto (providers known to support it)
+AI_STRUCTURED_OUTPUT = os.environ.get('AI_STRUCTURED_OUTPUT', 'auto').lower()
+# Requests for the questions still missing or invalid after the first structured response
+AI_STRUCTURED_MAX_FOLLOWUPS = int(
+    os.environ.get('AI_STRUCTURED_MAX_FOLLOWUPS', 2))
+# Most questions asked for in one request when several lectures share it
+AI_MAX_QUESTIONS_PER_REQUEST = int(
+    os.environ.get('AI_MAX_QUESTIONS_PER_REQUEST', 10))
+# Attempts per provider call, retryable failures back off exponentially with full jitter
+AI_MAX_RETRIES = int(os.environ.get('AI_MAX_RETRIES', 4))
+AI_RETRY_BASE_DELAY = float(os.environ.get('AI_RETRY_BASE_DELAY', 1))
+AI_RETRY_MAX_DELAY = float(os.environ.get('AI_RETRY_MAX_DELAY', 30))
+# Token bucket shared by all workers through the 'shared' cache (0 disables the limit)
+AI_RATE_LIMIT_PER_MINUTE = float(os.environ.get('AI_RATE_LIMIT_PER_MINUTE', 60))
+AI_RATE_LIMIT_BURST = int(os.environ.get('AI_RATE_LIMIT_BURST', 10))
+# Longest a call waits for a token before failing as unavailable
+AI_RATE_LIMIT_MAX_WAIT = float(os.environ.get('AI_RATE_LIMIT_MAX_WAIT', 30))
+# Consecutive provider failures that open the circuit breaker, and seconds it stays open
+AI_BREAKER_FAILURE_THRESHOLD = int(
+    os.environ.get('AI_BREAKER_FAILURE_THRESHOLD', 5))
+AI_BREAKER_COOLDOWN = float(os.environ.get('AI_BREAKER_COOLDOWN', 30))
+# AI_PROVIDER=fake answers offline with templated completions, for load tests and local development
+AI_FAKE_LATENCY = float(os.environ.get('AI_FAKE_LATENCY', 0.5))
+# Latency varies by up to this fraction either way
+AI_FAKE_LATENCY_JITTER = float(os.environ.get('AI_FAKE_LATENCY_JITTER', 0.2))
+# Share of calls failing with a 503 or 429, and of responses with broken JSON
+AI_FAKE_ERROR_RATE = float(os.environ.get('AI_FAKE_ERROR_RATE', 0))
+AI_FAKE_MALFORMED_RATE = float(os.environ.get('AI_FAKE_MALFORMED_RATE', 0))
+AI_FAKE_SEED = int(os.environ.get('AI_FAKE_SEED', 0))
+# Where per-call AI telemetry goes: db (analytics.AICallRecord, written in batches off the request),
+# log (one JSON line per call on the AI.telemetry logger) or off
+AI_TELEMETRY_SINK = os.environ.get('AI_TELEMETRY_SINK', 'db')
+AI_TELEMETRY_FLUSH_SECONDS = float(
+    os.environ.get('AI_TELEMETRY_FLUSH_SECONDS', 5))
+AI_TELEMETRY_BATCH_SIZE = int(os.environ.get('AI_TELEMETRY_BATCH_SIZE', 200))
+# Provider prices per million tokens, for the cost column of the telemetry
+AI_PROMPT_TOKEN_PRICE = float(os.environ.get('AI_PROMPT_TOKEN_PRICE', 0))
+AI_COMPLETION_TOKEN_PRICE = float(
+    os.environ.get('AI_COMPLETION_TOKEN_PRICE', 0))
+# Record every real completion into this directory, AI_PROVIDER=replay serves them from AI_REPLAY_DIR
+AI_RECORD_DIR = os.environ.get('AI_RECORD_DIR')
+AI_REPLAY_DIR = os.environ.get(
+    'AI_REPLAY_DIR', AI_RECORD_DIR or os.path.join(BASE_DIR, "cache", "ai_recordings"))
+
+# Extracted PDF text cache (content-addressed, evicts least recently used files past the size limit)
+PDF_TEXT_CACHE_DIR = os.environ.get(
+    'PDF_TEXT_CACHE_DIR', os.path.join(BASE_DIR, "cache", "pdf_text"))
+PDF_TEXT_CACHE_MAX_BYTES = int(os.environ.get(
+    'PDF_TEXT_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+# Process pool for extracting large PDFs (0 disables it)
+PDF_EXTRACT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS', 0))
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 40))
+PDF_PAGES_PER_TASK = int(os.environ.get('PDF_PAGES_PER_TASK', 10))
+
+# DynamicMCQ question pools, built in the background so students draw their set without an AI call
+# Pool size is number_of_questions times this multiplier
+DYNAMIC_MCQ_POOL_MULTIPLIER = int(
+    os.environ.get('DYNAMIC_MCQ_POOL_MULTIPLIER', 5))
+# Start filling pools this many hours before the assessment opens
+DYNAMIC_MCQ_POOL_LEAD_HOURS = int(
+    os.environ.get('DYNAMIC_MCQ_POOL_LEAD_HOURS', 24))
+# How often the refill task looks for pools that are short
+DYNAMIC_MCQ_POOL_REFILL_MINUTES = int(
+    os.environ.get('DYNAMIC_MCQ_POOL_REFILL_MINUTES', 10))
+
+# Assessments are prepared this many minutes before they open: dynamic question sets drawn and
+# every enrolled student's questions cached, so the opening rush doesn't rebuild them
+ASSESSMENT_PREWARM_MINUTES = int(
+    os.environ.get('ASSESSMENT_PREWARM_MINUTES', 15))
+
+# Handwritten answers are graded by background tasks after the submission is saved
+# Vision calls one institution may have in flight at once
+HANDWRITTEN_GRADING_SLOTS_PER_INSTITUTION = int(
+    os.environ.get('HANDWRITTEN_GRADING_SLOTS_PER_INSTITUTION', 2))
+# Failed grading attempts retried per answer before it is marked as failed
+HANDWRITTEN_GRADING_MAX_RETRIES = int(
+    os.environ.get('HANDWRITTEN_GRADING_MAX_RETRIES', 3))
+# Seconds before the first retry, doubled on every further attempt
+HANDWRITTEN_GRADING_RETRY_DELAY = int(
+    os.environ.get('HANDWRITTEN_GRADING_RETRY_DELAY', 30))
+
+# Students read per round of queries by the streaming gradebook export
+GRADEBOOK_EXPORT_CHUNK_SIZE = int(
+    os.environ.get('GRADEBOOK_EXPORT_CHUNK_SIZE', 500))
+
+# Handwritten answer images sent to the vision model
+# Longest side and total pixels after downscaling
+HANDWRITING_IMAGE_MAX_SIDE = int(
+    os.environ.get('HANDWRITING_IMAGE_MAX_SIDE', 1600))
+HANDWRITING_IMAGE_MAX_PIXELS = int(
+    os.environ.get('HANDWRITING_IMAGE_MAX_PIXELS', 1600 * 1200))
+# Short side is never downscaled below this, smaller writing stops being legible
+HANDWRITING_IMAGE_MIN_SIDE = int(
+    os.environ.get('HANDWRITING_IMAGE_MIN_SIDE', 768))
+# Grayscale with normalized contrast, set to 0 to keep colors (e.g. answers with colored diagrams)
+HANDWRITING_IMAGE_GRAYSCALE = os.environ.get(
+    'HANDWRITING_IMAGE_GRAYSCALE', '1').lower() in ('1', 'true', 'yes')
+HANDWRITING_IMAGE_QUALITY = int(
+    os.environ.get('HANDWRITING_IMAGE_QUALITY', 80))
+
+# Periodic tasks run by celery beat, django_celery_beat's DatabaseScheduler copies them into its tables
+# when beat starts
+CELERY_BEAT_SCHEDULE = {
+    'refill_dynamic_mcq_pools': {
+        'task': 'DynamicMCQ.tasks.refill_question_pools',
+        'schedule': timedelta(minutes=DYNAMIC_MCQ_POOL_REFILL_MINUTES),
+    },
+}
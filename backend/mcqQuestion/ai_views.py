@@ -1,21 +1,25 @@
 import logging
 from decimal import Decimal
-from rest_framework import generics, status
+from rest_framework import generics, permissions, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser
 
-from mcqQuestion.validation import validate_num_options, validate_difficulty, validate_num_questions, validate_question_grade
+from mcqQuestion.validation import validate_num_options, validate_difficulty, validate_num_questions, validate_question_grade, validate_boolean
 
 from .models import McqQuestion
 from .serializers import McqQuestionSerializer
 from .permission import McqQuestionPermission
 
-from AI.generate_mcq_from_text import generate_mcqs_from_text
+from AI.generate_mcq_from_text import generate_mcqs_from_text, MAX_TEXT_LENGTH
 from AI.extract_text_from_pdf import extract_text_from_pdf
 from AI.generate_mcqs_from_multiple_pdfs import generate_mcqs_from_multiple_pdfs
+from AI.completion_cache import get_stats, reset_stats
+from AI.telemetry import ai_call_context, user_institution_id
+from assessment.grades import deferred_grade_updates
 
 from .errors import MissingLectureError, InvalidLectureIdsError
+from django.db import transaction
 from django.db.models import Q
 
 
@@ -31,62 +35,55 @@ class GenerateMCQsFromTextView(generics.GenericAPIView):
     {
         "context": "Your text content here...",
         "num_questions": 10,  // optional, default is 10
-        "question_grade": "10.00"  // optional, default is 0.00
+        "question_grade": "10.00",  // optional, default is 0.00
+        "regenerate": false  // optional, true bypasses cached AI responses for the same request
     }
     """
     # serializer_class = McqQuestionSerializer
 
     def save_mcq_questions(self, mcq_data, question_grade):
         saved_questions = []
-        for mcq in mcq_data:
-            try:
-                logger.info(f"Processing MCQ: {mcq}")
-                # Create question using serializer
-                serializer = self.get_serializer(data={
-                    'question': mcq['question'],
-                    'options': mcq['options'],
-                    'answer_key': mcq['correct_answer'],
-                    'assessment': self.kwargs['assessment_id'],
-                    'question_grade': question_grade,
-                    'section_number': 1  # Default section number
-                })
-
-                # Log validation data
-                logger.info(f"Serializer data: {serializer.initial_data}")
-
-                # Validate the data
-                if not serializer.is_valid():
-                    logger.error(f"Validation errors: {serializer.errors}")
-                    raise ValidationError(serializer.errors)
-
-                # Save the question
-                question = serializer.save(created_by=self.request.user)
-                logger.info(
-                    f"Successfully saved question with ID: {question.id}")
-
-                # Add to saved questions list
-                saved_questions.append({
-                    'id': str(question.id),
-                    'question': question.question,
-                    'options': question.options,
-                    'answer': question.answer_key,
-                    'question_grade': str(question.question_grade),
-                    'section_number': question.section_number
-                })
-            except Exception as e:
-                logger.error(f"Error saving question: {str(e)}")
-                logger.error(f"Error type: {type(e)}")
-                # If any question fails, delete all previously saved questions
-                if saved_questions:
-                    for saved_q in saved_questions:
-                        try:
-                            instance = McqQuestion.objects.get(
-                                id=saved_q['id'])
-                            instance.delete()
-                        except Exception as delete_error:
-                            logger.error(
-                                f"Error deleting question {saved_q['id']}: {str(delete_error)}")
-                raise
+        # If any question fails, none is saved. The assessment grade is updated once for all of them
+        with transaction.atomic(), deferred_grade_updates():
+            for mcq in mcq_data:
+                try:
+                    logger.info(f"Processing MCQ: {mcq}")
+                    # Create question using serializer
+                    serializer = self.get_serializer(data={
+                        'question': mcq['question'],
+                        'options': mcq['options'],
+                        'answer_key': mcq['correct_answer'],
+                        'assessment': self.kwargs['assessment_id'],
+                        'question_grade': question_grade,
+                        'section_number': 1  # Default section number
+                    })
+
+                    # Log validation data
+                    logger.info(f"Serializer data: {serializer.initial_data}")
+
+                    # Validate the data
+                    if not serializer.is_valid():
+                        logger.error(f"Validation errors: {serializer.errors}")
+                        raise ValidationError(serializer.errors)
+
+                    # Save the question
+                    question = serializer.save(created_by=self.request.user)
+                    logger.info(
+                        f"Successfully saved question with ID: {question.id}")
+
+                    # Add to saved questions list
+                    saved_questions.append({
+                        'id': str(question.id),
+                        'question': question.question,
+                        'options': question.options,
+                        'answer': question.answer_key,
+                        'question_grade': str(question.question_grade),
+                        'section_number': question.section_number
+                    })
+                except Exception as e:
+                    logger.error(f"Error saving question: {str(e)}")
+                    logger.error(f"Error type: {type(e)}")
+                    raise
 
         return saved_questions
 
@@ -106,8 +103,12 @@ class GenerateMCQsFromTextView(generics.GenericAPIView):
             question_grade = validate_question_grade(
                 request.data.get('question_grade'))
 
-            # Generate MCQs
-            mcq_data = generate_mcqs_from_text(context, num_questions)
+            regenerate = validate_boolean(request.data.get('regenerate'))
+
+            # Generate MCQs, re-runs with the same input are served from the completion cache
+            with ai_call_context(institution_id=user_institution_id(request.user)):
+                mcq_data = generate_mcqs_from_text(
+                    context, num_questions, use_cache=True, regenerate=regenerate)
 
             # Save to database
             saved_questions = self.save_mcq_questions(mcq_data, question_grade)
@@ -145,30 +146,29 @@ class GenerateMCQsFromPDFView(generics.GenericAPIView):
 
     def save_mcq_questions(self, mcq_data, question_grade):
         saved_questions = []
-        for mcq in mcq_data:
-            try:
-                question = McqQuestion.objects.create(
-                    question=mcq['question'],
-                    options=mcq['options'],
-                    answer_key=mcq['correct_answer'],
-                    created_by=self.request.user,
-                    assessment_id=self.kwargs['assessment_id'],
-                    question_grade=question_grade,
-                    section_number=1  # Add default section number
-                )
-                saved_questions.append({
-                    'id': str(question.id),
-                    'question': question.question,
-                    'options': question.options,
-                    'answer': question.answer_key,
-                    'question_grade': str(question.question_grade),
-                    'section_number': question.section_number  # Include section number in response
-                })
-            except Exception as e:
-                # If any question fails, delete all previously saved questions
-                McqQuestion.objects.filter(
-                    id__in=[q['id'] for q in saved_questions]).delete()
-                raise ValidationError(f"Error saving question: {str(e)}")
+        # If any question fails, none is saved. The assessment grade is updated once for all of them
+        try:
+            with transaction.atomic(), deferred_grade_updates():
+                for mcq in mcq_data:
+                    question = McqQuestion.objects.create(
+                        question=mcq['question'],
+                        options=mcq['options'],
+                        answer_key=mcq['correct_answer'],
+                        created_by=self.request.user,
+                        assessment_id=self.kwargs['assessment_id'],
+                        question_grade=question_grade,
+                        section_number=1  # Add default section number
+                    )
+                    saved_questions.append({
+                        'id': str(question.id),
+                        'question': question.question,
+                        'options': question.options,
+                        'answer': question.answer_key,
+                        'question_grade': str(question.question_grade),
+                        'section_number': question.section_number  # Include section number in response
+                    })
+        except Exception as e:
+            raise ValidationError(f"Error saving question: {str(e)}")
         return saved_questions
 
     def post(self, request, *args, **kwargs):
@@ -187,14 +187,16 @@ class GenerateMCQsFromPDFView(generics.GenericAPIView):
             question_grade = validate_question_grade(
                 request.data.get('question_grade'))
 
-            # Extract text from PDF
-            context = extract_text_from_pdf(pdf_file)
+            # Extract text from PDF, only as much as the AI will take
+            context = extract_text_from_pdf(
+                pdf_file, max_chars=MAX_TEXT_LENGTH)
             if not context:
                 raise ValidationError(
                     {"pdf_file": "Could not extract text from PDF"})
 
             # Generate MCQs
-            mcq_data = generate_mcqs_from_text(context, num_questions)
+            with ai_call_context(institution_id=user_institution_id(request.user)):
+                mcq_data = generate_mcqs_from_text(context, num_questions)
 
             # Save to database
             saved_questions = self.save_mcq_questions(mcq_data, question_grade)
@@ -229,7 +231,8 @@ class GenerateMCQsFromLecturesView(generics.GenericAPIView):
         "question_grade": "2.00",  // optional, default=0.00
         "section_number": 1,  // optional, default=1
         "difficulty": "3",  // optional, default="3" (1=Very Easy, 2=Easy, 3=Medium, 4=Hard, 5=Very Hard)
-        "num_options": 4  // optional, default=4 (number of options per question, min=2, max=4)
+        "num_options": 4,  // optional, default=4 (number of options per question, min=2, max=4)
+        "regenerate": false  // optional, true bypasses cached AI responses for the same request
     }
     """
     permission_classes = [McqQuestionPermission]
@@ -273,7 +276,8 @@ class GenerateMCQsFromLecturesView(generics.GenericAPIView):
 
             # Get lectures and validate attachments
             from lecture.models import Lecture
-            lectures = Lecture.objects.filter(id__in=lecture_ids)
+            lectures = Lecture.objects.filter(
+                id__in=lecture_ids).select_related('text', 'chapter__course')
 
             if lectures.count() != len(lecture_ids):
                 raise InvalidLectureIdsError()
@@ -290,15 +294,25 @@ class GenerateMCQsFromLecturesView(generics.GenericAPIView):
             num_options = validate_num_options(
                 request.data.get('num_options'))
 
-            # Generate MCQs (no save)
-            mcq_data = generate_mcqs_from_multiple_pdfs(
-                [lecture.attachment for lecture in lectures],
-                # Evenly distribute the number of questions per pdf
-                number_of_questions=number_of_questions // len(
-                    lectures),
-                difficulty=difficulty,  # Pass difficulty to the generation function
-                num_options=num_options  # Pass number of options to the generation function
-            )
+            regenerate = validate_boolean(request.data.get('regenerate'))
+
+            # Generate MCQs (no save), re-runs with the same input are served from the completion cache
+            # The lectures' course decides who pays for the generation
+            institution_id = lectures[0].chapter.course.institution_id
+            with ai_call_context(institution_id=institution_id):
+                mcq_data = generate_mcqs_from_multiple_pdfs(
+                    [lecture.attachment for lecture in lectures],
+                    # Text extracted at upload time, lectures that aren't ready are parsed here
+                    texts=[lecture.extracted_text(MAX_TEXT_LENGTH)
+                           for lecture in lectures],
+                    # Shared out across the lectures, several lectures go in one request when their share is small
+                    number_of_questions=number_of_questions,
+                    source_ids=[str(lecture.id) for lecture in lectures],
+                    difficulty=difficulty,  # Pass difficulty to the generation function
+                    num_options=num_options,  # Pass number of options to the generation function
+                    use_cache=True,
+                    regenerate=regenerate
+                )
             logger.info(f"Generated {len(mcq_data)} MCQs (not saved)")
 
             # Return generated MCQs
@@ -333,3 +347,28 @@ class GenerateMCQsFromLecturesView(generics.GenericAPIView):
                 'error': str(e),
                 'error_type': 'processing_error'
             }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+
+class AICompletionCacheStatsView(generics.GenericAPIView):
+    """
+    View for checking how many AI requests the completion cache saved, counted across every worker.
+    GET /mcqQuestion/ai-cache-stats/
+
+    Response:
+    {
+        "hits": 12,
+        "misses": 30,
+        "hit_rate": 0.2857
+    }
+
+    DELETE /mcqQuestion/ai-cache-stats/
+    Start counting again from zero for every worker, the cached completions are kept.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_stats(), status=status.HTTP_200_OK)
+
+    def delete(self, request, *args, **kwargs):
+        reset_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
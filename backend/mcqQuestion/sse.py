@@ -0,0 +1,157 @@
+import json
+import logging
+import uuid
+from drf_sse import SSEMixin, SSEResponse
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from drf_spectacular.types import OpenApiTypes
+from assessment.authentication import EventStreamAuthentication
+from lecture.models import Lecture
+
+from AI.extract_text_from_pdf import extract_text_from_pdf
+from AI.chunk_text import share_evenly
+from AI.generate_mcq_from_text import plan_source_batches, stream_mcqs, MAX_TEXT_LENGTH
+from AI.model_router import PDF_MCQ
+from AI.telemetry import ai_call_context
+
+from .ai_views import GenerateMCQsFromLecturesView
+from .errors import MissingLectureError, InvalidLectureIdsError
+from .validation import validate_num_options, validate_difficulty, validate_num_questions
+
+logger = logging.getLogger(__name__)
+
+
+class StreamMCQsFromLecturesView(SSEMixin, APIView):
+    """
+    Server-Sent Events endpoint that streams MCQs generated from lecture attachments one at a time.
+    GET /mcqQuestion/generate-from-lectures/stream/{token}/?lecture_ids=uuid1,uuid2&number_of_questions=10&difficulty=3&num_options=4
+
+    Each event is a JSON object:
+    - {"type": "question", "index": 0, "mcq": {"question": ..., "options": [...], "correct_answer": ...}}
+    - {"type": "error", "error": "...", "error_type": "processing_error"}
+    - {"type": "done", "num_questions": 10, "error_lectures": [...]}
+    The questions are not saved, use save-generated-mcqs once the teacher is happy with them.
+    """
+    authentication_classes = [EventStreamAuthentication]
+
+    @extend_schema(
+        description="SSE endpoint streaming generated MCQs as soon as each one is complete",
+        parameters=[
+            OpenApiParameter(
+                name='token',
+                description='JWT token for authentication',
+                required=True,
+                type=str,
+                location=OpenApiParameter.PATH
+            ),
+            OpenApiParameter(
+                name='lecture_ids',
+                description='Comma separated lecture IDs',
+                required=True,
+                type=str,
+                location=OpenApiParameter.QUERY
+            ),
+            OpenApiParameter(
+                name='number_of_questions',
+                description='Total number of questions (default 10)',
+                required=False,
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY
+            ),
+            OpenApiParameter(
+                name='difficulty',
+                description='Difficulty level 1-5 (default 3)',
+                required=False,
+                type=str,
+                location=OpenApiParameter.QUERY
+            ),
+            OpenApiParameter(
+                name='num_options',
+                description='Number of options per question (default 4)',
+                required=False,
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY
+            ),
+        ],
+        responses={200: None},
+    )
+    def get(self, request, token):
+        # Authenticate user with the token, EventSource can't send headers
+        user = self.authentication_classes[0]().authenticate(token)
+        if not user:
+            return Response({'error': 'Authentication failed'}, status=401)
+        if user.role not in ["Teacher", "Institution"]:
+            return Response({'error': 'Only teachers and institutions can generate questions'}, status=403)
+
+        request.user = user
+
+        try:
+            lecture_ids = [lecture_id for lecture_id in request.query_params.get(
+                'lecture_ids', '').split(',') if lecture_id]
+            if not lecture_ids:
+                raise MissingLectureError()
+            try:
+                lecture_ids = [uuid.UUID(lecture_id) for lecture_id in lecture_ids]
+            except ValueError:
+                raise InvalidLectureIdsError()
+
+            lectures = list(Lecture.objects.filter(
+                id__in=lecture_ids).select_related('text', 'chapter__course'))
+            if len(lectures) != len(lecture_ids):
+                raise InvalidLectureIdsError()
+
+            number_of_questions = validate_num_questions(
+                request.query_params.get('number_of_questions'))
+            difficulty = validate_difficulty(
+                request.query_params.get('difficulty'), GenerateMCQsFromLecturesView.DIFFICULTY_CHOICES)
+            num_options = validate_num_options(
+                request.query_params.get('num_options'))
+        except ValidationError as e:
+            return Response({
+                'error': e.detail if hasattr(e, 'detail') else str(e),
+                'error_type': 'validation_error'
+            }, status=400)
+        except (MissingLectureError, InvalidLectureIdsError) as e:
+            return Response({
+                'message': str(e),
+                'error_type': e.error_type
+            }, status=e.status_code)
+
+        def iter_data():
+            texts = []
+            error_lectures = []
+            for lecture in lectures:
+                # Text extracted at upload time, lectures that aren't ready are parsed here
+                text = lecture.extracted_text(MAX_TEXT_LENGTH) or (extract_text_from_pdf(
+                    lecture.attachment, max_chars=MAX_TEXT_LENGTH) if lecture.attachment else None)
+                if not text:
+                    error_lectures.append(lecture.title)
+                    continue
+                texts.append((str(lecture.id), text))
+
+            # Shared out across the lectures, several lectures go in one request when their share is small
+            counts = share_evenly([len(text) for _, text in texts], number_of_questions)
+            jobs = plan_source_batches(
+                [(lecture_id, text, count) for (lecture_id, text), count in zip(texts, counts)],
+                difficulty, num_options)
+
+            index = 0
+            try:
+                # The stream's workers take a copy of this context when they start
+                with ai_call_context(institution_id=lectures[0].chapter.course.institution_id):
+                    for mcq in stream_mcqs(jobs, difficulty=difficulty, num_options=num_options, task=PDF_MCQ):
+                        yield json.dumps({'type': 'question', 'index': index, 'mcq': mcq})
+                        index += 1
+            except Exception as e:
+                logger.error(f"MCQ stream failed: {str(e)}")
+                yield json.dumps({
+                    'type': 'error',
+                    'error': str(e),
+                    'error_type': getattr(e, 'error_type', 'processing_error')
+                })
+
+            yield json.dumps({'type': 'done', 'num_questions': index, 'error_lectures': error_lectures})
+
+        return SSEResponse(iter_data())
@@ -10,7 +10,9 @@ from .ai_views import (
     GenerateMCQsFromTextView,
     GenerateMCQsFromPDFView,
     GenerateMCQsFromLecturesView,
+    AICompletionCacheStatsView,
 )
+from .sse import StreamMCQsFromLecturesView
 
 router = DefaultRouter()
 
@@ -41,6 +43,16 @@ urlpatterns = [
         GenerateMCQsFromLecturesView.as_view(),
         name='mcq-generate-from-lectures'
     ),
+    path(
+        'generate-from-lectures/stream/<str:token>/',
+        StreamMCQsFromLecturesView.as_view(),
+        name='mcq-generate-from-lectures-stream'
+    ),
+    path(
+        'ai-cache-stats/',
+        AICompletionCacheStatsView.as_view(),
+        name='ai-completion-cache-stats'
+    ),
     path(
         'save-generated-mcqs/<uuid:assessment_id>/',
         SaveGeneratedMCQsView.as_view(),
@@ -39,6 +39,19 @@ def validate_num_questions(num_questions, default=10):
             "Number of questions must be a valid integer")
 
 
+def validate_boolean(value, default=False):
+    """Accept JSON booleans as well as the strings multipart forms send"""
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ['true', '1', 'yes']:
+        return True
+    if str(value).lower() in ['false', '0', 'no']:
+        return False
+    raise ValidationError("Expected a boolean value (true or false)")
+
+
 # TODO: query for the assessment total grade
 
 
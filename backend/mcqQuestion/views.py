@@ -1,6 +1,7 @@
 from rest_framework import generics, status
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
+from django.db import transaction
 from django.utils import timezone
 from django.db.models import Q
 from .serializers import McqQuestionSerializer
@@ -14,6 +15,7 @@ from .permission import McqQuestionPermission
 # Models
 from mcqQuestion.models import McqQuestion
 from assessment.models import Assessment
+from assessment.grades import deferred_grade_updates
 
 
 # Errors
@@ -281,10 +283,10 @@ class SaveGeneratedMCQsView(generics.GenericAPIView):
             section_number = request.data.get('section_number', 1)
             print("question_grade", question_grade)
 
-            # Save questions
+            # Save questions, if any question fails none is saved. The assessment grade is updated once
             saved_questions = []
-            for mcq in mcqs:
-                try:
+            with transaction.atomic(), deferred_grade_updates():
+                for mcq in mcqs:
                     # Validate MCQ structure
                     validate_mcq_structure(mcq)
 
@@ -311,18 +313,6 @@ class SaveGeneratedMCQsView(generics.GenericAPIView):
                         'question_grade': str(question.question_grade),
                         'section_number': question.section_number
                     })
-                except Exception as e:
-                    # If any question fails, delete all previously saved questions
-                    if saved_questions:
-                        for saved_q in saved_questions:
-                            try:
-                                instance = McqQuestion.objects.get(
-                                    id=saved_q['id'])
-                                instance.delete()
-                            except Exception as delete_error:
-                                logger.error(
-                                    f"Error deleting question {saved_q['id']}: {str(delete_error)}")
-                    raise
 
             return Response({
                 'message': f'Successfully saved {len(saved_questions)} MCQ questions',